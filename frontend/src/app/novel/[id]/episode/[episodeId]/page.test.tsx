@@ -121,7 +121,32 @@ describe('EpisodePage', () => {
 
     await EpisodePage(props)
 
-    expect(mockGetEpisodeDetail).toHaveBeenCalledWith('1', 'ep1')
+    expect(mockGetEpisodeDetail).toHaveBeenCalledWith('1', 'ep1', 1)
+  })
+
+  test('長いエピソードは指定したページを取得してページ送りを表示する', async () => {
+    mockGetEpisodeDetail.mockResolvedValue({
+      data: {
+        ...mockEpisodeDetail,
+        pagination: { currentPage: 2, pageCount: 3 }
+      },
+      error: null
+    })
+
+    const props = {
+      params: Promise.resolve({
+        id: '1',
+        episodeId: 'ep1'
+      }),
+      searchParams: Promise.resolve({ page: '2' })
+    }
+
+    render(await EpisodePage(props))
+
+    expect(mockGetEpisodeDetail).toHaveBeenCalledWith('1', 'ep1', 2)
+    expect(screen.getByText('2 / 3')).toBeInTheDocument()
+    expect(screen.getByText('← 前のページ').closest('a')).toHaveAttribute('href', '/novel/1/episode/ep1?page=1')
+    expect(screen.getByText('次のページ →').closest('a')).toHaveAttribute('href', '/novel/1/episode/ep1?page=3')
   })
 
   test('ページコンテナが適切なクラスを持つ', async () => {
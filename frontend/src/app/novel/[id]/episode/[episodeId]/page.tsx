@@ -2,6 +2,7 @@
  * 話閲覧ページ
  * TDD Green Phase: テストを通す最小限の実装
  */
+import Link from 'next/link'
 import { notFound } from 'next/navigation'
 import { EpisodeViewer } from '@/components/EpisodeViewer'
 import { EpisodeNavigation } from '@/components/EpisodeNavigation'
@@ -12,13 +13,19 @@ interface EpisodePageProps {
     id: string
     episodeId: string
   }>
+  searchParams?: Promise<{
+    page?: string
+  }>
 }
 
-export default async function EpisodePage({ params }: EpisodePageProps) {
+export default async function EpisodePage({ params, searchParams }: EpisodePageProps) {
   const { id, episodeId } = await params
+  const { page } = (await searchParams) ?? {}
+  // 長いエピソードは ?page=N のページだけを取得する
+  const pageNumber = Math.max(1, Number.parseInt(page ?? '1', 10) || 1)
   
   // サーバーサイドでデータ取得（SSR）
-  const { data: episodeDetail, error } = await getEpisodeDetail(id, episodeId)
+  const { data: episodeDetail, error } = await getEpisodeDetail(id, episodeId, pageNumber)
 
   // 話が見つからない場合は404ページを表示
   if (!episodeDetail || error) {
@@ -26,13 +33,43 @@ export default async function EpisodePage({ params }: EpisodePageProps) {
     return // この行は実際には到達しないが、TypeScriptとテストのために必要
   }
 
-  const { episode, novel, navigation } = episodeDetail
+  const { episode, novel, navigation, pagination } = episodeDetail
+  const episodeHref = `/novel/${id}/episode/${episodeId}`
 
   return (
     <div className="container mx-auto px-4 py-6">
       {/* 話の表示 */}
       <EpisodeViewer episode={episode} novel={novel} />
       
+      {/* 長いエピソードのページ送り */}
+      {pagination && pagination.pageCount > 1 && (
+        <nav aria-label="ページ" className="flex justify-between items-center max-w-4xl mx-auto mt-8 px-4">
+          <div className="flex-1">
+            {pagination.currentPage > 1 && (
+              <Link
+                href={`${episodeHref}?page=${pagination.currentPage - 1}`}
+                className="inline-block p-3 text-primary hover:text-primary/80 transition-colors"
+              >
+                ← 前のページ
+              </Link>
+            )}
+          </div>
+          <div className="flex-shrink-0 mx-4 text-sm text-gray-600">
+            {pagination.currentPage} / {pagination.pageCount}
+          </div>
+          <div className="flex-1 text-right">
+            {pagination.currentPage < pagination.pageCount && (
+              <Link
+                href={`${episodeHref}?page=${pagination.currentPage + 1}`}
+                className="inline-block p-3 text-primary hover:text-primary/80 transition-colors"
+              >
+                次のページ →
+              </Link>
+            )}
+          </div>
+        </nav>
+      )}
+      
       {/* ナビゲーション */}
       <EpisodeNavigation
         novelId={id}
@@ -66,6 +66,30 @@ describe('EpisodeViewer', () => {
     expect(screen.getByText('本文がありません。')).toBeInTheDocument()
   })
 
+  test('派生データのHTMLがある場合はルビ付きで表示される', () => {
+    const derivedEpisode = {
+      ...mockEpisode,
+      content_html: '<p><ruby>漢字<rt>かんじ</rt></ruby>の本文</p>\n<p>二段落目</p>'
+    }
+    render(<EpisodeViewer episode={derivedEpisode} novel={mockNovel} />)
+
+    const contentContainer = screen.getByTestId('episode-content')
+    expect(contentContainer.querySelectorAll('p')).toHaveLength(2)
+    expect(contentContainer.querySelector('rt')).toHaveTextContent('かんじ')
+  })
+
+  test('文字数と読了時間の目安が表示される', () => {
+    render(<EpisodeViewer episode={{ ...mockEpisode, char_count: 1200, reading_minutes: 3 }} novel={mockNovel} />)
+
+    expect(screen.getByTestId('episode-reading-time')).toHaveTextContent('1,200文字・約3分')
+  })
+
+  test('派生データが無い場合は文字数と読了時間を表示しない', () => {
+    render(<EpisodeViewer episode={mockEpisode} novel={mockNovel} />)
+
+    expect(screen.queryByTestId('episode-reading-time')).not.toBeInTheDocument()
+  })
+
   test('スマホでの読書体験を考慮したレイアウトが適用される', () => {
     render(<EpisodeViewer episode={mockEpisode} novel={mockNovel} />)
     
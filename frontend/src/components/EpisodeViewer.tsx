@@ -37,11 +37,23 @@ export function EpisodeViewer({
         <h1 className="text-3xl font-bold text-gray-900">
           第{episode.episode_number}話: {episode.title}
         </h1>
+        {episode.char_count != null && episode.reading_minutes != null && (
+          <p data-testid="episode-reading-time" className="mt-2 text-sm text-gray-500">
+            {episode.char_count.toLocaleString()}文字・約{episode.reading_minutes}分
+          </p>
+        )}
       </header>
 
       {/* 話の本文 */}
       <article className="mb-8">
-        {episode.content ? (
+        {episode.content_html ? (
+          // 同期スクリプトが本文をエスケープしてから段落・ルビのタグを付けたHTML（--derive）
+          <div
+            data-testid="episode-content"
+            className="text-lg leading-relaxed text-gray-700 [&_p]:mb-6 [&_rt]:text-xs [&_hr]:my-8"
+            dangerouslySetInnerHTML={{ __html: episode.content_html }}
+          />
+        ) : episode.content ? (
           <div 
             data-testid="episode-content"
             className="text-lg leading-relaxed text-gray-700 whitespace-pre-wrap"
@@ -0,0 +1,126 @@
+/**
+ * Supabase データ取得用クエリ関数のテスト
+ * page_count・episode_pages のマイグレーション前のデータベースでも話を表示できることを確認する
+ */
+import { getEpisodeDetail } from './queries'
+import { createClient } from './server'
+
+jest.mock('./server', () => ({
+  createClient: jest.fn(),
+  createAdminClient: jest.fn()
+}))
+
+const mockCreateClient = createClient as jest.MockedFunction<typeof createClient>
+
+interface QueryResult {
+  data: unknown
+  error: { code: string, message: string } | null
+}
+
+interface FakeQuery extends PromiseLike<QueryResult> {
+  eq: () => FakeQuery
+  order: () => FakeQuery
+  single: () => Promise<QueryResult>
+  maybeSingle: () => Promise<QueryResult>
+}
+
+// from(table).select(columns) の結果を respond で決めるクライアント
+function fakeClient(respond: (table: string, columns: string) => QueryResult) {
+  return {
+    from: (table: string) => ({
+      select: (columns: string) => {
+        const result = Promise.resolve(respond(table, columns))
+        const query: FakeQuery = {
+          eq: () => query,
+          order: () => query,
+          single: () => result,
+          maybeSingle: () => result,
+          then: (onFulfilled, onRejected) => result.then(onFulfilled, onRejected)
+        }
+        return query
+      }
+    })
+  }
+}
+
+const missingColumn = { code: '42703', message: 'column episodes.page_count does not exist' }
+const missingTable = { code: '42P01', message: 'relation "public.episode_pages" does not exist' }
+
+const episode = {
+  id: 'ep1',
+  novel_id: 1,
+  title: '新たな始まり',
+  episode_number: 1,
+  published_at: '2025-06-01T00:00:00Z'
+}
+
+function respondWith(episodeColumns: (columns: string) => QueryResult) {
+  return (table: string, columns: string): QueryResult => {
+    if (table === 'novels') {
+      return { data: { id: 1, title: 'テスト小説', author: 'テスト作者' }, error: null }
+    }
+    if (table === 'episode_pages') {
+      return { data: null, error: missingTable }
+    }
+    if (columns === 'id, title, episode_number') {
+      return { data: [episode], error: null }
+    }
+    return episodeColumns(columns)
+  }
+}
+
+describe('getEpisodeDetail', () => {
+  beforeEach(() => {
+    process.env.NEXT_PUBLIC_SUPABASE_URL = 'http://localhost'
+    process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY = 'anon'
+    jest.spyOn(console, 'warn').mockImplementation(() => {})
+    jest.spyOn(console, 'error').mockImplementation(() => {})
+  })
+
+  afterEach(() => {
+    delete process.env.NEXT_PUBLIC_SUPABASE_URL
+    delete process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY
+    jest.restoreAllMocks()
+  })
+
+  test('page_count カラムが無い場合は全カラムを取得して1ページで表示する', async () => {
+    mockCreateClient.mockResolvedValue(fakeClient(respondWith(columns =>
+      columns === '*'
+        ? { data: { ...episode, content: '本文' }, error: null }
+        : { data: null, error: missingColumn }
+    )) as unknown as Awaited<ReturnType<typeof createClient>>)
+
+    const { data, error } = await getEpisodeDetail('1', 'ep1')
+
+    expect(error).toBeNull()
+    expect(data?.episode.content).toBe('本文')
+    expect(data?.pagination).toEqual({ currentPage: 1, pageCount: 1 })
+  })
+
+  test('episode_pages テーブルが無い場合は本文全体を1ページで表示する', async () => {
+    mockCreateClient.mockResolvedValue(fakeClient(respondWith(columns =>
+      columns === '*'
+        ? { data: { ...episode, page_count: 3, content: '長い本文' }, error: null }
+        : { data: { ...episode, page_count: 3 }, error: null }
+    )) as unknown as Awaited<ReturnType<typeof createClient>>)
+
+    const { data, error } = await getEpisodeDetail('1', 'ep1')
+
+    expect(error).toBeNull()
+    expect(data?.episode.content).toBe('長い本文')
+    expect(data?.pagination).toEqual({ currentPage: 1, pageCount: 1 })
+  })
+
+  test('1ページの話は表示用の派生データも取得する', async () => {
+    mockCreateClient.mockResolvedValue(fakeClient(respondWith(columns =>
+      columns === '*'
+        ? { data: { ...episode, page_count: 1, content: '本文', content_html: '<p>本文</p>', reading_minutes: 1 }, error: null }
+        : { data: { ...episode, page_count: 1 }, error: null }
+    )) as unknown as Awaited<ReturnType<typeof createClient>>)
+
+    const { data } = await getEpisodeDetail('1', 'ep1')
+
+    expect(data?.episode.content_html).toBe('<p>本文</p>')
+    expect(data?.episode.reading_minutes).toBe(1)
+  })
+})
@@ -3,7 +3,7 @@
  * サーバーサイドで使用する型安全なデータ取得関数
  */
 import { createClient, createAdminClient } from './server'
-import type { Novel, Episode, SearchParams, PaginationParams, EpisodeDetail, NovelWithEpisodes } from '../types'
+import type { Novel, Episode, EpisodePage, SearchParams, PaginationParams, EpisodeDetail, NovelWithEpisodes } from '../types'
 
 // 開発環境用のモックデータ
 const mockNovels: Novel[] = [
@@ -332,10 +332,46 @@ export async function getEpisodeById(id: string) {
   return { data: data as Episode, error: null }
 }
 
+// 列・テーブルが存在しない場合のエラーコード（page_count・episode_pages のマイグレーション前のデータベース）
+const MISSING_SCHEMA_ERROR_CODES = ['42703', '42P01', 'PGRST204', 'PGRST205']
+
+function isMissingSchemaError(error: unknown): boolean {
+  const code = (error as { code?: string } | null)?.code
+  return code !== undefined && MISSING_SCHEMA_ERROR_CODES.includes(code)
+}
+
+/**
+ * 長いエピソードの1ページを取得
+ * page_count が2以上のエピソードのみページが保存されている（ページが無い場合は data が null）
+ */
+export async function getEpisodePage(episodeId: string, pageNumber: number) {
+  const supabase = await createClient()
+  
+  if (!supabase) {
+    console.error('Supabase client creation failed')
+    return { data: null, error: { message: 'Database connection failed' } }
+  }
+  
+  const { data, error } = await supabase
+    .from('episode_pages')
+    .select('*')
+    .eq('episode_id', episodeId)
+    .eq('page_number', pageNumber)
+    .maybeSingle()
+
+  if (error) {
+    console.error('Error fetching episode page:', error)
+    return { data: null, error }
+  }
+
+  return { data: data as EpisodePage | null, error: null }
+}
+
 /**
  * 話詳細を取得（ナビゲーション情報込み）
+ * 長いエピソード（page_count が2以上）は本文全体ではなく pageNumber のページだけを取得する
  */
-export async function getEpisodeDetail(novelId: string, episodeId: string): Promise<{ data: EpisodeDetail | null, error: unknown }> {
+export async function getEpisodeDetail(novelId: string, episodeId: string, pageNumber: number = 1): Promise<{ data: EpisodeDetail | null, error: unknown }> {
   // 環境変数が設定されていない場合はモックデータを返す
   if (!process.env.NEXT_PUBLIC_SUPABASE_URL || !process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY) {
     console.log('Supabase環境変数が未設定のため、モックデータを使用します')
@@ -351,6 +387,10 @@ export async function getEpisodeDetail(novelId: string, episodeId: string): Prom
       return { data: null, error: { message: 'Episode not found', code: 'EPISODE_NOT_FOUND' } }
     }
 
+    if (pageNumber !== 1) {
+      return { data: null, error: { message: 'Page not found', code: 'PAGE_NOT_FOUND' } }
+    }
+
     // ナビゲーション用の前後話を取得
     const allNovelEpisodes = mockEpisodes
       .filter(ep => ep.novel_id.toString() === novelId)
@@ -386,6 +426,10 @@ export async function getEpisodeDetail(novelId: string, episodeId: string): Prom
             title: nextEpisode.title,
             episode_number: nextEpisode.episode_number
           } : null
+        },
+        pagination: {
+          currentPage: 1,
+          pageCount: 1
         }
       }, 
       error: null 
@@ -399,23 +443,67 @@ export async function getEpisodeDetail(novelId: string, episodeId: string): Prom
     return { data: null, error: { message: 'Database connection failed' } }
   }
   
-  // 話詳細と小説情報を並行取得
-  const [episodeResult, novelResult] = await Promise.all([
-    supabase.from('episodes').select('*').eq('id', episodeId).eq('novel_id', novelId).single(),
-    supabase.from('novels').select('id, title, author').eq('id', novelId).single()
+  // 話詳細（本文を除く）・小説情報・表示するページ・ナビゲーション用の前後話を並行取得
+  const [episodeResult, novelResult, pageResult, navigationResult] = await Promise.all([
+    supabase.from('episodes').select('id, novel_id, title, episode_number, published_at, page_count').eq('id', episodeId).eq('novel_id', novelId).single(),
+    supabase.from('novels').select('id, title, author').eq('id', novelId).single(),
+    getEpisodePage(episodeId, pageNumber),
+    supabase.from('episodes').select('id, title, episode_number').eq('novel_id', novelId).order('episode_number', { ascending: true })
   ])
 
-  if (episodeResult.error || novelResult.error) {
-    console.error('Error fetching episode detail:', episodeResult.error || novelResult.error)
-    return { data: null, error: episodeResult.error || novelResult.error }
+  if (novelResult.error) {
+    console.error('Error fetching episode detail:', novelResult.error)
+    return { data: null, error: novelResult.error }
   }
 
-  // ナビゲーション用の前後話を取得
-  const navigationResult = await supabase
-    .from('episodes')
-    .select('id, title, episode_number')
-    .eq('novel_id', novelId)
-    .order('episode_number', { ascending: true })
+  let episode: Omit<Episode, 'content'> & { content?: string }
+  let pageCount: number
+  if (episodeResult.error && isMissingSchemaError(episodeResult.error)) {
+    // page_count カラムが無い（マイグレーション前の）データベースでは、本文ごと取得してページ分割せずに表示する
+    console.warn('episodes.page_count is missing; showing the whole episode. Apply the migration in docs/vercel-setup.md')
+    const fallbackResult = await supabase.from('episodes').select('*').eq('id', episodeId).eq('novel_id', novelId).single()
+    if (fallbackResult.error) {
+      console.error('Error fetching episode detail:', fallbackResult.error)
+      return { data: null, error: fallbackResult.error }
+    }
+    episode = fallbackResult.data as Episode
+    pageCount = 1
+  } else if (episodeResult.error) {
+    console.error('Error fetching episode detail:', episodeResult.error)
+    return { data: null, error: episodeResult.error }
+  } else {
+    episode = episodeResult.data
+    pageCount = episodeResult.data.page_count ?? 1
+  }
+
+  if (pageCount > 1 && isMissingSchemaError(pageResult.error)) {
+    // episode_pages テーブルが無い場合は、本文全体を1ページとして表示する
+    console.warn('episode_pages table is missing; showing the whole episode. Apply the migration in docs/vercel-setup.md')
+    pageCount = 1
+  }
+
+  let content: string
+  if (pageCount > 1) {
+    if (!pageResult.data) {
+      return { data: null, error: pageResult.error || { message: 'Page not found', code: 'PAGE_NOT_FOUND' } }
+    }
+    content = pageResult.data.content
+  } else {
+    if (pageNumber !== 1) {
+      return { data: null, error: { message: 'Page not found', code: 'PAGE_NOT_FOUND' } }
+    }
+    if (episode.content === undefined) {
+      // 1ページのエピソードはページを保存していないため、本文と表示用の派生データ（--derive）を取得する
+      // 派生データのカラムが無いデータベースもあるため全カラムを取得する
+      const contentResult = await supabase.from('episodes').select('*').eq('id', episodeId).single()
+      if (contentResult.error) {
+        console.error('Error fetching episode content:', contentResult.error)
+        return { data: null, error: contentResult.error }
+      }
+      episode = contentResult.data as Episode
+    }
+    content = episode.content ?? ''
+  }
 
   const allEpisodes = navigationResult.data || []
   const currentIndex = allEpisodes.findIndex(ep => ep.id === episodeId)
@@ -424,11 +512,15 @@ export async function getEpisodeDetail(novelId: string, episodeId: string): Prom
 
   return { 
     data: {
-      episode: episodeResult.data,
+      episode: { ...episode, content } as Episode,
       novel: novelResult.data,
       navigation: {
         prevEpisode,
         nextEpisode
+      },
+      pagination: {
+        currentPage: pageNumber,
+        pageCount
       }
     },
     error: null 
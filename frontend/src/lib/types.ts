@@ -25,6 +25,24 @@ export interface Episode {
   published_at: string
   content: string
   created_at?: string
+  page_count?: number
+  // 同期スクリプトの --derive で計算する表示用の派生データ（カラムが無い・未計算の場合は無し）
+  content_html?: string | null
+  char_count?: number | null
+  reading_minutes?: number | null
+  excerpt?: string | null
+}
+
+/**
+ * 長いエピソードのページ（episode_pages テーブル）
+ * start_offset / end_offset は本文の先頭からの文字数（コードポイント単位）
+ */
+export interface EpisodePage {
+  episode_id: string
+  page_number: number
+  start_offset: number
+  end_offset: number
+  content: string
 }
 
 
@@ -84,6 +102,11 @@ export interface EpisodeDetail {
     prevEpisode: EpisodeInfo | null
     nextEpisode: EpisodeInfo | null
   }
+  // 長いエピソードは episode.content が表示中のページの本文になる
+  pagination?: {
+    currentPage: number
+    pageCount: number
+  }
 }
 
 /**
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+原稿パーサーのマイクロベンチマーク
+frontmatter.load / yaml.safe_load（従来の経路）と manuscript_io の高速経路・ヘッダーだけを読む経路を比較し、
+解析結果（メタデータと本文、本文が空でないか）が一致することも確認する（不一致があれば終了コード1）
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import yaml
+import frontmatter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from manuscript_io import load_episode_file, load_info_file, scan_episode_header
+from generate_corpus import TRICKY_DIR, generate_corpus
+
+def corpus_files(root, novels, episodes):
+    """共有のコーパス生成器で原稿を作り、エピソードと info.yml のパスを返す"""
+    generate_corpus(root, novels, episodes, status_mix="new=1", tricky=True)
+    root_path = Path(root)
+    episode_files = sorted(root_path.glob("*/manuscript/*.md")) + sorted((root_path / TRICKY_DIR).glob("*.md"))
+    info_files = sorted(root_path.glob("*/manuscript/info.yml")) + sorted((root_path / TRICKY_DIR).glob("*.yml"))
+    return episode_files, info_files
+
+def load_episode_reference(path):
+    """従来の経路（frontmatter.load）"""
+    post = frontmatter.load(path)
+    return post.metadata, post.content
+
+def load_info_reference(path):
+    """従来の経路（yaml.safe_load）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def load_header_reference(path):
+    """従来の経路で求めたメタデータと本文が空でないか"""
+    post = frontmatter.load(path)
+    return post.metadata, bool(post.content)
+
+def outcome(loader, path):
+    """読み込み結果（エラーになるファイルは例外の型）"""
+    try:
+        return loader(path)
+    except Exception as e:
+        return type(e).__name__
+
+def time_loader(loader, files, repeat):
+    """全ファイルを repeat 回読み込んだときの最短時間と結果を返す"""
+    best = None
+    results = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [outcome(loader, path) for path in files]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def compare(label, files, reference, fast):
+    """結果を比較し、不一致のファイル数を返す"""
+    mismatches = 0
+    for path, expected, actual in zip(files, reference, fast):
+        if expected != actual:
+            mismatches += 1
+            print(f"❌ {label} mismatch: {path}")
+            print(f"   expected: {expected!r}"[:300])
+            print(f"   actual:   {actual!r}"[:300])
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="原稿パーサーのベンチマーク")
+    parser.add_argument("--novels", type=int, default=20, help="生成する作品数")
+    parser.add_argument("--episodes", type=int, default=50, help="作品あたりのエピソード数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測の繰り返し回数（最短時間を採用）")
+    args = parser.parse_args()
+
+    print(f"YAML loader: {'CSafeLoader' if hasattr(yaml, 'CSafeLoader') else 'SafeLoader (libyaml なし)'}")
+    with tempfile.TemporaryDirectory() as root:
+        episode_files, info_files = corpus_files(root, args.novels, args.episodes)
+        print(f"Corpus: {len(episode_files)} episodes, {len(info_files)} info files")
+
+        ref_time, ref_episodes = time_loader(load_episode_reference, episode_files, args.repeat)
+        fast_time, fast_episodes = time_loader(load_episode_file, episode_files, args.repeat)
+        print(f"episodes  frontmatter.load:  {ref_time * 1000:8.1f} ms")
+        print(f"episodes  load_episode_file: {fast_time * 1000:8.1f} ms  (x{ref_time / fast_time:.1f})")
+
+        ref_header_time, ref_headers = time_loader(load_header_reference, episode_files, args.repeat)
+        scan_time, scan_headers = time_loader(scan_episode_header, episode_files, args.repeat)
+        print(f"headers   frontmatter.load:  {ref_header_time * 1000:8.1f} ms")
+        print(f"headers   scan_episode_header: {scan_time * 1000:6.1f} ms  (x{ref_header_time / scan_time:.1f})")
+
+        ref_info_time, ref_infos = time_loader(load_info_reference, info_files, args.repeat)
+        fast_info_time, fast_infos = time_loader(load_info_file, info_files, args.repeat)
+        print(f"info.yml  yaml.safe_load:    {ref_info_time * 1000:8.1f} ms")
+        print(f"info.yml  load_info_file:    {fast_info_time * 1000:8.1f} ms  (x{ref_info_time / fast_info_time:.1f})")
+
+        mismatches = compare("episode", episode_files, ref_episodes, fast_episodes)
+        mismatches += compare("header", episode_files, ref_headers, scan_headers)
+        mismatches += compare("info", info_files, ref_infos, fast_infos)
+
+    if mismatches:
+        print(f"❌ {mismatches} file(s) parsed differently")
+        sys.exit(1)
+    print("✅ All files parsed identically")
+
+if __name__ == "__main__":
+    main()
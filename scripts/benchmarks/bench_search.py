@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+全文検索インデックス（search_index.py）のベンチマーク
+生成したコーパスから全件構築・一部エピソードの差分更新と削除・検索の所要時間を計測し、
+検索結果が全文書を走査した結果と一致することも確認する（不一致があれば終了コード1）
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_corpus import generate_corpus
+from manuscript_io import load_episode_file, load_info_file
+from search_index import (
+    episode_text,
+    load_index,
+    normalize,
+    novel_text,
+    remove_document,
+    save_index,
+    search,
+    tokenize,
+    update_document,
+)
+
+DEFAULT_QUERIES = ["図書室", "二つの月", "魔法の存在", "ベンチマーク小説0003", "異世界", "光に包まれ", "存在しない語句"]
+
+def load_documents(data_dir):
+    """コーパスを読み込み (キー, テキスト, メタデータ) のリストを返す"""
+    documents = []
+    for info_file in sorted(Path(data_dir).glob("*/manuscript/info.yml")):
+        info = load_info_file(info_file)
+        info["summary"] = info.pop("description", None)
+        novel_id = info_file.parent.parent.name
+        documents.append((f"novel:{novel_id}", novel_text(info),
+                          {"type": "novel", "novel_id": novel_id, "title": info["title"]}))
+        for episode_file in sorted(info_file.parent.glob("*.md")):
+            metadata, content = load_episode_file(episode_file)
+            episode = {"id": metadata["id"], "title": metadata["title"], "content": content}
+            documents.append((f"episode:{metadata['id']}", episode_text(episode),
+                              {"type": "episode", "episode_id": metadata["id"], "title": metadata["title"]}))
+    return documents
+
+def document_key(meta):
+    """検索結果のメタデータから文書のキーを作る"""
+    if meta["type"] == "novel":
+        return f"novel:{meta['novel_id']}"
+    return f"episode:{meta['episode_id']}"
+
+def directory_size(path):
+    """ディレクトリ内のファイルサイズの合計"""
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+def brute_force(documents, query):
+    """全文書を走査してクエリのbigramを全て含む文書のキーを返す"""
+    grams = tokenize(query)
+    if not grams:
+        return set()
+    return {key for key, text, _ in documents if grams <= tokenize(text)}
+
+def percentile(values, ratio):
+    """values の ratio 分位点"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+def time_queries(index_dir, queries, repeat, cold):
+    """各クエリの所要時間[ms]のリスト（cold の場合は毎回インデックスを読み込み直す）"""
+    index = load_index(index_dir)
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            if cold:
+                index = load_index(index_dir)
+            search(index, query, limit=None)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="全文検索インデックスのベンチマーク")
+    parser.add_argument("--novels", type=int, default=10, help="生成する作品数")
+    parser.add_argument("--episodes", type=int, default=100, help="作品あたりのエピソード数")
+    parser.add_argument("--body-chars", type=int, default=3000, help="本文のおおよその文字数")
+    parser.add_argument("--changed", type=float, default=0.01, help="差分更新で書き換えるエピソードの割合")
+    parser.add_argument("--repeat", type=int, default=20, help="検索の繰り返し回数")
+    parser.add_argument("--query", action="append", help="検索語（複数指定可、デフォルトは組み込みのクエリ）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+    queries = args.query or DEFAULT_QUERIES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, "corpus")
+        index_dir = os.path.join(tmp_dir, "index")
+        generate_corpus(data_dir, args.novels, args.episodes, body_chars=args.body_chars,
+                        status_mix="new=1", seed=args.seed)
+        documents = load_documents(data_dir)
+        print(f"Corpus: {len(documents)} documents ({args.novels} novels × {args.episodes} episodes)")
+
+        # 全件構築
+        index = load_index(index_dir)
+        started = time.perf_counter()
+        for key, text, meta in documents:
+            update_document(index, key, text, meta)
+        build_time = time.perf_counter() - started
+        started = time.perf_counter()
+        save_index(index)
+        save_time = time.perf_counter() - started
+        print(f"build        {build_time * 1000:8.1f} ms  (save {save_time * 1000:.1f} ms, "
+              f"{directory_size(index_dir) / 1024:.1f} KB on disk)")
+
+        # 同じ内容で再実行（ハッシュが一致するので何も書き換えない）
+        index = load_index(index_dir)
+        started = time.perf_counter()
+        unchanged = sum(update_document(index, key, text, meta) for key, text, meta in documents)
+        saved = save_index(index)
+        print(f"no-op        {(time.perf_counter() - started) * 1000:8.1f} ms  "
+              f"({unchanged} documents updated, saved={saved})")
+
+        # 一部のエピソードだけ書き換えて差分更新
+        rng = random.Random(args.seed)
+        episodes = [i for i, (key, _, _) in enumerate(documents) if key.startswith("episode:")]
+        changed = rng.sample(episodes, max(1, int(len(episodes) * args.changed)))
+        for i in changed:
+            key, text, meta = documents[i]
+            documents[i] = (key, text + f"\n差分更新{i}で追記した文章。", meta)
+        index = load_index(index_dir)
+        started = time.perf_counter()
+        for i in changed:
+            update_document(index, *documents[i])
+        shards = len(index["dirty_shards"])
+        save_index(index)
+        print(f"incremental  {(time.perf_counter() - started) * 1000:8.1f} ms  "
+              f"({len(changed)} episodes, {shards} shards rewritten)")
+
+        # 書き換えていないエピソードを同じ件数だけ削除
+        removed = set(rng.sample([documents[i][0] for i in episodes if i not in changed], len(changed)))
+        index = load_index(index_dir)
+        started = time.perf_counter()
+        for key in removed:
+            remove_document(index, key)
+        shards = len(index["dirty_shards"])
+        save_index(index)
+        print(f"remove       {(time.perf_counter() - started) * 1000:8.1f} ms  "
+              f"({len(removed)} episodes, {shards} shards rewritten)")
+        documents = [document for document in documents if document[0] not in removed]
+
+        # 検索
+        for label, cold in (("query cold", True), ("query warm", False)):
+            timings = time_queries(index_dir, queries, args.repeat, cold)
+            print(f"{label}   p50 {percentile(timings, 0.5):6.2f} ms  p95 {percentile(timings, 0.95):6.2f} ms")
+
+        # 全文書の走査と結果を比較
+        index = load_index(index_dir)
+        mismatches = 0
+        for query in queries + [f"差分更新{changed[0]}"]:
+            expected = brute_force(documents, query)
+            actual = {document_key(meta) for meta in search(index, query, limit=None)}
+            exact = sum(1 for key, text, _ in documents if key in expected and normalize(query) in normalize(text))
+            print(f"  {query!r}: {len(actual)} hits ({exact} contain the exact phrase)")
+            if actual != expected:
+                mismatches += 1
+                print(f"❌ mismatch for {query!r}: index {len(actual)} documents, scan {len(expected)}")
+
+    if mismatches:
+        print(f"❌ {mismatches} queries returned different results")
+        sys.exit(1)
+    print("✅ Index results match a full scan")
+
+if __name__ == "__main__":
+    main()
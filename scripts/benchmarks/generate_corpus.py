@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用の小説データを生成するスクリプト
+データリポジトリと同じ構成（<書名>/manuscript/info.yml, *.md）で N作品 × Mエピソードを出力する
+"""
+
+import sys
+import random
+import argparse
+from pathlib import Path
+
+# 本文の段落に使う文（ルビ記法を含む）
+SENTENCES = [
+    "　｜俺《おれ》の名前は田中太郎、ごく普通の高校生だった。",
+    "　その日の放課後、｜図書室《としょしつ》で古い本を見つけた。",
+    "　ページを開いた瞬間、目の前が真っ白な光に包まれた。",
+    "　「ここは……どこだ？」",
+    "　見上げた空には、二つの月が浮かんでいた。",
+    "　｜魔法《まほう》の存在するこの世界で、俺は生きていくしかない。",
+]
+
+# --tricky で追加する、原稿パーサーの高速経路が誤解析しやすい書き方のファイル
+TRICKY_EPISODES = {
+    "unquoted.md": "---\nid: ep-x1\ntitle: クォートなしのタイトル\nepisode_number: 1\nstatus: published\n---\n\n本文\n",
+    "date.md": '---\nid: "ep-x2"\ntitle: "日付"\nepisode_number: 2\npublished_at: 2024-01-15\n---\n本文\n',
+    "comment.md": '---\n# コメント行\nid: "ep-x3" # 行末コメント\ntitle: "コメント"\nepisode_number: 3\n---\n本文\n',
+    "list.md": '---\nid: "ep-x4"\ntitle: "リスト"\ntags:\n  - a\n  - b\n---\n本文\n',
+    "bool.md": '---\nid: "ep-x5"\ntitle: "真偽値"\ndraft: true\nnote: ~\nflag: on\n---\n本文\n',
+    "no_frontmatter.md": "# 見出しだけのファイル\n\n本文\n",
+    "crlf.md": '---\r\nid: "ep-x7"\r\ntitle: "改行コード"\r\nepisode_number: 7\r\n---\r\n\r\n一行目\r\n二行目\r\n',
+    "bom.md": '\ufeff---\nid: "ep-x8"\ntitle: "BOM付き"\nepisode_number: 8\n---\n本文\n',
+    "hr.md": '---\nid: "ep-x9"\ntitle: "区切り線"\nepisode_number: 9\n---\n前半\n\n---\n\n後半\n',
+    "escaped.md": '---\nid: "ep-x10"\ntitle: "エスケープ \\"引用\\" \\u3042"\nepisode_number: 10\n---\n本文\n',
+    "single.md": "---\nid: 'ep-x11'\ntitle: 'It''s'\nepisode_number: 011\n---\n本文\n",
+    "unclosed.md": '---\nid: "ep-x12"\ntitle: "閉じなし"\n',
+    "empty_body.md": '---\nid: "ep-x13"\ntitle: "本文なし"\nepisode_number: 13\n---\n',
+    "ideographic_space.md": '---\nid: "ep-x14"\ntitle: "全角空白"\nepisode_number: 14\n---\n\u3000\u3000本文\u3000\n',
+    "leading_blank.md": '\n\n---\nid: "ep-x15"\ntitle: "先頭の空行"\n---\n本文\n',
+    "scalar_header.md": "---\nただの文字列\n---\n本文\n",
+    "blank_body.md": '---\nid: "ep-x16"\ntitle: "空白だけの本文"\n---\n\u3000\n\u3000\u3000\n \t\n',
+    "nbsp_body.md": '---\nid: "ep-x17"\ntitle: "NBSPだけの本文"\n---\n\u00a0\u2003\n',
+    "dash_in_header.md": '---\nid: "ep-x18"\ntitle: "区切りでない行"\nnote: |\n  ---x\n---\n本文\n',
+    "lone_cr.md": '---\rid: "ep-x19"\rtitle: "CRのみ"\r---\r本文\r',
+    "dash_heavy.md": '----\nid: "ep-x20"\ntitle: "長い区切り"\n-----   \n\n本文\n',
+    "ideographic_space_line.md": '---\nid: "ep-x21"\n\u3000\ntitle: "ヘッダーの全角空白行"\n---\n本文\n',
+    "nbsp_line.md": '---\nid: "ep-x22"\n\u00a0\ntitle: "ヘッダーのNBSP行"\n---\n本文\n',
+    "tab_line.md": '---\nid: "ep-x23"\n\t\ntitle: "ヘッダーのタブ行"\n---\n本文\n',
+    "duplicate_key.md": '---\nid: "ep-x24"\ntitle: "重複キー"\ntitle: "後勝ち"\n---\n本文\n',
+    "special_key.md": '---\nid: "ep-x25"\nyes: "真偽値のキー"\n---\n本文\n',
+}
+
+TRICKY_INFOS = {
+    "info.yml": 'title: "作品"\nauthor: "作者"\nstatus: "published"\ntags:\n  - ファンタジー\ncreated_at: 2024-01-01\n',
+}
+
+# --tricky のファイルを置くディレクトリ（原稿ディレクトリとして扱われないよう manuscript/ の外に置く）
+TRICKY_DIR = "tricky"
+
+DEFAULT_STATUS_MIX = "new=70,updated=15,deleted=10,draft=5"
+
+# 既存小説のID（スタブの自動採番と重ならないよう大きな値から振る）
+EXISTING_NOVEL_ID_BASE = 100000
+
+def parse_status_mix(value):
+    """new=70,updated=15 形式の文字列を (status, 重み) のリストにする"""
+    mix = []
+    for item in value.split(","):
+        status, _, weight = item.partition("=")
+        status = status.strip()
+        if status not in ("new", "updated", "deleted", "draft"):
+            raise ValueError(f"unknown status '{status}'")
+        mix.append((status, float(weight or 1)))
+    if not mix or sum(weight for _, weight in mix) <= 0:
+        raise ValueError("status mix must have a positive weight")
+    return mix
+
+def make_body(rng, chars):
+    """おおよそ chars 文字の本文を作る（段落は空行区切り）"""
+    paragraphs = []
+    length = 0
+    while length < chars:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return "\n\n".join(paragraphs)
+
+def write_info(manuscript_dir, index, novel_id=None):
+    """info.yml を書き出す（novel_id を指定すると updated: true の既存小説になる）"""
+    lines = []
+    if novel_id is not None:
+        lines.append(f"id: {novel_id}")
+    lines += [
+        f'title: "ベンチマーク小説{index:04d}"',
+        f'author: "作者{index % 17}"',
+        "description: |",
+        f"  ベンチマーク用に生成された{index}番目の小説です。",
+        'genre: "ファンタジー"',
+        "tags:",
+        '  - "異世界"',
+        '  - "冒険"',
+        'status: "連載中"',
+        "published: true",
+        f"updated: {'true' if novel_id is not None else 'false'}",
+        'created_at: "2025-07-13"',
+    ]
+    (manuscript_dir / "info.yml").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+def write_episode(manuscript_dir, novel_index, number, status, body, id_prefix="bench"):
+    """エピソードファイルを書き出す"""
+    text = (
+        "---\n"
+        f'id: "{id_prefix}-{novel_index:04d}-ep{number:04d}"\n'
+        f'title: "第{number}話"\n'
+        f"episode_number: {number}\n"
+        'published_at: "2025-07-13"\n'
+        f'status: "{status}"\n'
+        "---\n\n"
+        f"{body}\n"
+    )
+    (manuscript_dir / f"{number:04d}.md").write_text(text, encoding="utf-8")
+
+def write_tricky_files(output_dir):
+    """パーサー検証用のファイルを TRICKY_DIR に書き出す"""
+    tricky_dir = Path(output_dir) / TRICKY_DIR
+    tricky_dir.mkdir(parents=True, exist_ok=True)
+    for name, text in {**TRICKY_EPISODES, **TRICKY_INFOS}.items():
+        (tricky_dir / name).write_bytes(text.encode("utf-8"))
+
+def generate_corpus(output_dir, novels, episodes, body_chars=3000, body_jitter=0.5,
+                    status_mix=DEFAULT_STATUS_MIX, existing_novels=0.0, seed=0, id_prefix="bench",
+                    tricky=False):
+    """コーパスを生成し、ステータスごとのエピソード数を返す
+
+    existing_novels の割合の小説には id と updated: true を付け、既存小説の更新として扱わせる。
+    id_prefix はエピソードIDの接頭辞（複数のコーパスを同じデータベースに同期する場合に分ける）。
+    tricky を指定すると TRICKY_DIR にパーサー検証用のファイルも書き出す。
+    """
+    rng = random.Random(seed)
+    mix = parse_status_mix(status_mix)
+    statuses = [status for status, _ in mix]
+    weights = [weight for _, weight in mix]
+    counts = {status: 0 for status in statuses}
+
+    output_path = Path(output_dir)
+    for n in range(1, novels + 1):
+        manuscript_dir = output_path / f"novel{n:04d}" / "manuscript"
+        manuscript_dir.mkdir(parents=True, exist_ok=True)
+        existing = rng.random() < existing_novels
+        write_info(manuscript_dir, n, novel_id=EXISTING_NOVEL_ID_BASE + n if existing else None)
+        for e in range(1, episodes + 1):
+            status = rng.choices(statuses, weights)[0]
+            counts[status] += 1
+            chars = max(1, int(body_chars * rng.uniform(1 - body_jitter, 1 + body_jitter)))
+            write_episode(manuscript_dir, n, e, status, make_body(rng, chars), id_prefix)
+    if tricky:
+        write_tricky_files(output_path)
+    return counts
+
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="ベンチマーク用の小説データを生成")
+    parser.add_argument("output_dir", help="出力先ディレクトリ")
+    parser.add_argument("--novels", type=int, default=10, help="作品数")
+    parser.add_argument("--episodes", type=int, default=100, help="作品あたりのエピソード数")
+    parser.add_argument("--body-chars", type=int, default=3000, help="本文のおおよその文字数")
+    parser.add_argument("--body-jitter", type=float, default=0.5, help="本文の長さのばらつき（0〜1の割合）")
+    parser.add_argument("--status-mix", default=DEFAULT_STATUS_MIX,
+                        help=f"エピソードのstatusの比率（デフォルト: {DEFAULT_STATUS_MIX}）")
+    parser.add_argument("--existing-novels", type=float, default=0.0,
+                        help="id と updated: true を持つ既存小説の割合（0〜1）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--id-prefix", default="bench", help="エピソードIDの接頭辞")
+    parser.add_argument("--tricky", action="store_true",
+                        help=f"原稿パーサーの検証用ファイルを {TRICKY_DIR}/ に追加する")
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_args()
+    if Path(args.output_dir).exists() and any(Path(args.output_dir).iterdir()):
+        print(f"❌ Output directory {args.output_dir} is not empty")
+        sys.exit(1)
+    try:
+        counts = generate_corpus(
+            args.output_dir,
+            args.novels,
+            args.episodes,
+            body_chars=args.body_chars,
+            body_jitter=args.body_jitter,
+            status_mix=args.status_mix,
+            existing_novels=args.existing_novels,
+            id_prefix=args.id_prefix,
+            seed=args.seed,
+            tricky=args.tricky,
+        )
+    except ValueError as e:
+        print(f"❌ Invalid --status-mix: {e}")
+        sys.exit(1)
+    summary = ", ".join(f"{status}={count}" for status, count in counts.items())
+    print(f"✅ Generated {args.novels} novels × {args.episodes} episodes in {args.output_dir} ({summary})")
+
+if __name__ == "__main__":
+    main()
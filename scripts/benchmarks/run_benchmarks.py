@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+validate_data.py / sync_supabase.py のベンチマークを実行するスクリプト
+生成したコーパス（または既存のデータディレクトリ）に対して各スクリプトを実行し、
+実行時間・リクエスト数・送信バイト数・ピークRSSを出力する
+同期先はローカルのPostgREST互換スタブ（stub_postgrest.py）なのでSupabaseは不要
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from generate_corpus import DEFAULT_STATUS_MIX, generate_corpus
+from stub_postgrest import start_server
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+def run_script(args, env):
+    """スクリプトを子プロセスで実行し (終了コード, 実行時間, ピークRSS[MB], 出力) を返す
+
+    ピークRSSは os.wait4 の rusage から取得する。子プロセスが待ち合わせた孫プロセス
+    （解析用のワーカー）も含め、最も大きかった1プロセスの値になる。
+    """
+    with tempfile.TemporaryFile() as output:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, *args],
+            env=env,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+        _, status, rusage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - started
+        # wait4で回収済みなのでPopen側で再度waitしないようにする
+        process.returncode = os.waitstatus_to_exitcode(status)
+        output.seek(0)
+        text = output.read().decode("utf-8", errors="replace")
+    # Linuxの ru_maxrss はKB単位
+    return process.returncode, elapsed, rusage.ru_maxrss / 1024, text
+
+def bench_validate(data_dir, repeat):
+    """validate_data.py を repeat 回実行して結果を返す"""
+    env = dict(os.environ)
+    env.pop("NOVEL_PARSE_CACHE", None)
+    results = []
+    for _ in range(repeat):
+        code, elapsed, rss, output = run_script([str(SCRIPTS_DIR / "validate_data.py"), str(data_dir)], env)
+        results.append({
+            "script": "validate_data.py",
+            "args": "",
+            "exit_code": code,
+            "wall_time": elapsed,
+            "requests": 0,
+            "throttled": 0,
+            "bytes_sent": 0,
+            "peak_rss_mb": rss,
+            "output": output,
+        })
+    return results
+
+def sync_env(server):
+    """スタブサーバーに同期させる環境変数"""
+    env = dict(os.environ)
+    env.pop("NOVEL_PARSE_CACHE", None)
+    env["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    env["SUPABASE_SERVICE_ROLE_KEY"] = "benchmark"
+    return env
+
+def bench_sync(data_dir, sync_args, repeat, server, state):
+    """スタブサーバーに対して sync_supabase.py を repeat 回実行して結果を返す（毎回テーブルは空から）"""
+    env = sync_env(server)
+    results = []
+    for _ in range(repeat):
+        state.reset()
+        # 失敗した実行のジャーナルが次の実行に影響しないよう、毎回別の場所に書かせる
+        with tempfile.TemporaryDirectory() as journal_dir:
+            env["SYNC_JOURNAL"] = os.path.join(journal_dir, "sync-journal.jsonl")
+            code, elapsed, rss, output = run_script(
+                [str(SCRIPTS_DIR / "sync_supabase.py"), str(data_dir), *shlex.split(sync_args)],
+                env,
+            )
+        results.append({
+            "script": "sync_supabase.py",
+            "args": sync_args,
+            "exit_code": code,
+            "wall_time": elapsed,
+            "requests": state.stats["requests"],
+            "throttled": state.stats["throttled"],
+            "bytes_sent": state.stats["bytes_received"],
+            "peak_rss_mb": rss,
+            "rows": {name: len(rows) for name, rows in state.tables.items()},
+            "output": output,
+        })
+    return results
+
+def bench_sync_repos(repo_dirs, manifest, sync_args, repeat, server, state):
+    """複数のリポジトリを1つずつ順に同期した場合（別々のジョブ）と --repos でまとめて同期した場合を比べる
+
+    1つずつの場合は全リポジトリの合計（実行時間・リクエスト数）とピークRSSの最大値を1行にまとめる。
+    """
+    env = sync_env(server)
+    results = []
+    for _ in range(repeat):
+        for label, runs in (
+            (f"{len(repo_dirs)} separate runs", [[str(d)] for d in repo_dirs]),
+            ("--repos", [["--repos", str(manifest)]]),
+        ):
+            state.reset()
+            result = {"script": "sync_supabase.py", "args": f"{label} {sync_args}".strip(), "exit_code": 0,
+                      "wall_time": 0.0, "peak_rss_mb": 0.0, "output": ""}
+            for target in runs:
+                with tempfile.TemporaryDirectory() as journal_dir:
+                    env["SYNC_JOURNAL"] = os.path.join(journal_dir, "sync-journal.jsonl")
+                    code, elapsed, rss, output = run_script(
+                        [str(SCRIPTS_DIR / "sync_supabase.py"), *target, *shlex.split(sync_args)],
+                        env,
+                    )
+                result["exit_code"] = result["exit_code"] or code
+                result["wall_time"] += elapsed
+                result["peak_rss_mb"] = max(result["peak_rss_mb"], rss)
+                result["output"] += output
+            result.update(
+                requests=state.stats["requests"],
+                throttled=state.stats["throttled"],
+                bytes_sent=state.stats["bytes_received"],
+                rows={name: len(rows) for name, rows in state.tables.items()},
+            )
+            results.append(result)
+    return results
+
+def print_results(results):
+    """結果を表形式で出力"""
+    print(f"{'script':<18} {'args':<28} {'exit':>4} {'wall[s]':>8} {'requests':>8} {'429':>5} {'sent[KB]':>10} {'rss[MB]':>8}")
+    for result in results:
+        print(
+            f"{result['script']:<18} {result['args'][:28]:<28} {result['exit_code']:>4} "
+            f"{result['wall_time']:>8.2f} {result['requests']:>8} {result['throttled']:>5} "
+            f"{result['bytes_sent'] / 1024:>10.1f} {result['peak_rss_mb']:>8.1f}"
+        )
+
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="同期・検証スクリプトのベンチマーク")
+    parser.add_argument("--data-dir", help="既存のデータディレクトリを使う（指定しない場合はコーパスを生成）")
+    parser.add_argument("--novels", type=int, default=10, help="生成する作品数")
+    parser.add_argument("--episodes", type=int, default=100, help="作品あたりのエピソード数")
+    parser.add_argument("--body-chars", type=int, default=3000, help="本文のおおよその文字数")
+    parser.add_argument("--status-mix", default=DEFAULT_STATUS_MIX, help="エピソードのstatusの比率")
+    parser.add_argument("--existing-novels", type=float, default=0.0, help="既存小説（updated: true）の割合")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--repos", type=int, default=0,
+                        help="指定した数のリポジトリ（それぞれ --novels × --episodes）を生成し、1つずつの同期と --repos の同期を比べる")
+    parser.add_argument("--latency", type=float, default=0.0, help="スタブの1リクエストあたりの応答遅延（秒）")
+    parser.add_argument("--latency-per-kb", type=float, default=0.0, help="スタブの本文1KBあたりの追加の応答遅延（秒）")
+    parser.add_argument("--max-concurrent", type=int, help="スタブが同時に処理するリクエスト数の上限（超えた分は429）")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="スタブが429で返すRetry-Afterの秒数")
+    parser.add_argument("--repeat", type=int, default=1, help="各スクリプトの実行回数")
+    parser.add_argument(
+        "--sync-args",
+        action="append",
+        help="sync_supabase.py に渡す引数（複数指定で設定ごとに比較、例: --sync-args '--workers 1'）",
+    )
+    parser.add_argument("--skip-validate", action="store_true", help="validate_data.py を実行しない")
+    parser.add_argument("--skip-sync", action="store_true", help="sync_supabase.py を実行しない")
+    parser.add_argument("--json-out", help="結果をJSONで書き出すパス")
+    parser.add_argument("--show-output", action="store_true", help="失敗していない実行のログも表示する")
+    args = parser.parse_args()
+    if args.repos and (args.data_dir or args.existing_novels):
+        # 既存小説のIDはコーパスごとに同じ値になり、リポジトリ間で重複する
+        parser.error("--repos cannot be combined with --data-dir or --existing-novels")
+    return args
+
+def generate_repos(tmp_dir, args):
+    """--repos 個のコーパスとマニフェストを生成し (リポジトリのディレクトリのリスト, マニフェストのパス) を返す"""
+    repo_dirs = []
+    for k in range(1, args.repos + 1):
+        repo_dir = Path(tmp_dir) / f"repo{k:02d}"
+        generate_corpus(repo_dir, args.novels, args.episodes, body_chars=args.body_chars,
+                        status_mix=args.status_mix, seed=args.seed + k, id_prefix=f"repo{k:02d}")
+        repo_dirs.append(repo_dir)
+    manifest = Path(tmp_dir) / "repos.yml"
+    manifest.write_text("repos:\n" + "".join(f"  - path: {d.name}\n" for d in repo_dirs), encoding="utf-8")
+    print(f"📚 Generated {args.repos} repositories × {args.novels} novels × {args.episodes} episodes")
+    return repo_dirs, manifest
+
+def main():
+    """メイン処理"""
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.repos:
+            repo_dirs, manifest = generate_repos(tmp_dir, args)
+            data_dir = repo_dirs[0]
+        elif args.data_dir:
+            data_dir = Path(args.data_dir)
+        else:
+            data_dir = Path(tmp_dir) / "corpus"
+            counts = generate_corpus(
+                data_dir,
+                args.novels,
+                args.episodes,
+                body_chars=args.body_chars,
+                status_mix=args.status_mix,
+                existing_novels=args.existing_novels,
+                seed=args.seed,
+            )
+            summary = ", ".join(f"{status}={count}" for status, count in counts.items())
+            print(f"📚 Generated {args.novels} novels × {args.episodes} episodes ({summary})")
+
+        results = []
+        if not args.skip_validate:
+            results += bench_validate(data_dir, args.repeat)
+        if not args.skip_sync:
+            server, state = start_server(0, args.latency, latency_per_kb=args.latency_per_kb,
+                                         max_concurrent=args.max_concurrent, retry_after=args.retry_after)
+            try:
+                for sync_args in args.sync_args or [""]:
+                    if args.repos:
+                        results += bench_sync_repos(repo_dirs, manifest, sync_args, args.repeat, server, state)
+                    else:
+                        results += bench_sync(data_dir, sync_args, args.repeat, server, state)
+            finally:
+                server.shutdown()
+
+    for result in results:
+        if result["exit_code"] != 0 or args.show_output:
+            print(f"--- {result['script']} {result['args']} (exit {result['exit_code']}) ---")
+            print(result["output"][-4000:])
+
+    print_results(results)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(
+                [{k: v for k, v in result.items() if k != "output"} for result in results],
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"📝 Wrote results to {args.json_out}")
+
+    if any(result["exit_code"] != 0 for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用のPostgREST互換スタブサーバー
+/rest/v1/novels・/rest/v1/episodes・/rest/v1/episode_pages をメモリ上のテーブルで模倣する
+/api/revalidate はページ再生成のWebhook（sync_supabase.py の --revalidate-url）として受け取ったパスを記録する
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+TABLES = ("novels", "episodes", "episode_pages")
+
+REVALIDATE_PATH = "/api/revalidate"
+
+# id 以外を主キーとするテーブル
+PRIMARY_KEYS = {"episode_pages": ("episode_id", "page_number")}
+
+# 親テーブルの行を削除したときに削除する子テーブル（ON DELETE CASCADE）
+CASCADES = {"episodes": [("episode_pages", "episode_id")]}
+
+def row_key(table, record):
+    """行のキー（主キーの値を連結した文字列）"""
+    return "\x1f".join(str(record[column]) for column in PRIMARY_KEYS.get(table, ("id",)))
+
+def parse_in_filter(value):
+    """in.("a","b") 形式のフィルタ値をリストに戻す"""
+    body = value[len("in.("):-1]
+    return [
+        match.group(1).replace('\\"', '"').replace("\\\\", "\\") if match.group(1) is not None else match.group(2)
+        for match in re.finditer(r'"((?:[^"\\]|\\.)*)"|([^,]+)', body)
+    ]
+
+class StubState:
+    """テーブル内容とリクエスト統計（バイト数はリクエスト・レスポンスの本文のみ）"""
+
+    def __init__(self, latency=0.0, latency_per_kb=0.0, max_concurrent=None, retry_after=0.5):
+        self.latency = latency
+        # 本文1KBあたりの追加の遅延（大きいバッチほど応答が遅くなるゲートウェイの再現用）
+        self.latency_per_kb = latency_per_kb
+        # 同時に処理中のリクエストがこれを超えたら429を返す（混雑したゲートウェイの再現用）
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        # 設定した場合、Webhook は Authorization: Bearer <secret> のリクエストだけを受け付ける
+        self.revalidate_secret = None
+        self.lock = threading.RLock()
+        self.fail_status = 503
+        self.active = 0
+        self.reset()
+
+    def reset(self):
+        """テーブルと統計を初期化（ベンチマークの実行ごとに呼ぶ）"""
+        with self.lock:
+            self.tables = {name: {} for name in TABLES}
+            self.next_novel_id = 1
+            self.fail_next = 0
+            self.fail_after = None
+            self.revalidated = []  # Webhook で受け取った {"type", "paths"}
+            self.stats = {"requests": 0, "bytes_received": 0, "bytes_sent": 0, "by_method": {},
+                          "throttled": 0, "max_active": 0}
+
+    def record(self, method, received, sent):
+        """リクエスト1件分の統計を記録"""
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_received"] += received
+            self.stats["bytes_sent"] += sent
+            self.stats["by_method"][method] = self.stats["by_method"].get(method, 0) + 1
+
+def make_handler(state):
+    """state を参照するリクエストハンドラーのクラスを作る"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _route(self):
+            parts = urlsplit(self.path)
+            match = re.fullmatch(r"/rest/v1/(\w+)", parts.path)
+            if not match or match.group(1) not in TABLES:
+                return None, []
+            return match.group(1), parse_qsl(parts.query, keep_blank_values=True)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            return raw, (json.loads(raw) if raw else None)
+
+        def _send(self, method, status, payload, received):
+            body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            state.record(method, received, len(body))
+
+        def _filters(self, params):
+            filters = []
+            for key, value in params:
+                if key in ("select", "on_conflict", "limit", "offset", "order"):
+                    continue
+                if value.startswith("eq."):
+                    filters.append((key, lambda v, expected=value[3:]: str(v) == expected))
+                elif value.startswith("in.("):
+                    filters.append((key, lambda v, values=set(parse_in_filter(value)): str(v) in values))
+                elif value.startswith("gt."):
+                    filters.append((key, lambda v, bound=float(value[3:]): v is not None and float(v) > bound))
+            return filters
+
+        @staticmethod
+        def _matches(row, filters):
+            return all(test(row.get(key)) for key, test in filters)
+
+        def _send_error(self, method, status, retry_after, received):
+            self.send_response(status)
+            self.send_header("Retry-After", str(retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            state.record(method, received, 0)
+
+        def _handle(self, method):
+            """同時処理数の上限を超えたリクエストは429で断り、それ以外は遅延を入れてから処理する"""
+            table, params = self._route()
+            raw, payload = self._body()
+            with state.lock:
+                state.active += 1
+                state.stats["max_active"] = max(state.stats["max_active"], state.active)
+                throttled = state.max_concurrent is not None and state.active > state.max_concurrent
+                if throttled:
+                    state.stats["throttled"] += 1
+            try:
+                if throttled:
+                    return self._send_error(method, 429, state.retry_after, len(raw))
+                delay = state.latency + state.latency_per_kb * len(raw) / 1024
+                if delay:
+                    time.sleep(delay)
+                return self._process(method, table, params, raw, payload)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+        def _process(self, method, table, params, raw, payload):
+            """PostgRESTの挙動（INSERT/UPSERT/PATCH/DELETE/GET）を最小限に再現する"""
+            # fail_next が残っている間は fail_status を返す（リトライの確認用）
+            # fail_after 件目以降は全て失敗させる（障害で同期が中断した状態の再現用）
+            with state.lock:
+                inject = state.fail_next > 0
+                if inject:
+                    state.fail_next -= 1
+                elif state.fail_after is not None and state.stats["requests"] >= state.fail_after:
+                    inject = True
+            if inject:
+                return self._send_error(method, state.fail_status, 0.2, len(raw))
+            if urlsplit(self.path).path == REVALIDATE_PATH and method == "POST":
+                return self._revalidate(method, raw, payload)
+            if table is None:
+                return self._send(method, 404, {"message": "not found"}, len(raw))
+            prefer = self.headers.get("Prefer", "")
+            want_rows = "return=representation" in prefer
+            rows = state.tables[table]
+
+            with state.lock:
+                if method == "GET":
+                    filters = self._filters(params)
+                    found = [row for _, row in sorted(rows.items()) if self._matches(row, filters)]
+                    options = dict(params)
+                    offset = int(options.get("offset", 0))
+                    limit = int(options.get("limit", len(found)))
+                    found = found[offset:offset + limit]
+                    if "select" in options and options["select"] != "*":
+                        columns = options["select"].split(",")
+                        found = [{c: row.get(c) for c in columns} for row in found]
+                    return self._send(method, 200, found, len(raw))
+
+                if method == "POST":
+                    records = payload if isinstance(payload, list) else [payload]
+                    upsert = "resolution=merge-duplicates" in prefer
+                    ignore = "resolution=ignore-duplicates" in prefer
+                    # 1リクエストは1トランザクション（重複で失敗したら何も書き込まない）
+                    staged = {}
+                    next_novel_id = state.next_novel_id
+                    written = []
+                    for record in records:
+                        record = dict(record)
+                        if table == "novels" and record.get("id") is None:
+                            record["id"] = next_novel_id
+                            next_novel_id += 1
+                        key = row_key(table, record)
+                        if key in rows or key in staged:
+                            if ignore:
+                                continue
+                            if not upsert:
+                                return self._send(method, 409, {"message": f"duplicate key {key}"}, len(raw))
+                            staged[key] = {**staged.get(key, rows.get(key)), **record}
+                        else:
+                            staged[key] = record
+                        written.append(key)
+                    rows.update(staged)
+                    state.next_novel_id = next_novel_id
+                    return self._send(method, 201, [rows[key] for key in written] if want_rows else None, len(raw))
+
+                filters = self._filters(params)
+                targets = [key for key, row in rows.items() if self._matches(row, filters)]
+                if method == "PATCH":
+                    for key in targets:
+                        rows[key].update(payload)
+                    return self._send(method, 200, [rows[k] for k in targets] if want_rows else None, len(raw))
+                if method == "DELETE":
+                    for key in targets:
+                        removed = rows.pop(key)
+                        for child, column in CASCADES.get(table, []):
+                            child_rows = state.tables[child]
+                            for child_key in [k for k, row in child_rows.items() if row.get(column) == removed.get("id")]:
+                                del child_rows[child_key]
+                    return self._send(method, 204, None, len(raw))
+
+        def _revalidate(self, method, raw, payload):
+            """Webhook で受け取ったパスを記録する（Next.js の revalidatePath を呼ぶ代わり）"""
+            if state.revalidate_secret and self.headers.get("Authorization") != f"Bearer {state.revalidate_secret}":
+                return self._send(method, 401, {"message": "invalid secret"}, len(raw))
+            with state.lock:
+                state.revalidated.append(payload)
+            return self._send(method, 200, {"revalidated": len(payload["paths"])}, len(raw))
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+        def do_DELETE(self):
+            self._handle("DELETE")
+
+    return Handler
+
+def start_server(port=0, latency=0.0, **throttle):
+    """バックグラウンドスレッドでスタブサーバーを起動し (server, state) を返す（throttle は StubState の混雑の設定）"""
+    state = StubState(latency=latency, **throttle)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PostgREST互換のスタブサーバー")
+    parser.add_argument("--port", type=int, default=54321, help="待ち受けポート")
+    parser.add_argument("--latency", type=float, default=0.0, help="1リクエストあたりの応答遅延（秒）")
+    parser.add_argument("--latency-per-kb", type=float, default=0.0, help="本文1KBあたりの追加の応答遅延（秒）")
+    parser.add_argument("--max-concurrent", type=int, help="同時に処理するリクエスト数の上限（超えた分は429を返す）")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429で返すRetry-Afterの秒数")
+    parser.add_argument("--fail-after", type=int, help="指定した件数のリクエスト以降を全て失敗させる")
+    parser.add_argument("--revalidate-secret", help="Webhookで要求するシークレット（SYNC_REVALIDATE_SECRET に指定）")
+    args = parser.parse_args()
+    server, state = start_server(args.port, args.latency, latency_per_kb=args.latency_per_kb,
+                                 max_concurrent=args.max_concurrent, retry_after=args.retry_after)
+    state.fail_after = args.fail_after
+    state.revalidate_secret = args.revalidate_secret
+    print(f"🚀 Listening on http://127.0.0.1:{server.server_address[1]} (SUPABASE_URL に指定)")
+    print(f"♻️  Revalidation webhook: http://127.0.0.1:{server.server_address[1]}{REVALIDATE_PATH} (--revalidate-url に指定)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(json.dumps(state.stats))
+        for request in state.revalidated:
+            print(json.dumps(request, ensure_ascii=False))
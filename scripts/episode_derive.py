@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+エピソード本文から表示用の派生データ（HTML・文字数・読了時間・抜粋）を作る
+sync_supabase.py の --derive で使用する
+"""
+
+import re
+import html
+import math
+import bisect
+
+# 派生データの計算規則を変えたときに上げる（キャッシュ済みの派生データは作り直される）
+DERIVE_VERSION = 1
+
+# 読了時間の計算に使う1分あたりの文字数
+READING_CHARS_PER_MINUTE = 500
+
+# 抜粋の最大文字数
+EXCERPT_LENGTH = 120
+
+# ｜親文字《ルビ》（縦線は全角・半角どちらも可）
+RUBY_EXPLICIT = re.compile(r"[｜|]([^｜|《》\n]+?)《([^《》\n]+?)》")
+# 漢字《ルビ》（縦線がない場合は直前の漢字の連続を親文字とする）
+RUBY_KANJI = re.compile(r"([㐀-䶿一-鿿豈-﫿々〆〇ヶ]+)《([^《》\n]+?)》")
+
+# 段落の区切り（空行）
+PARAGRAPH_BREAK = re.compile(r"\n[ \t　]*\n")
+
+# 場面転換の区切り線（--- だけの段落）
+SCENE_BREAK = re.compile(r"[-ー－―]{3,}")
+
+# 1段落が長すぎてページに収まらない場合の区切り（改行 → 文末の順に探す）
+LINE_END = re.compile(r"\n")
+SENTENCE_END = re.compile(r"[。！？!?」』]")
+
+def replace_ruby(text, replace):
+    """ルビ記法を replace(親文字, ルビ) の結果に置き換える"""
+    text = RUBY_EXPLICIT.sub(lambda m: replace(m.group(1), m.group(2)), text)
+    return RUBY_KANJI.sub(lambda m: replace(m.group(1), m.group(2)), text)
+
+def render_html(content):
+    """本文をHTMLに変換する（空行で段落、改行は<br>、ルビ記法は<ruby>、--- は<hr>）"""
+    paragraphs = []
+    for block in PARAGRAPH_BREAK.split(content.strip("\n")):
+        if not block.strip():
+            continue
+        if SCENE_BREAK.fullmatch(block.strip()):
+            paragraphs.append("<hr>")
+            continue
+        escaped = html.escape(block, quote=False)
+        with_ruby = replace_ruby(escaped, lambda base, reading: f"<ruby>{base}<rt>{reading}</rt></ruby>")
+        paragraphs.append(f"<p>{with_ruby.replace(chr(10), '<br>')}</p>")
+    return "\n".join(paragraphs)
+
+def plain_text(content):
+    """ルビ記法を親文字だけにしたテキスト"""
+    return replace_ruby(content, lambda base, reading: base)
+
+def count_characters(text):
+    """文字数（空白・改行・全角スペースを除く）"""
+    return sum(1 for ch in text if not ch.isspace())
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """行頭の字下げと改行を除いた先頭 length 文字の抜粋"""
+    joined = "".join(line.strip() for line in text.splitlines())
+    if len(joined) <= length:
+        return joined
+    return joined[:length] + "…"
+
+def find_last_break(pattern, content, start, end):
+    """content[start:end] の中で pattern に最後に一致した位置の直後（見つからなければNone）"""
+    last = None
+    for match in pattern.finditer(content, start, end):
+        last = match.end()
+    return last if last is not None and last > start else None
+
+def paginate(content, target_chars):
+    """本文を段落の境界で target_chars 文字前後のページに分け、(開始位置, 終了位置) のリストを返す
+
+    位置は本文の先頭からの文字数で、全ページを連結すると元の本文になる。
+    target_chars の2倍を超える段落は、改行・文末・文字数の順で段落の途中で区切る。
+    """
+    if len(content) <= target_chars:
+        return [(0, len(content))]
+    # 段落の開始位置（ここで区切ればページが段落の途中から始まらない）
+    breaks = [match.end() for match in PARAGRAPH_BREAK.finditer(content)]
+    pages = []
+    start = 0
+    while len(content) - start > target_chars:
+        limit = start + target_chars
+        position = bisect.bisect_right(breaks, limit) - 1
+        if position >= 0 and breaks[position] > start:
+            end = breaks[position]
+        else:
+            # 先頭の段落だけで target_chars を超える
+            following = bisect.bisect_right(breaks, start)
+            next_break = breaks[following] if following < len(breaks) else len(content)
+            if next_break - start <= target_chars * 2:
+                end = next_break
+            else:
+                end = (find_last_break(LINE_END, content, start, limit)
+                       or find_last_break(SENTENCE_END, content, start, limit)
+                       or limit)
+        pages.append((start, end))
+        start = end
+    if start < len(content):
+        pages.append((start, len(content)))
+    return pages
+
+def derive_fields(content):
+    """episodesテーブルに保存する派生データを計算"""
+    text = plain_text(content)
+    char_count = count_characters(text)
+    return {
+        "content_html": render_html(content),
+        "char_count": char_count,
+        "reading_minutes": math.ceil(char_count / READING_CHARS_PER_MINUTE) if char_count else 0,
+        "excerpt": make_excerpt(text),
+    }
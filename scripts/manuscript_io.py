@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+原稿ファイル（info.yml / *.md）の読み込みと解析キャッシュ
+validate_data.py と sync_supabase.py で共有する
+"""
+
+import os
+import re
+import gzip
+import mmap
+import json
+import hashlib
+import yaml
+import frontmatter
+from datetime import date, datetime
+
+# キャッシュ形式や解析規則を変えたときに上げる（古いキャッシュは破棄される）
+CACHE_VERSION = 3
+
+# libyaml がある環境ではC実装のローダーを使う（結果は yaml.SafeLoader と同じ）
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# python-frontmatter の YAMLHandler と同じ区切り行
+FM_BOUNDARY = re.compile(r"^-{3,}\s*$", re.MULTILINE)
+
+# ヘッダーだけを読む経路で使う区切り行（バイト列で候補を探し、デコードした行を FM_BOUNDARY と同じ規則で確認する）
+BOUNDARY_LINE_START = re.compile(rb"^---", re.MULTILINE)
+BOUNDARY_LINE = re.compile(r"-{3,}\s*")
+# str.strip() で除かれるASCIIの空白
+ASCII_WHITESPACE = b" \t\n\x0b\x0c\r\x1c\x1d\x1e\x1f"
+# これ以下のサイズのファイルはメモリマップせずに1回で読み込む
+HEADER_READ_SIZE = 64 * 1024
+# 本文の空判定で読み飛ばす空白（ASCIIの空白と全角スペース）
+BODY_WHITESPACE = re.compile(rb"(?:[\t\n\x0b\x0c\r\x1c-\x1f ]|\xe3\x80\x80)*")
+
+# フラットなヘッダーの1行（key: "文字列" / key: '文字列' / key: 整数 と行末コメント）
+FLAT_HEADER_LINE = re.compile(
+    r"""([A-Za-z_][A-Za-z0-9_]*): +(?:"([^"\\]*)"|'([^']*)'|(-?(?:0|[1-9][0-9]*)))(?: +#.*)? *"""
+)
+# YAML 1.1 で真偽値・nullとして解釈されるキー（文字列キーにならないため高速パスの対象外）
+YAML_SPECIAL_KEYS = {"y", "n", "yes", "no", "true", "false", "on", "off", "null"}
+# PyYAMLが受け付けない文字（含まれる場合はエラー内容を揃えるためYAMLパーサーに任せる）
+YAML_NON_PRINTABLE = re.compile(
+    "[^\x09\x0A\x0D\x20-\x7E\x85\xA0-\uD7FF\uE000-\uFFFD\U00010000-\U0010ffff]"
+)
+
+def new_parse_cache():
+    """空の解析キャッシュを作成"""
+    return {"version": CACHE_VERSION, "entries": {}, "dirty": False}
+
+def load_parse_cache(path):
+    """解析キャッシュをファイルから読み込む（存在しない・壊れている場合は空）"""
+    if not path or not os.path.exists(path):
+        return new_parse_cache()
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return new_parse_cache()
+    if stored.get("version") != CACHE_VERSION:
+        return new_parse_cache()
+    return {"version": CACHE_VERSION, "entries": stored.get("entries", {}), "dirty": False}
+
+def save_parse_cache(cache, path):
+    """変更があった場合のみ解析キャッシュを書き出す（一時ファイル経由で置き換え）"""
+    if not path or not cache["dirty"]:
+        return False
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(
+            {"version": CACHE_VERSION, "entries": cache["entries"]},
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+    os.replace(tmp_path, path)
+    cache["dirty"] = False
+    return True
+
+def write_json_atomic(path, data):
+    """一時ファイル経由でJSONを書き出す（静的JSON・検索インデックス・変更マニフェストなどで共有する）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def subset_parse_cache(cache, paths):
+    """指定ファイルのエントリだけを持つキャッシュを作る（ワーカープロセスへの受け渡し用）"""
+    subset = new_parse_cache()
+    if cache is None:
+        return subset
+    for path in paths:
+        key = cache_key(path)
+        if key in cache["entries"]:
+            subset["entries"][key] = cache["entries"][key]
+    return subset
+
+def merge_parse_cache(cache, other):
+    """ワーカープロセスで更新されたエントリを取り込む"""
+    if cache is None or not other["dirty"]:
+        return
+    cache["entries"].update(other["entries"])
+    cache["dirty"] = True
+
+def cache_key(path):
+    """キャッシュのキー（正規化したパス）"""
+    return os.path.normpath(str(path))
+
+def encode_value(value):
+    """YAMLの値をJSONで保存できる形に変換（日付はタグ付きで保持）"""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise TypeError("non-string mapping key")
+        return {k: encode_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [encode_value(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"unsupported value type: {type(value).__name__}")
+
+def decode_value(value):
+    """encode_value で保存した値を元の型に戻す"""
+    if isinstance(value, dict):
+        if len(value) == 1 and "$datetime" in value:
+            return datetime.fromisoformat(value["$datetime"])
+        if len(value) == 1 and "$date" in value:
+            return date.fromisoformat(value["$date"])
+        return {k: decode_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+def decode_text(raw):
+    """バイト列をテキストモードのopen()と同じ規則（UTF-8・改行の正規化）で文字列にする"""
+    text = raw.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def parse_yaml_text(text):
+    """info.yml の内容を解析（yaml.safe_load と同じ結果）"""
+    return yaml.load(text, Loader=YAML_LOADER)
+
+def parse_flat_header(header):
+    """key: value 形式の単純なヘッダーをYAMLパーサーを使わずに解析する
+
+    文字列（エスケープなし）と整数だけからなる1階層のマップのみ対応し、
+    それ以外の書き方が含まれる場合はNoneを返す（呼び出し側でYAMLパーサーを使う）。
+    """
+    if YAML_NON_PRINTABLE.search(header):
+        return None
+    metadata = {}
+    for line in header.split("\n"):
+        # YAMLが空行として扱うのはスペースだけの行（タブ・全角スペース・NBSPを含む行はYAMLパーサーに任せる）
+        if not line.strip(" ") or line.startswith("#"):
+            continue
+        match = FLAT_HEADER_LINE.fullmatch(line)
+        if match is None:
+            return None
+        key, double_quoted, single_quoted, integer = match.groups()
+        if key.lower() in YAML_SPECIAL_KEYS:
+            return None
+        if double_quoted is not None:
+            metadata[key] = double_quoted
+        elif single_quoted is not None:
+            metadata[key] = single_quoted
+        else:
+            metadata[key] = int(integer)
+    return metadata
+
+def split_front_matter(text):
+    """エピソードファイルを (メタデータ, 本文) に分割する（frontmatter.loads と同じ結果）
+
+    YAMLの --- 区切りで始まるファイルは自前で分割し、ヘッダーが単純なマップなら
+    parse_flat_header、そうでなければC実装のYAMLローダーで解析する。
+    それ以外の形式は python-frontmatter に任せる。
+    """
+    stripped = text.strip()
+    if not FM_BOUNDARY.match(stripped):
+        post = frontmatter.loads(text)
+        return post.metadata, post.content
+    try:
+        _, header, content = FM_BOUNDARY.split(stripped, 2)
+    except ValueError:
+        # 閉じの区切りがない場合はメタデータなしとして扱う
+        return {}, stripped
+    metadata = parse_flat_header(header)
+    if metadata is None:
+        metadata = yaml.load(header, Loader=YAML_LOADER)
+        if not isinstance(metadata, dict):
+            metadata = {}
+        if not all(isinstance(key, str) for key in metadata):
+            # python-frontmatter はメタデータをキーワード引数で渡すため文字列以外のキーでエラーになる
+            raise TypeError("keywords must be strings")
+    return metadata, content.strip()
+
+def parse_markdown_text(text):
+    """エピソードファイルを frontmatter.load と同じ規則で解析する
+
+    戻り値は (メタデータ, 本文の開始位置, 本文の終了位置)。位置は text 内の文字オフセット。
+    """
+    metadata, content = split_front_matter(text)
+    # 本文は前後の空白を除いたテキストの末尾部分なので、位置は末尾から求まる
+    end = len(text.rstrip())
+    start = end - len(content)
+    return metadata, start, end
+
+def read_cached(path, kind, cache):
+    """キャッシュを引き、ヒットしなければ解析してエントリを登録する
+
+    戻り値は (エントリ, テキスト)。サイズとmtimeが一致した場合はファイルを読まずに
+    テキストをNoneで返す。mtimeだけ異なる場合（CIのチェックアウト直後など）は
+    内容のハッシュで照合する。
+    """
+    key = cache_key(path)
+    stat = os.stat(path)
+    entry = cache["entries"].get(key) if cache is not None else None
+
+    if entry and entry["kind"] == kind and entry["size"] == stat.st_size:
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry, None
+        with open(path, "rb") as f:
+            raw = f.read()
+        if hashlib.sha1(raw).hexdigest() == entry["sha1"]:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            cache["dirty"] = True
+            return entry, decode_text(raw)
+    else:
+        with open(path, "rb") as f:
+            raw = f.read()
+
+    text = decode_text(raw)
+    if kind == "yaml":
+        data = parse_yaml_text(text)
+        body = None
+    else:
+        data, start, end = parse_markdown_text(text)
+        body = [start, end]
+
+    entry = {
+        "kind": kind,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": hashlib.sha1(raw).hexdigest(),
+        "body": body,
+    }
+    try:
+        entry["data"] = encode_value(data)
+    except TypeError:
+        # JSONで表現できない値（!!binary等）を含む場合はキャッシュしない
+        entry["data"] = None
+        entry["raw_data"] = data
+        return entry, text
+
+    if cache is not None:
+        cache["entries"][key] = entry
+        cache["dirty"] = True
+    return entry, text
+
+def entry_data(entry):
+    """エントリから解析結果を取り出す（呼び出し側が変更してもよい新しいオブジェクト）"""
+    if "raw_data" in entry:
+        return entry["raw_data"]
+    return decode_value(entry["data"])
+
+def load_info_file(path, cache=None):
+    """info.yml を読み込む（yaml.safe_load と同じ結果）"""
+    entry, _ = read_cached(path, "yaml", cache)
+    return entry_data(entry)
+
+def load_episode_file(path, cache=None):
+    """エピソードファイルを読み込み (メタデータ, 本文) を返す（frontmatter.load と同じ結果）"""
+    entry, text = read_cached(path, "markdown", cache)
+    if text is None:
+        with open(path, "rb") as f:
+            text = decode_text(f.read())
+    start, end = entry["body"]
+    return entry_data(entry), text[start:end]
+
+def has_non_whitespace(data, pos):
+    """data[pos:] に空白（str.isspace）以外の文字があるか（本文をデコードせずに判定する）"""
+    while True:
+        pos = BODY_WHITESPACE.match(data, pos).end()
+        if pos >= len(data):
+            return False
+        lead = data[pos]
+        if lead < 0x80:
+            return True
+        # 全角スペース以外の非ASCII文字は1文字だけデコードして確認する（NBSPなども空白）
+        length = 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+        try:
+            char = data[pos:pos + length].decode("utf-8")
+        except UnicodeDecodeError:
+            return True
+        if not char.isspace():
+            return True
+        pos += length
+
+def scan_mapped_header(data):
+    """メモリマップしたエピソードファイルのヘッダーを解析し (メタデータ, 本文が空でないか) を返す
+
+    --- で始まり閉じの区切りがある通常の形式のみ対応し、それ以外はNoneを返す。
+    デコードするのは閉じの区切り行までで、本文は空白かどうかだけをバイト列のまま調べる。
+    """
+    pos = 0
+    while pos < len(data) and data[pos] in ASCII_WHITESPACE:
+        pos += 1
+    opening_end = data.find(b"\n", pos)
+    opening_end = len(data) if opening_end < 0 else opening_end
+    if not BOUNDARY_LINE.fullmatch(decode_text(data[pos:opening_end])):
+        return None
+    for match in BOUNDARY_LINE_START.finditer(data, opening_end):
+        line_end = data.find(b"\n", match.start())
+        line_end = len(data) if line_end < 0 else line_end + 1
+        if not BOUNDARY_LINE.fullmatch(decode_text(data[match.start():line_end]).rstrip("\n")):
+            continue
+        prefix = data[:line_end]
+        if prefix.count(b"\r") != prefix.count(b"\r\n"):
+            # 単独のCRは改行として扱われるため、行の区切りがバイト列と一致しない
+            return None
+        metadata, _ = split_front_matter(decode_text(prefix))
+        return metadata, has_non_whitespace(data, line_end)
+    return None
+
+def scan_episode_header(path):
+    """エピソードのヘッダーだけを読み、(メタデータ, 本文が空でないか) を返す
+
+    HEADER_READ_SIZE 以下のファイルは1回のreadで、それより大きいファイルはメモリマップで参照する。
+    ヘッダー以外はデコード・保持しないため、メモリ使用量と読み込み量は本文の長さにほぼ依存しない。
+    通常の形式でないファイルは load_episode_file と同じ規則で全体を解析する。
+    本文の不正なUTF-8は検出しない。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if 0 < size <= HEADER_READ_SIZE:
+            # 小さいファイルはメモリマップより1回のreadの方が速い
+            result = scan_mapped_header(f.read(HEADER_READ_SIZE))
+        elif size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                result = scan_mapped_header(data)
+        else:
+            result = None
+    if result is not None:
+        return result
+    metadata, content = load_episode_file(path)
+    return metadata, bool(content)
+
+def load_episode_header(path, cache=None):
+    """エピソードのメタデータと本文が空でないかを返す
+
+    キャッシュヒット時はファイルを読まない。キャッシュを使わない場合はヘッダーだけを読む。
+    キャッシュを使う場合は sync_supabase.py と共有するため、ミス時は全体を解析して登録する。
+    """
+    if cache is None:
+        return scan_episode_header(path)
+    entry, _ = read_cached(path, "markdown", cache)
+    start, end = entry["body"]
+    return entry_data(entry), end > start
+
+def cached_derived(path, cache, content, derive, version):
+    """本文から計算する派生データを、本文のハッシュが同じ間はキャッシュから返す
+
+    派生データはファイルのキャッシュエントリに保存する（エントリがない場合は毎回計算する）。
+    """
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    entry = cache["entries"].get(cache_key(path)) if cache is not None else None
+    stored = entry.get("derived") if entry else None
+    if stored and stored["version"] == version and stored["sha1"] == digest:
+        return dict(stored["fields"])
+    fields = derive(content)
+    if entry is not None:
+        entry["derived"] = {"version": version, "sha1": digest, "fields": fields}
+        cache["dirty"] = True
+    return dict(fields)
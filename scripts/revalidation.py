@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+同期で変更した小説・エピソードの一覧（変更マニフェスト）と、再生成が必要なページのパスを作る
+sync_supabase.py の --changes-out / --revalidate-url で使用する
+
+ページとの対応（frontend/src/app の構成）:
+  /                              小説一覧（タイトル・概要・更新日・話数）
+  /novel/<小説ID>                 小説の詳細と目次
+  /novel/<小説ID>/episode/<ID>    エピソード本文・小説のタイトルと作者・前後の話
+
+パスは2種類に分けて返す。
+  paths    そのページだけを再生成する（Next.js の revalidatePath(path, "page")）
+  layouts  配下のページをまとめて再生成する（revalidatePath(path, "layout")）
+小説のメタデータを更新した場合は全エピソードのページに小説のタイトルが載るため layouts に入れる。
+"""
+
+from bisect import bisect_left
+from urllib.parse import quote
+
+from manuscript_io import write_json_atomic
+from static_export import toc_sort_key
+
+# 同じレコードに複数回の操作があったときにまとめた結果（前の操作, 後の操作）→ 操作
+MERGED_OPERATIONS = {
+    ("insert", "update"): "insert",
+    ("insert", "delete"): "delete",
+    ("delete", "insert"): "update",
+}
+
+def novel_page(novel_id):
+    """小説の詳細ページのパス"""
+    return f"/novel/{quote(str(novel_id), safe='')}"
+
+def episode_page(novel_id, episode_id):
+    """エピソードのページのパス"""
+    return f"{novel_page(novel_id)}/episode/{quote(str(episode_id), safe='')}"
+
+def open_changes():
+    """変更の記録を作る"""
+    return {
+        "novels": {},    # 小説ID → {id, operation}
+        "episodes": {},  # エピソードID → {id, novel_id, episode_number, operation}
+    }
+
+def merge_operation(previous, operation):
+    """既に記録した操作と新しい操作をまとめる"""
+    if previous is None:
+        return operation
+    return MERGED_OPERATIONS.get((previous, operation), operation)
+
+def stage_novel(changes, novel_id, operation):
+    """小説の変更を記録する（operation は insert / update）"""
+    previous = changes["novels"].get(str(novel_id))
+    changes["novels"][str(novel_id)] = {
+        "id": novel_id,
+        "operation": merge_operation(previous and previous["operation"], operation),
+    }
+
+def stage_episodes(changes, operation, episodes):
+    """エピソードの変更を記録する（episodes は id・novel_id・episode_number を持つ辞書）"""
+    for episode in episodes:
+        key = str(episode["id"])
+        previous = changes["episodes"].get(key)
+        changes["episodes"][key] = {
+            "id": episode["id"],
+            "novel_id": episode.get("novel_id", previous and previous["novel_id"]),
+            "episode_number": episode.get("episode_number", previous and previous["episode_number"]),
+            "operation": merge_operation(previous and previous["operation"], operation),
+        }
+
+def has_changes(changes):
+    """記録した変更があるか"""
+    return bool(changes["novels"] or changes["episodes"])
+
+def neighbor_novels(changes):
+    """前後の話のリンクを確認する必要がある小説ID（エピソードを変更した小説）"""
+    return {str(entry["novel_id"]) for entry in changes["episodes"].values() if entry["novel_id"] is not None}
+
+def episode_order(rows, novel_ids=()):
+    """エピソードの行（id・novel_id・episode_number）から小説ID → 目次順の [(並び順のキー, エピソードID)] を作る
+
+    novel_ids には取得の対象にした小説IDを渡す（エピソードが無くなった小説も空の目次として含める）。
+    """
+    order = {str(novel_id): [] for novel_id in novel_ids}
+    for row in rows:
+        order.setdefault(str(row["novel_id"]), []).append((toc_sort_key(row), str(row["id"])))
+    for entries in order.values():
+        entries.sort()
+    return order
+
+def neighbors(entries, entry):
+    """目次（entries）で entry の位置の前後にあるエピソードID（entry 自体は目次になくてもよい）"""
+    key = toc_sort_key(entry)
+    position = bisect_left(entries, (key, str(entry["id"])))
+    found = []
+    if position > 0:
+        found.append(entries[position - 1][1])
+    # entry が目次にあれば次の項目はその後ろ
+    if position < len(entries) and entries[position][1] == str(entry["id"]):
+        position += 1
+    if position < len(entries):
+        found.append(entries[position][1])
+    return found
+
+def page_paths(changes, order=None):
+    """再生成が必要なページのパスを (paths, layouts) として返す
+
+    order は同期後の小説ID → 目次順のエピソード（episode_order の戻り値）。
+    変更したエピソードの前後の話のページは、前後の話のリンク（タイトル・話数）が変わるため再生成する。
+    削除したエピソードは話数の分かる場合だけ前後を特定でき、それ以外は order に無い小説と同様に
+    小説の配下をまとめて再生成する。
+    """
+    order = order or {}
+    paths = set()
+    layouts = set()
+    novels = changes["novels"]
+    if novels:
+        paths.add("/")
+    for entry in novels.values():
+        if entry["operation"] == "update":
+            layouts.add(novel_page(entry["id"]))
+        else:
+            paths.add(novel_page(entry["id"]))
+
+    for entry in changes["episodes"].values():
+        novel_id = entry["novel_id"]
+        if novel_id is None:
+            continue
+        novel_id = str(novel_id)
+        paths.add(novel_page(novel_id))
+        paths.add(episode_page(novel_id, entry["id"]))
+        if entry["operation"] != "update":
+            # 一覧に話数が載る
+            paths.add("/")
+        entries = order.get(novel_id)
+        if entries is None or (entry["operation"] == "delete" and entry["episode_number"] is None):
+            layouts.add(novel_page(novel_id))
+            continue
+        for neighbor_id in neighbors(entries, entry):
+            paths.add(episode_page(novel_id, neighbor_id))
+
+    # layouts の配下のページは個別に送らない
+    paths = {path for path in paths if not any(path.startswith(f"{layout}/") or path == layout for layout in layouts)}
+    return sorted(paths), sorted(layouts)
+
+def build_manifest(changes, paths, layouts):
+    """変更マニフェスト（JSONに書き出す形）"""
+    return {
+        "novels": sorted(changes["novels"].values(), key=lambda entry: str(entry["id"])),
+        "episodes": sorted(changes["episodes"].values(), key=lambda entry: (str(entry["novel_id"]), str(entry["id"]))),
+        "paths": paths,
+        "layouts": layouts,
+    }
+
+def write_manifest(path, manifest):
+    """変更マニフェストを書き出す"""
+    write_json_atomic(path, manifest)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+小説・エピソードの全文検索インデックス（文字bigramの転置インデックス）
+sync_supabase.py の --search-index で同期のたびに差分更新する
+
+ディレクトリ構成:
+  index.json        文書一覧（文書番号 → 種別・ID・タイトル・内容のハッシュ）
+  shards/NNN.json   シャードごとのポスティングリスト（bigram → 差分符号化した文書番号の配列）
+  grams/NNN.json    文書番号 → 含まれるbigramの空白区切りの一覧（更新・削除用。検索では読まない）
+
+bigram は CRC32 % shard_count でシャードに振り分けるため、検索時はクエリに含まれる
+bigram のシャードだけを読めばよい。更新では前回から増えた・減ったbigramのシャードだけを書き換える。
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import bisect
+import hashlib
+import argparse
+import unicodedata
+from itertools import accumulate
+
+from episode_derive import plain_text
+from manuscript_io import write_json_atomic
+
+# インデックス形式を変えたときに上げる（古いインデックスは作り直される）
+INDEX_VERSION = 2
+SHARD_COUNT = 64
+# 文書ごとのbigramの一覧を1ファイルにまとめる件数（文書番号順に区切る）
+GRAMS_PER_FILE = 256
+
+# 文字の連続（句読点・空白・記号で区切る）
+TOKEN_RUN = re.compile(r"[^\W_]+")
+
+def normalize(text):
+    """検索用に正規化（NFKCで全角英数を半角に、英字は小文字に）"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+def tokenize(text):
+    """テキストに含まれる文字bigramの集合（1文字だけの連続はその1文字）"""
+    grams = set()
+    for run in TOKEN_RUN.findall(normalize(text)):
+        if len(run) == 1:
+            grams.add(run)
+            continue
+        for i in range(len(run) - 1):
+            grams.add(run[i:i + 2])
+    return grams
+
+def shard_of(gram):
+    """bigramが入るシャード番号"""
+    return zlib.crc32(gram.encode("utf-8")) % SHARD_COUNT
+
+def encode_postings(doc_ids):
+    """昇順の文書番号を差分符号化する"""
+    return [doc_ids[0]] + [b - a for a, b in zip(doc_ids, doc_ids[1:])] if doc_ids else []
+
+def decode_postings(deltas):
+    """差分符号化した文書番号を元に戻す"""
+    return list(accumulate(deltas))
+
+def shard_path(directory, shard):
+    """シャードファイルのパス"""
+    return os.path.join(directory, "shards", f"{shard:03d}.json")
+
+def grams_path(directory, part):
+    """文書ごとのbigramの一覧のファイルのパス"""
+    return os.path.join(directory, "grams", f"{part:03d}.json")
+
+def load_index(directory):
+    """インデックスを読み込む（存在しない・形式が古い場合は作り直す空のインデックス）
+
+    作り直す場合は rebuild が True になる。差分同期では変更されていない文書が入らないため、
+    呼び出し側で全ファイルを対象にする必要がある。
+    """
+    index = {
+        "directory": directory,
+        "docs": [],
+        "by_key": {},
+        "shards": {},
+        "grams": {},
+        "dirty_shards": set(),
+        "dirty_grams": set(),
+        "dirty": False,
+        "rebuild": True,
+    }
+    manifest_path = os.path.join(directory, "index.json")
+    if not os.path.exists(manifest_path):
+        return index
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("version") != INDEX_VERSION or manifest.get("shard_count") != SHARD_COUNT:
+        # 古い形式のシャードは読まず、保存時に全て書き直す
+        index["dirty"] = True
+        return index
+    index["docs"] = manifest["docs"]
+    index["by_key"] = {doc["key"]: doc_id for doc_id, doc in enumerate(manifest["docs"]) if doc is not None}
+    index["rebuild"] = False
+    return index
+
+def read_part(index, path):
+    """シャード・bigramの一覧のファイルを読み込む（作り直す場合は既存のファイルを使わない）"""
+    if index["rebuild"] or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_shard(index, shard):
+    """シャードを読み込む（読み込み済みならそれを返す）。ポスティングリストは復号した状態で保持する"""
+    if shard not in index["shards"]:
+        index["shards"][shard] = {
+            gram: decode_postings(deltas)
+            for gram, deltas in read_part(index, shard_path(index["directory"], shard)).items()
+        }
+    return index["shards"][shard]
+
+def load_grams(index, part):
+    """文書番号 → bigramの集合を GRAMS_PER_FILE 件ごとに読み込む（読み込み済みならそれを返す）"""
+    if part not in index["grams"]:
+        index["grams"][part] = {
+            int(doc_id): set(grams.split())
+            for doc_id, grams in read_part(index, grams_path(index["directory"], part)).items()
+        }
+    return index["grams"][part]
+
+def add_posting(index, gram, doc_id):
+    """bigramのポスティングリストに文書番号を追加する"""
+    shard = shard_of(gram)
+    doc_ids = load_shard(index, shard).setdefault(gram, [])
+    position = bisect.bisect_left(doc_ids, doc_id)
+    if position == len(doc_ids) or doc_ids[position] != doc_id:
+        doc_ids.insert(position, doc_id)
+    index["dirty_shards"].add(shard)
+
+def remove_posting(index, gram, doc_id):
+    """bigramのポスティングリストから文書番号を取り除く"""
+    shard = shard_of(gram)
+    postings = load_shard(index, shard)
+    doc_ids = postings.get(gram, [])
+    position = bisect.bisect_left(doc_ids, doc_id)
+    if position < len(doc_ids) and doc_ids[position] == doc_id:
+        del doc_ids[position]
+        if not doc_ids:
+            del postings[gram]
+        index["dirty_shards"].add(shard)
+
+def set_document_grams(index, doc_id, grams):
+    """文書のbigramを記録し、増えた・減ったbigramのポスティングリストだけを書き換える（grams がNoneなら削除）"""
+    part = doc_id // GRAMS_PER_FILE
+    stored = load_grams(index, part)
+    previous = stored.get(doc_id, set())
+    current = grams or set()
+    for gram in current - previous:
+        add_posting(index, gram, doc_id)
+    for gram in previous - current:
+        remove_posting(index, gram, doc_id)
+    if grams is None:
+        stored.pop(doc_id, None)
+    else:
+        stored[doc_id] = grams
+    index["dirty_grams"].add(part)
+
+def remove_document(index, key):
+    """文書をインデックスから取り除く"""
+    doc_id = index["by_key"].pop(key, None)
+    if doc_id is None:
+        return False
+    set_document_grams(index, doc_id, None)
+    index["docs"][doc_id] = None
+    index["dirty"] = True
+    return True
+
+def update_document(index, key, text, meta):
+    """文書を追加・更新する（内容のハッシュが同じなら何もしない）。更新した場合はTrueを返す
+
+    既存の文書は同じ文書番号のまま、前回から増えた・減ったbigramだけを入れ替える。
+    """
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    doc_id = index["by_key"].get(key)
+    if doc_id is not None and index["docs"][doc_id]["hash"] == digest:
+        if index["docs"][doc_id]["meta"] != meta:
+            index["docs"][doc_id]["meta"] = meta
+            index["dirty"] = True
+        return False
+    if doc_id is None:
+        doc_id = len(index["docs"])
+        index["docs"].append(None)
+        index["by_key"][key] = doc_id
+    index["docs"][doc_id] = {"key": key, "hash": digest, "meta": meta}
+    set_document_grams(index, doc_id, tokenize(text))
+    index["dirty"] = True
+    return True
+
+def part_count(index):
+    """文書番号の範囲に必要な bigramの一覧のファイル数"""
+    return (len(index["docs"]) + GRAMS_PER_FILE - 1) // GRAMS_PER_FILE
+
+def compact_index(index):
+    """削除済みの文書番号を詰めて振り直す（全シャード・全bigramの一覧を書き直す）"""
+    remap = {}
+    docs = []
+    grams = {}
+    for doc_id, doc in enumerate(index["docs"]):
+        if doc is not None:
+            remap[doc_id] = len(docs)
+            grams.setdefault(len(docs) // GRAMS_PER_FILE, {})[len(docs)] = load_grams(index, doc_id // GRAMS_PER_FILE)[doc_id]
+            docs.append(doc)
+    for shard in range(SHARD_COUNT):
+        postings = load_shard(index, shard)
+        for gram, doc_ids in postings.items():
+            postings[gram] = [remap[doc_id] for doc_id in doc_ids]
+    index["docs"] = docs
+    index["by_key"] = {doc["key"]: doc_id for doc_id, doc in enumerate(docs)}
+    index["grams"] = grams
+    index["dirty_shards"] = set(range(SHARD_COUNT))
+    index["dirty_grams"] = set(range(part_count(index)))
+    index["dirty"] = True
+
+def remove_stale_grams(index):
+    """文書番号の範囲より後ろの bigramの一覧のファイルを消す（番号を詰めた・作り直した後）"""
+    directory = os.path.join(index["directory"], "grams")
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        stem, ext = os.path.splitext(name)
+        if ext == ".json" and stem.isdigit() and int(stem) >= part_count(index):
+            os.remove(os.path.join(directory, name))
+
+def save_index(index):
+    """変更のあったシャード・bigramの一覧と文書一覧を書き出す"""
+    if not index["dirty"]:
+        return False
+    pruned = index["rebuild"]
+    removed = sum(1 for doc in index["docs"] if doc is None)
+    # 削除済みの番号が半分を超えたら詰める（ポスティングリストの差分を小さく保つ）
+    if removed and removed * 2 > len(index["docs"]):
+        compact_index(index)
+        pruned = True
+    if index["rebuild"]:
+        # 古いシャード・bigramの一覧が残らないよう全て書き直す
+        index["dirty_shards"] = set(range(SHARD_COUNT))
+        index["dirty_grams"] = set(range(part_count(index)))
+    for shard in sorted(index["dirty_shards"]):
+        postings = load_shard(index, shard)
+        write_json_atomic(
+            shard_path(index["directory"], shard),
+            {gram: encode_postings(doc_ids) for gram, doc_ids in sorted(postings.items())},
+        )
+    for part in sorted(index["dirty_grams"]):
+        stored = load_grams(index, part)
+        write_json_atomic(
+            grams_path(index["directory"], part),
+            # bigramは空白を含まないため、空白区切りの文字列で格納する
+            {str(doc_id): " ".join(sorted(grams)) for doc_id, grams in sorted(stored.items())},
+        )
+    if pruned:
+        remove_stale_grams(index)
+    write_json_atomic(
+        os.path.join(index["directory"], "index.json"),
+        {"version": INDEX_VERSION, "shard_count": SHARD_COUNT, "docs": index["docs"]},
+    )
+    index["dirty_shards"] = set()
+    index["dirty_grams"] = set()
+    index["dirty"] = False
+    index["rebuild"] = False
+    return True
+
+def search(index, query, limit=20):
+    """クエリのbigramを全て含む文書のメタデータを返す（文書番号順）"""
+    grams = tokenize(query)
+    if not grams:
+        return []
+    result = None
+    # 出現数の少ないbigramから絞り込む
+    lists = sorted((load_shard(index, shard_of(gram)).get(gram, []) for gram in grams), key=len)
+    for doc_ids in lists:
+        result = set(doc_ids) if result is None else result.intersection(doc_ids)
+        if not result:
+            return []
+    return [index["docs"][doc_id]["meta"] for doc_id in sorted(result)[:limit]]
+
+def novel_text(novel_data):
+    """小説の検索対象テキスト（タイトル・あらすじ・タグ）"""
+    parts = [str(novel_data.get('title', '')), str(novel_data.get('summary') or '')]
+    parts.extend(str(tag) for tag in novel_data.get('tags') or [])
+    return "\n".join(parts)
+
+def episode_text(episode):
+    """エピソードの検索対象テキスト（タイトル・本文）。ルビは親文字だけを使う"""
+    return f"{episode.get('title', '')}\n{plain_text(episode.get('content') or '')}"
+
+def main():
+    """インデックスを検索する（動作確認用）"""
+    parser = argparse.ArgumentParser(description="全文検索インデックスを検索する")
+    parser.add_argument("index_directory", help="インデックスのディレクトリ")
+    parser.add_argument("query", help="検索語（2文字以上）")
+    parser.add_argument("--limit", type=int, default=20, help="最大件数")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.index_directory, "index.json")):
+        print(f"❌ Index not found in {args.index_directory}")
+        sys.exit(1)
+    index = load_index(args.index_directory)
+    for meta in search(index, args.query, args.limit):
+        print(json.dumps(meta, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
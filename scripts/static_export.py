@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+同期した小説・エピソードを静的JSONとして書き出す（CDNや静的ホスティングから配信する読み取り用）
+sync_supabase.py の --export-dir で使用する
+
+ディレクトリ構成:
+  novels/<小説ID>.json        小説のメタデータと目次（getNovelDetail と同じ形）
+  episodes/<エピソードID>.json エピソード本文・小説の概要・前後の話（getEpisodeDetail と同じ形）
+
+同期中は書き込みに成功したレコードを記録するだけで、ファイルは finish_export でまとめて書き換える。
+内容が変わったファイルだけを一時ファイル経由で書き換える。
+"""
+
+import os
+import json
+from urllib.parse import quote
+
+from manuscript_io import write_json_atomic
+
+# データベース送信用の内部フィールド（書き出さない）
+INTERNAL_FIELDS = {"temp_novel_id", "operation", "content_hash"}
+
+# 同期のたびに変わるため、書き換えるかどうかの比較では無視するフィールド
+VOLATILE_FIELDS = {"updated_at"}
+
+# 目次・前後の話に含めるエピソードのフィールド
+TOC_FIELDS = ("id", "title", "episode_number", "published_at")
+NAVIGATION_FIELDS = ("id", "title", "episode_number")
+
+def novel_path(directory, novel_id):
+    """小説のJSONファイルのパス"""
+    return os.path.join(directory, "novels", f"{quote(str(novel_id), safe='')}.json")
+
+def episode_path(directory, episode_id):
+    """エピソードのJSONファイルのパス"""
+    return os.path.join(directory, "episodes", f"{quote(str(episode_id), safe='')}.json")
+
+def read_json(path):
+    """JSONファイルを読み込む（存在しない・壊れている場合はNone）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def same_content(existing, data):
+    """VOLATILE_FIELDS を除いて内容が同じか"""
+    if not isinstance(existing, dict):
+        return False
+    strip = lambda d: {k: v for k, v in d.items() if k not in VOLATILE_FIELDS}
+    return strip(existing) == strip(data)
+
+def export_row(record):
+    """書き出すレコード（内部フィールドを除く）"""
+    return {k: v for k, v in record.items() if k not in INTERNAL_FIELDS}
+
+def open_export(directory):
+    """書き出しの状態を作る（小説の目次と前後の話は finish_export でまとめて確定する）"""
+    return {
+        "directory": directory,
+        "novels": {},           # 小説ID → メタデータ
+        "episodes": {},         # エピソードID → 書き出す行
+        "deleted": set(),       # ファイルを消すエピソードID
+        "toc_updates": {},      # 小説ID → {エピソードID: 目次の項目}
+        "removed": {},          # 小説ID → 目次から外すエピソードID
+        "changed_episodes": {}, # 小説ID → 書き換えたエピソードID
+        "written": {"novels": 0, "episodes": 0, "removed": 0},
+    }
+
+def stage_novels(export, novels):
+    """同期した小説のメタデータを記録する（novels は (小説ID, レコード) のリスト）"""
+    for novel_id, record in novels:
+        row = export_row(record)
+        row["id"] = novel_id
+        export["novels"][novel_id] = row
+
+def stage_episodes(export, deleted_ids, episodes):
+    """削除したエピソードと送信したエピソードを記録する（ファイルは finish_export でまとめて書き換える）"""
+    for episode_id in deleted_ids:
+        episode_id = str(episode_id)
+        export["episodes"].pop(episode_id, None)
+        export["deleted"].add(episode_id)
+    for episode in episodes:
+        row = export_row(episode)
+        episode_id = str(row["id"])
+        # 別の小説に移すため削除してから作り直したエピソードは、書き出すだけでよい
+        export["deleted"].discard(episode_id)
+        export["episodes"][episode_id] = row
+
+def write_episodes(export):
+    """記録したエピソードのファイルを消し・書き出す
+
+    前後の話は目次が確定するまで分からないため、ここでは既存ファイルの値を引き継ぐ。
+    """
+    directory = export["directory"]
+    for episode_id in sorted(export["deleted"]):
+        path = episode_path(directory, episode_id)
+        existing = read_json(path)
+        if existing is None:
+            continue
+        os.remove(path)
+        export["written"]["removed"] += 1
+        novel_id = existing.get("episode", {}).get("novel_id")
+        export["removed"].setdefault(novel_id, set()).add(episode_id)
+
+    for episode_id, row in export["episodes"].items():
+        novel_id = row.get("novel_id")
+        export["toc_updates"].setdefault(novel_id, {})[episode_id] = {k: row.get(k) for k in TOC_FIELDS}
+        path = episode_path(directory, episode_id)
+        existing = read_json(path) or {}
+        previous = existing.get("episode")
+        if previous == row:
+            continue
+        if previous is not None and previous.get("novel_id") != novel_id:
+            # 別の小説に移ったエピソードは元の小説の目次から外す
+            export["removed"].setdefault(previous.get("novel_id"), set()).add(episode_id)
+        write_json_atomic(path, {
+            "episode": row,
+            "novel": existing.get("novel"),
+            "navigation": existing.get("navigation"),
+        })
+        export["written"]["episodes"] += 1
+        export["changed_episodes"].setdefault(novel_id, set()).add(episode_id)
+
+def toc_sort_key(entry):
+    """目次の並び順（話数 → ID）"""
+    number = entry.get("episode_number")
+    return (number is None, number if isinstance(number, (int, float)) else 0, str(entry.get("id")))
+
+def navigation_entry(entry):
+    """前後の話の項目"""
+    return {k: entry.get(k) for k in NAVIGATION_FIELDS} if entry is not None else None
+
+def finish_export(export, log=print):
+    """エピソードを書き出し、小説の目次を既存のものとマージして書き出し、前後の話が変わったエピソードを書き換える
+
+    目次か小説の概要が変わった小説は全エピソードの前後の話を確認し直す。
+    それ以外の小説は、今回書き換えたエピソードだけを確認する。
+    """
+    directory = export["directory"]
+    write_episodes(export)
+    novel_ids = (set(export["novels"]) | set(export["toc_updates"])
+                 | set(export["removed"]) | set(export["changed_episodes"]))
+    for novel_id in sorted(novel_ids, key=str):
+        if novel_id is None:
+            continue
+        path = novel_path(directory, novel_id)
+        existing = read_json(path)
+        metadata = export["novels"].get(novel_id)
+        if metadata is None and existing is not None:
+            metadata = {k: v for k, v in existing.items() if k != "episodes"}
+        if metadata is None:
+            log(f"⚠️  Skipping export of novel {novel_id}: metadata is not available")
+            continue
+
+        toc = {str(entry["id"]): entry for entry in (existing or {}).get("episodes", [])}
+        for episode_id in export["removed"].get(novel_id, ()):
+            toc.pop(episode_id, None)
+        toc.update(export["toc_updates"].get(novel_id, {}))
+        entries = sorted(toc.values(), key=toc_sort_key)
+
+        shard = {**metadata, "episodes": entries}
+        novel_changed = not same_content(existing, shard)
+        if novel_changed:
+            write_json_atomic(path, shard)
+            export["written"]["novels"] += 1
+
+        targets = None if novel_changed else export["changed_episodes"].get(novel_id, set())
+        summary = {"id": novel_id, "title": metadata.get("title"), "author": metadata.get("author")}
+        for position, entry in enumerate(entries):
+            episode_id = str(entry["id"])
+            if targets is not None and episode_id not in targets:
+                continue
+            episode_file = episode_path(directory, episode_id)
+            detail = read_json(episode_file)
+            if detail is None:
+                continue
+            updated = {
+                "episode": detail.get("episode"),
+                "novel": summary,
+                "navigation": {
+                    "prevEpisode": navigation_entry(entries[position - 1] if position > 0 else None),
+                    "nextEpisode": navigation_entry(entries[position + 1] if position + 1 < len(entries) else None),
+                },
+            }
+            if updated != detail:
+                write_json_atomic(episode_file, updated)
+                if episode_id not in export["changed_episodes"].get(novel_id, ()):
+                    export["written"]["episodes"] += 1
+    return export["written"]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+同期の設定・実行状態・ログ・メトリクス
+sync_supabase.py とその各モジュールで共有する
+
+実行ごとの状態は new_context で作る辞書（ctx）にまとめ、各関数に引数で渡す。
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# 一括書き込み1リクエストあたりの最大件数（DELETEはURL長の制約があるため小さめ）
+INSERT_CHUNK_SIZE = int(os.environ.get("SYNC_INSERT_CHUNK_SIZE", "500"))
+UPSERT_CHUNK_SIZE = int(os.environ.get("SYNC_UPSERT_CHUNK_SIZE", "500"))
+DELETE_CHUNK_SIZE = int(os.environ.get("SYNC_DELETE_CHUNK_SIZE", "100"))
+
+# INSERT/UPSERT 1リクエストあたりの本文の上限バイト数（ゲートウェイの本文サイズ制限・タイムアウト対策）
+MAX_BATCH_BYTES = int(os.environ.get("SYNC_MAX_BATCH_BYTES", str(2 * 1024 * 1024)))
+
+# 非同期書き込みモード（--async-writes）・適応制御モード（--adaptive）の同時送信数の上限
+MAX_IN_FLIGHT = int(os.environ.get("SYNC_MAX_IN_FLIGHT", "8"))
+
+# 適応制御モードで送信数を増やしてよい1リクエストの応答時間（秒）
+TARGET_LATENCY = float(os.environ.get("SYNC_TARGET_LATENCY", "2.0"))
+
+# 長いエピソードをページに分けるときの1ページの目安の文字数（--paginate）
+PAGE_CHARS = int(os.environ.get("SYNC_PAGE_CHARS", "4000"))
+
+# ログの一時保持先（並列処理の出力を元の順序で出すために使用）
+_log_capture = threading.local()
+
+# 直近に整形したタイムスタンプ（同じ秒のログでは使い回す）
+_timestamp_cache = {"second": None, "text": ""}
+
+def new_context(url, service_key, **options):
+    """同期1回分の設定と状態を作る（options で設定の既定値を上書きする）"""
+    ctx = {
+        # Supabase の接続先と REST API 用のヘッダー
+        "url": url,
+        "headers": {
+            "apikey": service_key,
+            "Authorization": f"Bearer {service_key}",
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal",  # INSERT用ヘッダー
+        },
+        # 詳細ログのレベル（-v で1、データのダンプなど重い出力はこれが1以上のときのみ）
+        "verbosity": 0,
+        # バッチの上限
+        "insert_chunk_size": INSERT_CHUNK_SIZE,
+        "upsert_chunk_size": UPSERT_CHUNK_SIZE,
+        "delete_chunk_size": DELETE_CHUNK_SIZE,
+        "max_batch_bytes": MAX_BATCH_BYTES,
+        # 送信方法（--async-writes / --adaptive と同時送信数の上限、--adaptive の目標応答時間）
+        "async_writes": False,
+        "adaptive_writes": False,
+        "max_in_flight": MAX_IN_FLIGHT,
+        "target_latency": TARGET_LATENCY,
+        # 突き合わせモード（--reconcile）
+        "reconcile": False,
+        # status: new のエピソードもUPSERTで送るか（--watch では同じファイルが status: new のまま何度も保存されるため）
+        "upsert_new_episodes": False,
+        # 表示用の派生データの計算（--derive）とページ分割（--paginate）
+        "derive": False,
+        "paginate": False,
+        "page_chars": PAGE_CHARS,
+        # 共有セッションと適応制御の状態（sync_transport.open_transport で設定する）
+        "session": None,
+        "adaptive": None,
+        # リクエストごとの応答時間の記録（--latency-trace 指定時のみリスト）
+        "latency_trace": None,
+        "started": time.monotonic(),
+        # 書き込みに失敗したリクエストと、そのレコードの (テーブル名, ID)（検索インデックスと静的JSONに反映しない）
+        "write_failures": [],
+        "failed_records": set(),
+        # 同期の進捗ジャーナル（--resume）と前回の同期の状態（--sync-state）
+        "journal": None,
+        "sync_state": None,
+        # 原稿の解析キャッシュ（--parse-cache / --watch）
+        "parse_cache": None,
+        # エピソードID → ページの範囲（ページ数を設定したときに分けた結果を、ページの保存で使い回す）
+        "page_spans": {},
+        # 新規作成した小説の 一時ID → ID（--watch で info.yml に id がないまま再度保存された小説は更新にする）
+        "known_novel_ids": {},
+        # id のない小説を作成する前に、同じタイトルの小説をリモートから探すか（--watch の再起動後に重複して作成しないため）
+        "resolve_novel_titles": False,
+        # 全文検索インデックス・静的JSONの書き出し・変更の記録（指定時のみ）
+        "search_index": None,
+        "export": None,
+        "changes": None,
+        # --repos のリポジトリ名 → 集計と、レコードのキー → リポジトリ名
+        "repo_summary": None,
+        "repo_owners": None,
+        # 実行メトリクス（フェーズごとの所要時間とカウンター、--metrics-out でJSONに書き出す）
+        "metrics": {"spans": {}, "counters": {}},
+        "stats_lock": threading.Lock(),
+        # 検索インデックス・静的JSON・変更の記録の更新（--pipeline では複数のまとまりから同時に呼ばれる）
+        "hooks_lock": threading.Lock(),
+    }
+    unknown = set(options) - set(ctx)
+    if unknown:
+        raise TypeError(f"unknown sync options: {', '.join(sorted(unknown))}")
+    ctx.update(options)
+    return ctx
+
+def log(message):
+    """タイムスタンプ付きログ出力"""
+    second = int(time.time())
+    if _timestamp_cache["second"] != second:
+        _timestamp_cache["text"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _timestamp_cache["second"] = second
+    line = f"[{_timestamp_cache['text']}] {message}"
+    lines = getattr(_log_capture, "lines", None)
+    if lines is not None:
+        lines.append(line)
+    else:
+        print(line)
+
+@contextmanager
+def capture_logs():
+    """ブロック内のログを出力せずリストに溜める"""
+    previous = getattr(_log_capture, "lines", None)
+    _log_capture.lines = []
+    try:
+        yield _log_capture.lines
+    finally:
+        _log_capture.lines = previous
+
+def call_with_logs(function, *args):
+    """function を呼び出し、(戻り値または送出された例外, ブロック内のログ) を返す
+
+    ワーカースレッドのログは capture_logs の保持先（スレッドごと）に入らないため、
+    呼び出し元のスレッドで emit_logs して、呼び出し元の capture_logs に渡す。
+    """
+    with capture_logs() as lines:
+        try:
+            return function(*args), lines
+        except Exception as e:
+            return e, lines
+
+def emit_logs(lines):
+    """capture_logsで溜めたログを出力"""
+    outer = getattr(_log_capture, "lines", None)
+    if outer is not None:
+        outer.extend(lines)
+        return
+    for line in lines:
+        print(line)
+
+def verbose(ctx, level=1):
+    """詳細ログを出すかどうか（重いログは呼び出し側でこれを確認してから組み立てる）"""
+    return ctx["verbosity"] >= level
+
+def count(ctx, name, amount=1):
+    """カウンターを加算"""
+    with ctx["stats_lock"]:
+        counters = ctx["metrics"]["counters"]
+        counters[name] = counters.get(name, 0) + amount
+
+def add_span(ctx, name, seconds, calls=1):
+    """フェーズの所要時間を加算"""
+    with ctx["stats_lock"]:
+        span = ctx["metrics"]["spans"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        span["seconds"] += seconds
+        span["calls"] += calls
+
+@contextmanager
+def timed(ctx, name):
+    """ブロックの所要時間をフェーズnameに加算する"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(ctx, name, time.perf_counter() - started)
+
+def timed_iter(ctx, name, iterable):
+    """イテレーターから要素を取り出すのにかかった時間をフェーズnameに加算する
+
+    ストリーミングモードのように解析と送信が交互に進む場合に、解析側の時間だけを測るために使う。
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        add_span(ctx, name, elapsed)
+
+def chunked(items, size):
+    """リストを最大size件ずつのチャンクに分割する"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,789 @@
+#!/usr/bin/env python3
+"""
+原稿の解析と小説・エピソードの同期
+全件・ストリーミング（--stream）・パイプライン（--pipeline）の各モードの同期処理を行う
+"""
+
+import os
+import json
+import queue
+import threading
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from sync_context import capture_logs, chunked, count, emit_logs, log, timed, timed_iter, verbose
+from sync_journal import inserted_novel_id, record_inserted_novel
+from sync_writes import delete_data, fetch_snapshot, insert_data, novel_repo, update_data
+from sync_outputs import on_episodes_synced, on_novels_synced, record_episode_changes, record_novel_change
+from episode_derive import DERIVE_VERSION, derive_fields, paginate
+from manuscript_io import (
+    cached_derived,
+    load_episode_file,
+    load_episode_header,
+    load_info_file,
+    merge_parse_cache,
+    subset_parse_cache,
+)
+
+# 原稿解析の並列度と、1タスクあたりのエピソード数
+PARSE_WORKERS = int(os.environ.get("SYNC_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_CHUNK_SIZE = int(os.environ.get("SYNC_PARSE_CHUNK_SIZE", "64"))
+
+# ストリーミングモード（--stream）で1回に送信するエピソード数
+STREAM_BATCH_SIZE = int(os.environ.get("SYNC_STREAM_BATCH_SIZE", "200"))
+
+# パイプラインモード（--pipeline）で解析を先行させる小説数の上限（解析済みで送信待ちの小説をこれ以上溜めない）
+PIPELINE_DEPTH = int(os.environ.get("SYNC_PIPELINE_DEPTH", "4"))
+
+# パイプラインモードで同時に送信する小説のまとまりの数
+PIPELINE_UPLOADS = int(os.environ.get("SYNC_PIPELINE_UPLOADS", "2"))
+
+def load_novel_info(ctx, novel_path):
+    """info.ymlを読み込み、同期用の小説データに変換する（対象外の場合はNone）"""
+    # info.ymlから小説情報を取得
+    info_file = novel_path / "info.yml"
+    if not info_file.exists():
+        log(f"⚠️  Skipping {novel_path.name}: info.yml not found")
+        return None
+
+    count(ctx, "files.info")
+    try:
+        novel_data = load_info_file(info_file, ctx["parse_cache"])
+    except Exception as e:
+        log(f"❌ Error reading {info_file}: {e}")
+        return None
+
+    # 必須フィールドの確認
+    required_fields = ['title', 'author', 'published']
+    for field in required_fields:
+        if field not in novel_data:
+            log(f"❌ Missing required field '{field}' in {info_file}")
+            return None
+
+    # publishedがfalseの場合は処理をスキップ
+    if not novel_data.get('published', False):
+        log(f"⚠️  Skipping {novel_path.name}: published=false")
+        return None
+
+    # updatedフィールドのデフォルト値設定
+    updated = novel_data.get('updated', False)
+    novel_id = novel_data.get('id')
+
+    # 処理ロジックの判定
+    if ctx["reconcile"]:
+        # 突き合わせモードではリモートの状態から操作を決めるため updated は参照しない
+        operation = 'update' if novel_id is not None else 'insert'
+        log(f"🔎 Novel '{novel_data['title']}' will be reconciled with Supabase")
+    elif novel_id is not None and updated:
+        # IDが指定されていてupdated=trueの場合は更新
+        operation = 'update'
+        log(f"📝 Novel '{novel_data['title']}' will be updated (id={novel_id})")
+    elif novel_id is None:
+        # IDが指定されていない場合は新規作成
+        operation = 'insert'
+        log(f"➕ Novel '{novel_data['title']}' will be inserted as new")
+    else:
+        # それ以外の場合は無視
+        log(f"⚠️  Skipping {novel_path.name}: id exists but updated=false")
+        return None
+
+    # 一時IDを保存（episodeとの関連付けに使用）
+    temp_novel_id = novel_id if novel_id is not None else novel_data['title']
+    novel_data['temp_novel_id'] = temp_novel_id
+    novel_data['operation'] = operation
+
+    # フィールド名をデータベーススキーマに合わせて変更
+    if 'description' in novel_data:
+        novel_data['summary'] = novel_data.pop('description')
+
+    # データベーススキーマに存在しないフィールドを削除
+    fields_to_remove = ['status', 'published', 'updated']
+    for field in fields_to_remove:
+        if field in novel_data:
+            del novel_data[field]
+
+    # tagsフィールドが存在しない場合は空の配列を設定
+    if 'tags' not in novel_data:
+        novel_data['tags'] = []
+
+    # tagsが文字列の場合は配列に変換
+    if isinstance(novel_data.get('tags'), str):
+        novel_data['tags'] = [novel_data['tags']]
+
+    # tagsが配列でない場合は空の配列に設定
+    if not isinstance(novel_data.get('tags'), list):
+        novel_data['tags'] = []
+
+    # tagsの各要素が文字列であることを確認
+    novel_data['tags'] = [str(tag).strip() for tag in novel_data['tags'] if tag]
+
+    # 日付フィールドを適切なTIMESTAMP形式に変換
+    if 'created_at' in novel_data:
+        # YYYY-MM-DD形式をTIMESTAMP形式に変換
+        try:
+            from datetime import datetime as dt
+            created_date = dt.strptime(novel_data['created_at'], '%Y-%m-%d')
+            novel_data['created_at'] = created_date.isoformat() + 'Z'
+        except ValueError:
+            # 変換失敗時は現在日時を使用
+            novel_data['created_at'] = datetime.now().isoformat() + 'Z'
+
+    # 現在時刻を更新日時として設定
+    novel_data['updated_at'] = datetime.now().isoformat() + 'Z'
+
+    # デバッグ: 処理後のデータを確認
+    if verbose(ctx):
+        log(f"🔍 Processed novel data: {json.dumps(novel_data, indent=2, ensure_ascii=False, default=str)}")
+
+    return novel_data
+
+def list_episode_files(novel_path, episode_names=None):
+    """エピソードファイルをファイル名順に列挙（episode_names指定時はその名前のみ）"""
+    episode_files = sorted(Path(novel_path).glob("*.md"))
+    if episode_names is not None:
+        episode_files = [f for f in episode_files if f.name in episode_names]
+    return episode_files
+
+def parse_episode_file(episode_file, temp_novel_id, cache=None, derive=False):
+    """エピソードファイルを読み込み、同期用のエピソードデータに変換する（対象外の場合はNone）
+
+    deriveを指定した場合は表示用の派生データも計算する（本文が変わっていなければキャッシュを使う）。
+    """
+    try:
+        episode, content = load_episode_file(episode_file, cache)
+
+        episode['temp_novel_id'] = temp_novel_id  # 一時的にinfo.ymlのIDを保存
+        episode['content'] = content
+
+        # statusフィールドのデフォルト値設定
+        episode_status = episode.get('status', 'new')
+
+        # statusに応じた処理フラグを設定
+        if episode_status == 'draft':
+            # 下書きは無視
+            log(f"⚠️  Skipping episode {episode_file.name}: status=draft")
+            return None
+        elif episode_status == 'deleted':
+            # 削除対象としてマーク
+            episode['operation'] = 'delete'
+        elif episode_status == 'updated':
+            # 更新対象としてマーク
+            episode['operation'] = 'update'
+        elif episode_status == 'new':
+            # 新規作成対象としてマーク
+            episode['operation'] = 'insert'
+        else:
+            log(f"⚠️  Unknown status '{episode_status}' for episode {episode_file.name}, treating as 'new'")
+            episode['operation'] = 'insert'
+
+        # episodesテーブルのスキーマに存在しないフィールドを削除
+        fields_to_remove = ['updated_at', 'status']
+        for field in fields_to_remove:
+            if field in episode:
+                del episode[field]
+
+        # 必須フィールドの確認
+        if 'id' not in episode:
+            log(f"⚠️  Episode {episode_file.name} missing 'id', skipping")
+            return None
+
+        # 削除するエピソードはIDしか送信しないため計算しない
+        if derive and episode['operation'] != 'delete':
+            episode.update(cached_derived(episode_file, cache, content, derive_fields, DERIVE_VERSION))
+
+        return episode
+
+    except Exception as e:
+        log(f"❌ Error processing {episode_file}: {e}")
+        return None
+
+def process_novel_directory(ctx, novel_dir, episode_names=None):
+    """小説ディレクトリを処理してデータを抽出
+
+    episode_namesを指定した場合は、そのファイル名のエピソードのみを読み込む。
+    """
+    novel_path = Path(novel_dir)
+    novel_data = load_novel_info(ctx, novel_path)
+    if novel_data is None:
+        return None, []
+
+    # エピソードファイルを処理
+    episodes_data = []
+    episode_files = list_episode_files(novel_path, episode_names)
+    count(ctx, "files.episodes", len(episode_files))
+    for episode_file in episode_files:
+        episode = parse_episode_file(episode_file, novel_data['temp_novel_id'], ctx["parse_cache"], ctx["derive"])
+        if episode is not None:
+            episodes_data.append(episode)
+
+    log(f"📖 Processed novel '{novel_data['title']}' with {len(episodes_data)} episodes")
+    return novel_data, episodes_data
+
+def parse_episode_chunk(episode_files, temp_novel_id, cache, derive):
+    """ワーカープロセスでエピソードをまとめて解析し、ログ出力と更新後のキャッシュも一緒に返す"""
+    with capture_logs() as lines:
+        episodes = [parse_episode_file(episode_file, temp_novel_id, cache, derive) for episode_file in episode_files]
+    return [episode for episode in episodes if episode is not None], lines, cache
+
+def submit_episode_chunk(ctx, executor, episode_files, temp_novel_id):
+    """エピソードのチャンクをワーカーに渡す（該当ファイルのキャッシュエントリも一緒に渡す）"""
+    cache = subset_parse_cache(ctx["parse_cache"], episode_files)
+    return executor.submit(parse_episode_chunk, episode_files, temp_novel_id, cache, ctx["derive"])
+
+def collect_episode_chunk(ctx, future):
+    """ワーカーの解析結果を受け取り、ログ出力とキャッシュの取り込みを行う"""
+    episodes, lines, cache = future.result()
+    emit_logs(lines)
+    merge_parse_cache(ctx["parse_cache"], cache)
+    return episodes
+
+def process_novel_directories(ctx, targets, workers):
+    """複数の小説ディレクトリをプロセスプールで並列に解析する
+
+    エピソードはPARSE_CHUNK_SIZE件ずつのタスクに分割するため、話数の多い小説も
+    複数ワーカーに分散される。結果とログはtargetsの順（逐次処理と同じ順）で返す。
+    """
+    total_files = sum(len(list_episode_files(d, names)) for d, names in targets)
+    if workers <= 1 or total_files <= PARSE_CHUNK_SIZE:
+        return [process_novel_directory(ctx, d, names) for d, names in targets]
+
+    log(f"⚙️  Parsing {total_files} episode files with {workers} workers")
+
+    # info.ymlは小さいため親プロセスで読み込み、ログは小説ごとに保持しておく
+    novels = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for manuscript_dir, episode_names in targets:
+            with capture_logs() as info_lines:
+                novel_data = load_novel_info(ctx, Path(manuscript_dir))
+            futures = []
+            if novel_data is not None:
+                episode_files = list_episode_files(manuscript_dir, episode_names)
+                count(ctx, "files.episodes", len(episode_files))
+                futures = [
+                    submit_episode_chunk(ctx, executor, chunk, novel_data['temp_novel_id'])
+                    for chunk in chunked(episode_files, PARSE_CHUNK_SIZE)
+                ]
+            novels.append((novel_data, info_lines, futures))
+
+        results = []
+        for novel_data, info_lines, futures in novels:
+            emit_logs(info_lines)
+            if novel_data is None:
+                results.append((None, []))
+                continue
+            episodes_data = []
+            for future in futures:
+                episodes_data.extend(collect_episode_chunk(ctx, future))
+            log(f"📖 Processed novel '{novel_data['title']}' with {len(episodes_data)} episodes")
+            results.append((novel_data, episodes_data))
+    return results
+
+def resolve_novel_titles(ctx, all_novels):
+    """id のない新規の小説をタイトルでリモートの小説と対応付け、見つかれば更新にする（--watch）
+
+    同じタイトルの小説がリモートに複数ある場合は、どれか分からないため同期しない（同期する小説のリストを返す）。
+    """
+    titles = [novel_data['title'] for novel_data in all_novels
+              if novel_data.get('operation') == 'insert' and novel_data['temp_novel_id'] not in ctx["known_novel_ids"]]
+    if not titles:
+        return all_novels
+    remote = {}
+    for row in fetch_snapshot(ctx, "novels", ["id", "title"], "title", titles):
+        remote.setdefault(row['title'], []).append(row['id'])
+    resolved = []
+    for novel_data in all_novels:
+        ids = remote.get(novel_data['title'], []) if novel_data.get('operation') == 'insert' else []
+        if len(ids) > 1:
+            log(f"⚠️  Skipping novel '{novel_data['title']}': {len(ids)} remote novels have the same title; set id in info.yml")
+            continue
+        if ids:
+            ctx["known_novel_ids"][novel_data['temp_novel_id']] = ids[0]
+        resolved.append(novel_data)
+    return resolved
+
+def sync_novels(ctx, all_novels):
+    """小説をINSERT/UPDATEし、一時ID→実際の小説IDのマッピングを返す"""
+    if ctx["resolve_novel_titles"]:
+        all_novels = resolve_novel_titles(ctx, all_novels)
+    # 小説の操作別に分類
+    novels_to_insert = []
+    novels_to_update = []
+    temp_id_mapping = {}  # 元のIDを保存
+    insert_temp_ids = []  # novels_to_insertと同じ順の一時ID
+    update_temp_ids = []  # novels_to_updateと同じ順の一時ID
+    id_mapping = {}
+
+    for i, novel_data in enumerate(all_novels):
+        # temp_novel_idを保存
+        temp_id = novel_data.get('temp_novel_id', novel_data.get('title'))
+        if novel_data.get('operation') == 'insert' and temp_id in ctx["known_novel_ids"]:
+            novel_data['id'] = ctx["known_novel_ids"][temp_id]
+            novel_data['operation'] = 'update'
+            log(f"📝 Novel '{temp_id}' already exists in Supabase; updating id={novel_data['id']} instead")
+        temp_id_mapping[i] = temp_id
+
+        # データベースに送信するデータをコピー
+        novel_copy = novel_data.copy()
+        operation = novel_copy.pop('operation', 'insert')
+        novel_copy.pop('temp_novel_id', None)
+
+        if operation == 'update':
+            novels_to_update.append(novel_copy)
+            update_temp_ids.append(temp_id)
+        elif inserted_novel_id(ctx, temp_id) is not None:
+            # 中断前の実行で作成済み（再度INSERTすると重複する）
+            id_mapping[temp_id] = inserted_novel_id(ctx, temp_id)
+            record_novel_change(ctx, id_mapping[temp_id], 'insert')
+            log(f"⏭️  Novel '{temp_id}' was already inserted (id={id_mapping[temp_id]})")
+        else:
+            novels_to_insert.append(novel_copy)
+            insert_temp_ids.append(temp_id)
+
+    def record_batch_ids(indices, records):
+        # バッチごとに記録しておけば、後続のバッチが失敗しても作成済みの小説を再作成しない
+        for i, record in zip(indices, records):
+            record_inserted_novel(ctx, insert_temp_ids[i], record['id'])
+
+    # 新規小説をINSERT
+    if novels_to_insert:
+        novel_response = insert_data(ctx, "novels", novels_to_insert, on_batch=record_batch_ids,
+                                     repo_of=lambda i: novel_repo(ctx, insert_temp_ids[i]))
+        if novel_response:
+            # 新規作成された小説のIDマッピングを作成（失敗したレコードはNone）
+            for temp_id, record in zip(insert_temp_ids, novel_response):
+                if record is not None:
+                    actual_id = record['id']
+                    id_mapping[temp_id] = actual_id
+                    ctx["known_novel_ids"][temp_id] = actual_id
+                    record_novel_change(ctx, actual_id, 'insert')
+                    log(f"  新規: {temp_id} → {actual_id}")
+
+    # 既存小説をUPDATE
+    if novels_to_update:
+        # --reconcile ではリモートに無い小説も info.yml の id で作成する
+        update_response = update_data(ctx, "novels", novels_to_update, "id",
+                                      repo_of=lambda i: novel_repo(ctx, update_temp_ids[i]), upsert=ctx["reconcile"])
+        if update_response:
+            # 更新された小説のIDマッピングを作成（リモートに無く更新しなかった小説のエピソードは送らない）
+            updated_ids = {str(record['id']) for record in update_response}
+            for i, novel_data in enumerate(all_novels):
+                if novel_data.get('operation') == 'update':
+                    temp_id = temp_id_mapping[i]
+                    actual_id = novel_data.get('id')  # 更新の場合は元のIDを使用
+                    if actual_id and str(actual_id) in updated_ids:
+                        id_mapping[temp_id] = actual_id
+                        record_novel_change(ctx, actual_id, 'update')
+                        log(f"  更新: {temp_id} → {actual_id}")
+
+    return id_mapping
+
+def assign_page_count(ctx, episode):
+    """エピソードのページ数を設定する（--paginate 指定時のみ）"""
+    if ctx["paginate"]:
+        with timed(ctx, "paginate"):
+            spans = paginate(episode.get('content') or '', ctx["page_chars"])
+        ctx["page_spans"][str(episode['id'])] = spans
+        episode['page_count'] = len(spans)
+
+def sync_episode_pages(ctx, episodes_to_update, episodes_to_insert):
+    """複数ページに分かれるエピソードのページを episode_pages にUPSERTし、更新で不要になったページを削除する
+
+    1ページに収まるエピソードはページを保存しない（page_count が1なら本文をそのまま使う）。
+    """
+    if not ctx["paginate"]:
+        return
+    pages = []
+    stale = {}  # 保存したページ数 → 更新したエピソードのID（それより後ろのページを削除する）
+    with timed(ctx, "paginate"):
+        for episode in episodes_to_update + episodes_to_insert:
+            content = episode.get('content') or ''
+            spans = ctx["page_spans"].pop(str(episode['id']), None)
+            if spans is None:
+                spans = paginate(content, ctx["page_chars"])
+            stored = len(spans) if len(spans) > 1 else 0
+            for number, (start, end) in enumerate(spans[:stored], 1):
+                pages.append({
+                    "episode_id": episode['id'],
+                    "page_number": number,
+                    "start_offset": start,
+                    "end_offset": end,
+                    "content": content[start:end],
+                })
+        # 新規作成したエピソードには古いページがない
+        for episode in episodes_to_update:
+            stored = episode['page_count'] if episode['page_count'] > 1 else 0
+            stale.setdefault(stored, []).append(episode['id'])
+
+    count(ctx, "pages.episodes", sum(1 for e in episodes_to_update + episodes_to_insert if e['page_count'] > 1))
+    if pages:
+        update_data(ctx, "episode_pages", pages, "episode_id,page_number", upsert=True)
+    # ページが減ったエピソードの残りを削除（保存したページ数ごとにまとめて送る）
+    for stored, episode_ids in sorted(stale.items()):
+        delete_data(ctx, "episode_pages", episode_ids, "episode_id", filters={"page_number": f"gt.{stored}"})
+
+def classify_episodes(ctx, episodes, id_mapping):
+    """エピソードにnovel_idを設定し、削除・更新・新規作成に分類する"""
+    episodes_to_insert = []
+    episodes_to_update = []
+    episodes_to_delete = []
+
+    for episode in episodes:
+        temp_id = episode.get('temp_novel_id')
+        operation = episode.get('operation', 'insert')
+
+        # novel_idを実際のIDに更新
+        if temp_id in id_mapping:
+            episode['novel_id'] = id_mapping[temp_id]
+            episode.pop('temp_novel_id', None)
+            episode.pop('operation', None)
+
+            if operation == 'delete':
+                episodes_to_delete.append(episode['id'])
+                # 削除はIDしか送らないため、小説IDと話数はここで記録する
+                record_episode_changes(ctx, 'delete', [episode])
+            elif operation == 'update':
+                assign_page_count(ctx, episode)
+                episodes_to_update.append(episode)
+                record_episode_changes(ctx, 'update', [episode])
+            else:  # insert or new
+                assign_page_count(ctx, episode)
+                if ctx["upsert_new_episodes"]:
+                    # 既に作成済みなら更新になる（古いページの削除も更新と同じく行う）
+                    episodes_to_update.append(episode)
+                else:
+                    episodes_to_insert.append(episode)
+                record_episode_changes(ctx, 'insert', [episode])
+        else:
+            log(f"⚠️  Could not map episode {episode.get('id')} to novel ID")
+
+    return episodes_to_delete, episodes_to_update, episodes_to_insert
+
+def sync_episodes(ctx, episodes, id_mapping):
+    """エピソードを 削除 → 更新 → 新規作成 の順に同期する"""
+    log("🔗 Processing episodes...")
+
+    episodes_to_delete, episodes_to_update, episodes_to_insert = classify_episodes(ctx, episodes, id_mapping)
+
+    # エピソードの削除
+    if episodes_to_delete:
+        delete_data(ctx, "episodes", episodes_to_delete, "id")
+
+    # エピソードの更新（--watch では status: new のエピソードも更新として送るため、無ければ作成する）
+    if episodes_to_update:
+        update_data(ctx, "episodes", episodes_to_update, "id", upsert=ctx["upsert_new_episodes"])
+
+    # エピソードの新規作成
+    if episodes_to_insert:
+        insert_data(ctx, "episodes", episodes_to_insert)
+
+    # ページはエピソードを作成してから（episode_id の外部キー）
+    sync_episode_pages(ctx, episodes_to_update, episodes_to_insert)
+    on_episodes_synced(ctx, episodes_to_delete, episodes_to_update + episodes_to_insert)
+
+def iter_novel_episodes(ctx, manuscript_dir, episode_names, temp_novel_id, executor=None, window=4):
+    """小説のエピソードを1件ずつ解析して返すジェネレーター
+
+    executorを渡した場合は最大window個のチャンクだけ先行して並列解析するため、
+    保持するエピソード数は window × PARSE_CHUNK_SIZE 件以内に収まる。
+    """
+    episode_files = list_episode_files(manuscript_dir, episode_names)
+    count(ctx, "files.episodes", len(episode_files))
+    if executor is None:
+        for episode_file in episode_files:
+            episode = parse_episode_file(episode_file, temp_novel_id, ctx["parse_cache"], ctx["derive"])
+            if episode is not None:
+                yield episode
+        return
+
+    pending = deque()
+    for chunk in chunked(episode_files, PARSE_CHUNK_SIZE):
+        pending.append(submit_episode_chunk(ctx, executor, chunk, temp_novel_id))
+        if len(pending) >= window:
+            yield from collect_episode_chunk(ctx, pending.popleft())
+    while pending:
+        yield from collect_episode_chunk(ctx, pending.popleft())
+
+def scan_deleted_episodes(ctx, manuscript_dir, episode_names, temp_novel_id):
+    """エピソードのヘッダーだけを読み、status: deleted のエピソード（id・話数・一時小説ID）を返す"""
+    deleted = []
+    for episode_file in list_episode_files(manuscript_dir, episode_names):
+        try:
+            metadata, _ = load_episode_header(episode_file, ctx["parse_cache"])
+        except Exception:
+            # 解析できないファイルは本文の解析時にエラーとして出力される
+            continue
+        if isinstance(metadata, dict) and metadata.get('status') == 'deleted' and 'id' in metadata:
+            deleted.append({
+                "id": metadata['id'],
+                "episode_number": metadata.get('episode_number'),
+                "temp_novel_id": temp_novel_id,
+                "operation": "delete",
+            })
+    return deleted
+
+def delete_episodes_first(ctx, deleted, id_mapping):
+    """status: deleted のエピソードを、他のエピソードの書き込みより先にまとめて削除し、削除したIDの集合を返す
+
+    小説ごとに送信するモードでは、小説をまたいでエピソードを移した（元の小説で deleted、
+    移動先で new）場合に、移動先のINSERTが元の小説の削除より先に届くと重複で失敗するため。
+    """
+    deletes, _, _ = classify_episodes(ctx, [e for e in deleted if e['temp_novel_id'] in id_mapping], id_mapping)
+    if deletes:
+        delete_data(ctx, "episodes", deletes, "id")
+        on_episodes_synced(ctx, deletes, [])
+    return {str(episode_id) for episode_id in deletes}
+
+def flush_episode_batch(ctx, episodes_to_delete, episodes_to_update, episodes_to_insert):
+    """溜まったエピソードを 削除 → 更新 → 新規作成 の順に送信してバッファを空にする"""
+    if episodes_to_delete:
+        delete_data(ctx, "episodes", episodes_to_delete, "id")
+    if episodes_to_update:
+        update_data(ctx, "episodes", episodes_to_update, "id", upsert=ctx["upsert_new_episodes"])
+    if episodes_to_insert:
+        insert_data(ctx, "episodes", episodes_to_insert)
+    sync_episode_pages(ctx, episodes_to_update, episodes_to_insert)
+    on_episodes_synced(ctx, episodes_to_delete, episodes_to_update + episodes_to_insert)
+    episodes_to_delete.clear()
+    episodes_to_update.clear()
+    episodes_to_insert.clear()
+
+def sync_all(ctx, targets, workers):
+    """全小説・全エピソードを解析してから同期する"""
+    all_novels = []
+    all_episodes = []
+
+    # データディレクトリ直下の各書名ディレクトリを処理
+    with timed(ctx, "parse"):
+        parsed = process_novel_directories(ctx, targets, workers)
+    for novel_data, episodes_data in parsed:
+        if novel_data:
+            all_novels.append(novel_data)
+            all_episodes.extend(episodes_data)
+
+    if not all_novels:
+        log("⚠️  No valid novels found to sync")
+        return
+
+    # Supabaseに同期
+    log(f"📊 Summary: {len(all_novels)} novels, {len(all_episodes)} episodes")
+
+    # 1. 小説の処理
+    id_mapping = sync_novels(ctx, all_novels)
+    on_novels_synced(ctx, all_novels, id_mapping)
+
+    # 2. エピソードの処理
+    if all_episodes and id_mapping:
+        sync_episodes(ctx, all_episodes, id_mapping)
+
+def stream_sync(ctx, targets, workers, batch_size):
+    """エピソードを全件メモリに載せず、小説ごとに解析してバッチ単位で送信する
+
+    小説（info.yml）は小さいため先にまとめて同期してIDを確定させ、
+    その後IDが解決した小説のエピソードだけを batch_size 件ずつ送信する。
+    status: deleted のエピソードは、ヘッダーだけを先に読んで全小説分をまとめて最初に削除する。
+    """
+    novels = []
+    deleted = []
+    with timed(ctx, "parse"):
+        for manuscript_dir, episode_names in targets:
+            novel_data = load_novel_info(ctx, Path(manuscript_dir))
+            if novel_data:
+                novels.append((novel_data, manuscript_dir, episode_names))
+                deleted.extend(scan_deleted_episodes(ctx, manuscript_dir, episode_names, novel_data['temp_novel_id']))
+
+    if not novels:
+        log("⚠️  No valid novels found to sync")
+        return
+
+    log(f"📊 Summary: {len(novels)} novels (episodes are streamed in batches of {batch_size})")
+
+    # 1. 小説の処理（エピソードより先にIDを確定させる）
+    id_mapping = sync_novels(ctx, [novel_data for novel_data, _, _ in novels])
+    on_novels_synced(ctx, [novel_data for novel_data, _, _ in novels], id_mapping)
+    if not id_mapping:
+        return
+
+    # 2. エピソードの処理（削除は小説をまたいで全て先に行う）
+    deleted_ids = delete_episodes_first(ctx, deleted, id_mapping)
+    log("🔗 Streaming episodes...")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    episodes_to_delete, episodes_to_update, episodes_to_insert = [], [], []
+    total = 0
+    try:
+        for novel_data, manuscript_dir, episode_names in novels:
+            temp_id = novel_data['temp_novel_id']
+            if temp_id not in id_mapping:
+                log(f"⚠️  Skipping episodes of '{novel_data['title']}': novel ID was not resolved")
+                continue
+
+            episode_count = 0
+            episodes = iter_novel_episodes(ctx, manuscript_dir, episode_names, temp_id, executor, workers * 2)
+            for episode in timed_iter(ctx, "parse", episodes):
+                episode_count += 1
+                if episode.get('operation') == 'delete' and str(episode['id']) in deleted_ids:
+                    continue
+                deletes, updates, inserts = classify_episodes(ctx, [episode], id_mapping)
+                episodes_to_delete.extend(deletes)
+                episodes_to_update.extend(updates)
+                episodes_to_insert.extend(inserts)
+                if len(episodes_to_update) + len(episodes_to_insert) >= batch_size or len(episodes_to_delete) >= batch_size:
+                    flush_episode_batch(ctx, episodes_to_delete, episodes_to_update, episodes_to_insert)
+
+            log(f"📖 Processed novel '{novel_data['title']}' with {episode_count} episodes")
+            total += episode_count
+
+        flush_episode_batch(ctx, episodes_to_delete, episodes_to_update, episodes_to_insert)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log(f"📊 Streamed {total} episodes")
+
+def put_ready(ready, item, stop):
+    """解析結果をキューに入れる（送信側が中断した場合はFalseを返す）"""
+    while not stop.is_set():
+        try:
+            ready.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def parse_novels_ahead(ctx, targets, workers, ready, stop):
+    """解析スレッド: 小説を順に解析し、(小説データ, エピソード, ログ) を ready に入れる
+
+    ready が一杯の間は待つため、先行して保持する小説は ready の大きさまでになる。
+    終わったら None、例外が発生した場合はその例外を入れる。
+    """
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for manuscript_dir, episode_names in targets:
+            with capture_logs() as lines, timed(ctx, "parse"):
+                novel_data = load_novel_info(ctx, Path(manuscript_dir))
+                episodes = []
+                if novel_data is not None:
+                    episodes = list(iter_novel_episodes(
+                        ctx,                         manuscript_dir, episode_names, novel_data['temp_novel_id'], executor, workers * 2))
+                    log(f"📖 Processed novel '{novel_data['title']}' with {len(episodes)} episodes")
+            if not put_ready(ready, (novel_data, episodes, lines), stop):
+                return
+        put_ready(ready, None, stop)
+    except Exception as e:
+        put_ready(ready, e, stop)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def upload_novel_group(ctx, group):
+    """解析の終わった小説をまとめて 小説の書き込み → エピソードの削除 → 更新・新規作成 の順に送信する
+
+    送信スレッドで実行するため、ログは溜めて (ログ, 発生した例外) として返す。
+    """
+    with capture_logs() as lines:
+        try:
+            novels = [novel_data for novel_data, _ in group]
+            episodes = [episode for _, novel_episodes in group for episode in novel_episodes]
+            log(f"📤 Uploading {len(novels)} novels, {len(episodes)} episodes")
+            id_mapping = sync_novels(ctx, novels)
+            on_novels_synced(ctx, novels, id_mapping)
+            if episodes and id_mapping:
+                sync_episodes(ctx, episodes, id_mapping)
+        except BaseException as e:
+            # sys.exit（逐次モードの書き込み失敗）もメインスレッドで送出し直す
+            return lines, e
+    return lines, None
+
+def finish_upload(ctx, future):
+    """まとまりの送信の完了を待ってログを出力する（失敗していれば例外を送出する）"""
+    with timed(ctx, "pipeline.upload_wait"):
+        lines, error = future.result()
+    emit_logs(lines)
+    if error is not None:
+        raise error
+
+def delete_moved_sources(ctx, targets):
+    """IDが分かっている小説の status: deleted のエピソードを先に削除し、削除したIDの集合を返す
+
+    小説のIDは info.yml の id（なければこのプロセス・中断前の実行で作成したID）から決める。
+    IDの分からない小説はこれから作成する小説のため、削除するエピソードはまだない。
+    """
+    deleted = []
+    id_mapping = {}
+    with timed(ctx, "parse"), capture_logs():
+        # 小説の読み込みのログは解析スレッドが改めて出力する
+        for manuscript_dir, episode_names in targets:
+            novel_data = load_novel_info(ctx, Path(manuscript_dir))
+            if novel_data is None:
+                continue
+            temp_id = novel_data['temp_novel_id']
+            novel_id = novel_data.get('id')
+            if novel_id is None:
+                novel_id = ctx["known_novel_ids"].get(temp_id, inserted_novel_id(ctx, temp_id))
+            if novel_id is None:
+                continue
+            id_mapping[temp_id] = novel_id
+            deleted.extend(scan_deleted_episodes(ctx, manuscript_dir, episode_names, temp_id))
+    return delete_episodes_first(ctx, deleted, id_mapping)
+
+def pipeline_sync(ctx, targets, workers, batch_size):
+    """小説ごとのタスク（解析 → 小説の書き込み → エピソードの書き込み）を、小説をまたいで重ねて実行する
+
+    解析は別スレッド（workers が2以上ならプロセスプールも使う）で PIPELINE_DEPTH 作品先まで進める。
+    解析の終わった連続する小説をエピソードが batch_size 件に達するまでまとめ、まとまりごとに
+    送信スレッドで書き込む。まとまり同士は依存しないため PIPELINE_UPLOADS 個まで同時に送信する。
+    まとめ方は解析の速さによらないため、--resume でも同じバッチになる。ログはまとまりの順に出力する。
+    まとまりの送信順は決まらないため、status: deleted のエピソードは解析の前にヘッダーだけを読んで
+    全小説分をまとめて削除しておく（小説をまたいだ移動で、移動先のINSERTが先に届かないように）。
+    """
+    deleted_ids = delete_moved_sources(ctx, targets)
+    ready = queue.Queue(maxsize=max(1, PIPELINE_DEPTH))
+    stop = threading.Event()
+    parser = threading.Thread(target=parse_novels_ahead, args=(ctx, targets, workers, ready, stop), daemon=True)
+    parser.start()
+    log(f"🔀 Pipelining parse and upload ({max(1, PIPELINE_DEPTH)} novels parsed ahead, "
+        f"{max(1, PIPELINE_UPLOADS)} uploads in parallel)")
+
+    group = []
+    pending_episodes = 0
+    totals = {"novels": 0, "episodes": 0}
+    uploads = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, PIPELINE_UPLOADS)) as uploader:
+            while True:
+                with timed(ctx, "pipeline.parse_wait"):
+                    item = ready.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item is not None:
+                    novel_data, episodes, lines = item
+                    emit_logs(lines)
+                    if novel_data is None:
+                        continue
+                    group.append((novel_data, [
+                        episode for episode in episodes
+                        if not (episode.get('operation') == 'delete' and str(episode['id']) in deleted_ids)
+                    ]))
+                    pending_episodes += len(episodes)
+                    totals["novels"] += 1
+                    totals["episodes"] += len(episodes)
+                    if pending_episodes < batch_size:
+                        continue
+                if group:
+                    uploads.append(uploader.submit(upload_novel_group, ctx, group))
+                    group = []
+                    pending_episodes = 0
+                # 送信中のまとまりが上限に達したら、古いものから完了を待つ
+                while uploads and (len(uploads) >= max(1, PIPELINE_UPLOADS) or item is None):
+                    finish_upload(ctx, uploads.popleft())
+                if item is None:
+                    break
+    finally:
+        stop.set()
+        parser.join()
+
+    if not totals["novels"]:
+        log("⚠️  No valid novels found to sync")
+        return
+    log(f"📊 Summary: {totals['novels']} novels, {totals['episodes']} episodes")
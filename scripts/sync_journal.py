@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+同期の進捗ジャーナル（完了したバッチと新規小説のIDを記録し、中断した同期を続きから再開する）
+sync_supabase.py の --journal / --resume で使用する
+
+ジャーナルは1行1エントリのJSON Lines:
+  {"type": "start", "data_dir": ...}        同期したデータディレクトリ
+  {"type": "batch", "key": ...}             完了したバッチ（テーブル・操作・本文のハッシュ）
+  {"type": "novel", "temp_id": ..., "id": ...} 新規作成した小説の 一時ID → ID
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from sync_context import log
+
+# --resume で --journal を指定しない場合のジャーナルのパス
+JOURNAL_PATH = os.environ.get("SYNC_JOURNAL", ".cache/sync-journal.jsonl")
+
+def open_journal(path, data_dir, resume):
+    """ジャーナルを開く
+
+    resume時は既存の記録（完了したバッチのキーと新規小説のID）を読み込んで追記する。
+    それ以外は新しく作り直す。
+    """
+    source = str(Path(data_dir).resolve())
+    journal = {"path": path, "batches": set(), "mapping": {}, "file": None, "lock": threading.Lock()}
+    needs_newline = False
+
+    if resume and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 中断時に書きかけだった行
+                continue
+            if entry.get("type") == "start" and entry.get("data_dir") != source:
+                log(f"❌ Journal {path} was written for {entry.get('data_dir')}, not {source}")
+                sys.exit(1)
+            elif entry.get("type") == "batch":
+                journal["batches"].add(entry["key"])
+            elif entry.get("type") == "novel":
+                journal["mapping"][entry["temp_id"]] = entry["id"]
+        needs_newline = bool(text) and not text.endswith("\n")
+        journal["file"] = open(path, "a", encoding="utf-8")
+        log(f"📒 Resuming from {path}: {len(journal['batches'])} batches done, "
+            f"{len(journal['mapping'])} novels already inserted")
+    else:
+        if resume:
+            log(f"📒 No journal at {path}, starting from the beginning")
+        elif os.path.exists(path):
+            log(f"⚠️  Discarding the journal of a previous run at {path} (use --resume to continue it)")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        journal["file"] = open(path, "w", encoding="utf-8")
+
+    if needs_newline:
+        journal["file"].write("\n")
+    if not journal["batches"] and not journal["mapping"]:
+        write_journal(journal, {"type": "start", "data_dir": source})
+    return journal
+
+def write_journal(journal, entry):
+    """ジャーナルに1行追記する（中断されても直前までの記録が残るよう毎回flushする）"""
+    if journal is None:
+        return
+    with journal["lock"]:
+        journal["file"].write(json.dumps(entry, ensure_ascii=False) + "\n")
+        journal["file"].flush()
+
+def close_journal(journal, success):
+    """ジャーナルを閉じる（成功時は不要になるため削除する）"""
+    if journal is None:
+        return
+    journal["file"].close()
+    if success:
+        os.remove(journal["path"])
+
+def batch_key(table_name, operation, payload):
+    """バッチの内容から決まるキー（同じ内容のバッチは再実行時も同じキーになる）"""
+    return f"{table_name}:{operation}:{hashlib.sha1(payload).hexdigest()}"
+
+def batch_done(ctx, key):
+    """前回の実行で完了済みのバッチか"""
+    return ctx["journal"] is not None and key in ctx["journal"]["batches"]
+
+def record_batch(ctx, key):
+    """バッチの完了をジャーナルに記録"""
+    write_journal(ctx["journal"], {"type": "batch", "key": key})
+
+def inserted_novel_id(ctx, temp_novel_id):
+    """前回の実行で新規作成済みの小説のID（なければNone）"""
+    if ctx["journal"] is None:
+        return None
+    return ctx["journal"]["mapping"].get(temp_novel_id)
+
+def record_inserted_novel(ctx, temp_novel_id, novel_id):
+    """新規作成した小説の一時ID→IDをジャーナルに記録"""
+    write_journal(ctx["journal"], {"type": "novel", "temp_id": temp_novel_id, "id": novel_id})
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+同期結果の反映（検索インデックス・静的JSON・変更マニフェストとページの再生成）
+書き込みが終わった小説・エピソードを各出力に反映し、同期の最後に確定させる
+"""
+
+import os
+import sys
+import json
+import time
+import requests
+
+from sync_context import chunked, count, log, timed
+from sync_transport import (
+    CONNECT_TIMEOUT,
+    MAX_RETRIES,
+    READ_TIMEOUT,
+    THROTTLE_STATUS_CODES,
+    TRANSIENT_STATUS_CODES,
+    backoff_delay,
+    parse_retry_after,
+)
+from sync_writes import fetch_snapshot
+from search_index import episode_text, novel_text, remove_document, save_index, update_document
+from static_export import finish_export, stage_episodes, stage_novels
+from revalidation import (
+    build_manifest,
+    episode_order,
+    has_changes,
+    neighbor_novels,
+    page_paths,
+    stage_episodes as stage_episode_changes,
+    stage_novel as stage_novel_change,
+    write_manifest,
+)
+
+# 再生成Webhookの認証用シークレットと、1リクエストで送るパスの件数
+REVALIDATE_SECRET = os.environ.get("SYNC_REVALIDATE_SECRET")
+REVALIDATE_BATCH_SIZE = int(os.environ.get("SYNC_REVALIDATE_BATCH_SIZE", "50"))
+
+def search_index_rebuild(ctx):
+    """検索インデックスが無い・形式が古いため、全ファイルから作り直す必要があるか"""
+    return ctx["search_index"] is not None and ctx["search_index"]["rebuild"]
+
+def index_novels(ctx, all_novels, id_mapping):
+    """IDが確定した小説を検索インデックスに反映する"""
+    index = ctx["search_index"]
+    if index is None:
+        return
+    updated = 0
+    with timed(ctx, "search_index"):
+        for novel_data in all_novels:
+            novel_id = id_mapping.get(novel_data.get('temp_novel_id'))
+            if novel_id is None:
+                continue
+            meta = {"type": "novel", "novel_id": novel_id, "title": novel_data.get('title')}
+            updated += update_document(index, f"novel:{novel_id}", novel_text(novel_data), meta)
+    count(ctx, "search_index.novels", updated)
+
+def index_episodes(ctx, deleted_ids, episodes):
+    """削除したエピソードを検索インデックスから外し、送信したエピソードを追加・更新する
+
+    内容が前回と同じエピソードはインデックス側のハッシュで判定して飛ばす。
+    """
+    index = ctx["search_index"]
+    if index is None:
+        return
+    updated = 0
+    removed = 0
+    with timed(ctx, "search_index"):
+        for episode_id in deleted_ids:
+            removed += remove_document(index, f"episode:{episode_id}")
+        for episode in episodes:
+            meta = {
+                "type": "episode",
+                "episode_id": episode['id'],
+                "novel_id": episode.get('novel_id'),
+                "episode_number": episode.get('episode_number'),
+                "title": episode.get('title'),
+            }
+            updated += update_document(index, f"episode:{episode['id']}", episode_text(episode), meta)
+    count(ctx, "search_index.episodes", updated)
+    count(ctx, "search_index.removed", removed)
+
+def export_novels(ctx, all_novels, id_mapping):
+    """IDが確定した小説のメタデータを静的JSONの書き出し対象に加える"""
+    if ctx["export"] is None:
+        return
+    with timed(ctx, "export"):
+        stage_novels(ctx["export"], [
+            (id_mapping[novel_data['temp_novel_id']], novel_data)
+            for novel_data in all_novels
+            if novel_data.get('temp_novel_id') in id_mapping
+        ])
+
+def export_episodes(ctx, deleted_ids, episodes):
+    """削除したエピソードと送信したエピソードを静的JSONの書き出し対象に加える"""
+    if ctx["export"] is None:
+        return
+    with timed(ctx, "export"):
+        stage_episodes(ctx["export"], deleted_ids, episodes)
+
+def record_novel_change(ctx, novel_id, operation):
+    """書き込んだ小説を変更マニフェストに記録する"""
+    if ctx["changes"] is None:
+        return
+    with ctx["hooks_lock"]:
+        stage_novel_change(ctx["changes"], novel_id, operation)
+
+def record_episode_changes(ctx, operation, episodes):
+    """書き込むエピソードを変更マニフェストに記録する（書き込みに失敗しても再生成するだけなので先に記録する）"""
+    if ctx["changes"] is None or not episodes:
+        return
+    with ctx["hooks_lock"]:
+        stage_episode_changes(ctx["changes"], operation, episodes)
+
+def write_succeeded(ctx, table_name, record_id):
+    """レコードの書き込みが失敗していないか"""
+    return (table_name, str(record_id)) not in ctx["failed_records"]
+
+def on_novels_synced(ctx, all_novels, id_mapping):
+    """小説の同期後に、書き込みに成功した小説を検索インデックスと静的JSONに反映する"""
+    all_novels = [novel_data for novel_data in all_novels
+                  if write_succeeded(ctx, 'novels', id_mapping.get(novel_data.get('temp_novel_id')))]
+    with ctx["hooks_lock"]:
+        index_novels(ctx, all_novels, id_mapping)
+        export_novels(ctx, all_novels, id_mapping)
+
+def on_episodes_synced(ctx, deleted_ids, episodes):
+    """エピソードの同期後に、書き込みに成功したエピソードを検索インデックスと静的JSONに反映する"""
+    deleted_ids = [episode_id for episode_id in deleted_ids if write_succeeded(ctx, 'episodes', episode_id)]
+    episodes = [episode for episode in episodes if write_succeeded(ctx, 'episodes', episode['id'])]
+    with ctx["hooks_lock"]:
+        index_episodes(ctx, deleted_ids, episodes)
+        export_episodes(ctx, deleted_ids, episodes)
+
+def fetch_episode_order(ctx, novel_ids):
+    """同期後の目次の順序（前後の話の特定用）を取得する（取得できなければNone）"""
+    if not novel_ids:
+        return {}
+    try:
+        rows = fetch_snapshot(ctx, "episodes", ["id", "novel_id", "episode_number"], "novel_id", novel_ids,
+                              fatal=False)
+    except requests.exceptions.RequestException:
+        # 書き込みは終わっているため同期を失敗させず、小説の配下をまとめて再生成する
+        log("⚠️  Could not fetch episode order; revalidating whole novels instead")
+        return None
+    return episode_order(rows, novel_ids)
+
+def post_revalidation(ctx, url, kind, paths):
+    """再生成するパスを REVALIDATE_BATCH_SIZE 件ずつ Webhook に送る（失敗したパスの件数を返す）
+
+    本文は {"type": "page" | "layout", "paths": [...]}。同じパスを再生成し直しても問題ないため、
+    接続断・429・5xx は再試行する。
+    """
+    headers = {"Content-Type": "application/json"}
+    if REVALIDATE_SECRET:
+        headers["Authorization"] = f"Bearer {REVALIDATE_SECRET}"
+    failed = 0
+    for batch in chunked(paths, max(1, REVALIDATE_BATCH_SIZE)):
+        body = json.dumps({"type": kind, "paths": batch}, ensure_ascii=False).encode("utf-8")
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = ctx["session"].post(url, data=body, headers=headers,
+                                               timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                count(ctx, "revalidate.requests")
+                if response.ok:
+                    break
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code in THROTTLE_STATUS_CODES | TRANSIENT_STATUS_CODES
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except requests.exceptions.RequestException as e:
+                error = type(e).__name__
+                retryable = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            if not retryable or attempt >= MAX_RETRIES:
+                log(f"⚠️  Revalidation webhook failed for {len(batch)} {kind} paths: {error}")
+                failed += len(batch)
+                break
+            attempt += 1
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            log(f"🔁 Retrying revalidation webhook in {delay:.1f}s ({error}, attempt {attempt}/{MAX_RETRIES})")
+            time.sleep(delay)
+    return failed
+
+def emit_changes(ctx, args):
+    """変更マニフェストを書き出し、再生成が必要なページのパスを Webhook に送る
+
+    同期が途中で失敗した場合も呼ぶ（書き込めた分のページを古いまま残さないため）。
+    """
+    changes = ctx["changes"]
+    if changes is None:
+        return
+    with timed(ctx, "revalidate"):
+        order = fetch_episode_order(ctx, neighbor_novels(changes)) if has_changes(changes) else {}
+        paths, layouts = page_paths(changes, order)
+        if args.changes_out:
+            write_manifest(args.changes_out, build_manifest(changes, paths, layouts))
+            log(f"🧾 Wrote change manifest to {args.changes_out} ({len(changes['novels'])} novels, "
+                f"{len(changes['episodes'])} episodes, {len(paths) + len(layouts)} paths)")
+        count(ctx, "revalidate.paths", len(paths))
+        count(ctx, "revalidate.layouts", len(layouts))
+        if args.revalidate_url and (paths or layouts):
+            failed = post_revalidation(ctx, args.revalidate_url, "page", paths)
+            failed += post_revalidation(ctx, args.revalidate_url, "layout", layouts)
+            count(ctx, "revalidate.failed", failed)
+            if failed:
+                log(f"⚠️  {failed} paths were not revalidated; the manifest lists every changed page")
+            else:
+                log(f"♻️  Revalidated {len(paths)} pages and {len(layouts)} novels")
+
+def log_repo_summary(ctx):
+    """--repos のリポジトリごとの結果を出力する"""
+    icons = {"success": "✅", "failed": "❌", "invalid": "⛔"}
+    log("📋 Repositories:")
+    for name, summary in ctx["repo_summary"].items():
+        log(f"  {icons[summary['status']]} {name}: {summary['status']}, {summary['novels']} novels, "
+            f"{summary['episodes']} episodes" + (f", {len(summary['errors'])} errors" if summary['errors'] else ""))
+        for error in summary["errors"][:5]:
+            log(f"      - {error}")
+        if len(summary["errors"]) > 5:
+            log(f"      ... and {len(summary['errors']) - 5} more")
+
+def finish_sync(ctx, args):
+    """書き込みの失敗を報告し、成功していれば検索インデックスと静的JSONを確定させる
+
+    --repos では失敗したリポジトリがあっても他のリポジトリの分を確定させてから終了する。
+    """
+    write_failures = ctx["write_failures"]
+    repo_summary = ctx["repo_summary"]
+    if write_failures:
+        log(f"❌ {len(write_failures)} write requests failed:")
+        for failure in write_failures:
+            log(f"  - {failure}")
+        if repo_summary is None:
+            sys.exit(1)
+
+    # 書き込みが全て成功したときだけ保存する（失敗した分は次回の同期で入れ直される）
+    if ctx["search_index"] is not None:
+        with timed(ctx, "search_index.save"):
+            saved = save_index(ctx["search_index"])
+        if saved:
+            log(f"🔤 Saved search index to {args.search_index} ({len(ctx['search_index']['by_key'])} documents)")
+
+    # 目次と前後の話は全ての書き込みが終わってから確定させる
+    if ctx["export"] is not None:
+        with timed(ctx, "export"):
+            written = finish_export(ctx["export"], log)
+        count(ctx, "export.novels", written["novels"])
+        count(ctx, "export.episodes", written["episodes"])
+        count(ctx, "export.removed", written["removed"])
+        log(f"📦 Exported {written['novels']} novels and {written['episodes']} episodes "
+            f"({written['removed']} removed) to {args.export_dir}")
+
+    if repo_summary is not None:
+        log_repo_summary(ctx)
+        failed = [name for name, summary in repo_summary.items() if summary["status"] != "success"]
+        if failed:
+            log(f"❌ {len(failed)} of {len(repo_summary)} repositories were not fully synced: {', '.join(failed)}")
+            sys.exit(1)
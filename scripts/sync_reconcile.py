@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+突き合わせモード（--reconcile）
+ローカルの原稿とリモートの状態を content_hash で比較し、差分だけを同期する
+"""
+
+import json
+import hashlib
+
+from sync_context import log, timed
+from sync_core import (
+    assign_page_count,
+    list_episode_files,
+    process_novel_directories,
+    sync_episode_pages,
+    sync_novels,
+)
+from sync_writes import delete_data, fetch_snapshot, insert_data, update_data
+from sync_outputs import on_episodes_synced, on_novels_synced, record_episode_changes
+from manuscript_io import load_episode_header
+
+# 内容のハッシュ（content_hash）の計算から除く項目（同期のたびに変わるもの）
+FINGERPRINT_EXCLUDED_FIELDS = {"updated_at", "content_hash"}
+
+def content_fingerprint(record):
+    """レコード内容のハッシュ（リモートの content_hash と比較して変更の有無を判定する）"""
+    payload = {k: v for k, v in record.items() if k not in FINGERPRINT_EXCLUDED_FIELDS}
+    encoded = json.dumps(payload, ensure_ascii=False, allow_nan=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def reconcile_novels(ctx, all_novels):
+    """小説をリモートの状態と突き合わせ、変更のある小説だけを同期して一時ID→小説IDのマッピングを返す
+
+    info.yml に id があればIDで、なければタイトルでリモートの小説と対応付ける。
+    小説は複数のデータリポジトリから同期されうるため、リモートにしかない小説は削除しない。
+    """
+    with timed(ctx, "snapshot"):
+        remote_by_id = {
+            str(row['id']): row
+            for row in fetch_snapshot(ctx, "novels", ["id", "title", "content_hash"], "id",
+                                      [n['id'] for n in all_novels if n.get('id') is not None])
+        }
+        remote_by_title = {}
+        for row in fetch_snapshot(ctx, "novels", ["id", "title", "content_hash"], "title",
+                                  [n['title'] for n in all_novels if n.get('id') is None]):
+            remote_by_title.setdefault(row['title'], []).append(row)
+
+    id_mapping = {}
+    changed = []
+    unchanged = 0
+    for novel_data in all_novels:
+        temp_id = novel_data['temp_novel_id']
+        if novel_data.get('id') is not None:
+            remote = remote_by_id.get(str(novel_data['id']))
+        else:
+            matches = remote_by_title.get(novel_data['title'], [])
+            if len(matches) > 1:
+                log(f"⚠️  Skipping novel '{novel_data['title']}': {len(matches)} remote novels have the same title; set id in info.yml")
+                continue
+            remote = matches[0] if matches else None
+            if remote is not None:
+                novel_data['id'] = remote['id']
+
+        # 小説IDは自動採番でinfo.ymlにない場合もあるため、ハッシュには含めない
+        record = {k: v for k, v in novel_data.items() if k not in ('temp_novel_id', 'operation', 'id')}
+        novel_data['content_hash'] = content_fingerprint(record)
+        if remote is not None and remote.get('content_hash') == novel_data['content_hash']:
+            id_mapping[temp_id] = remote['id']
+            unchanged += 1
+            continue
+        # IDが決まっているもの（info.ymlで指定・リモートに存在）はUPSERT、それ以外はINSERT
+        novel_data['operation'] = 'update' if novel_data.get('id') is not None else 'insert'
+        changed.append(novel_data)
+
+    inserts = sum(1 for n in changed if n['operation'] == 'insert')
+    log(f"🔎 Novels: {inserts} to insert, {len(changed) - inserts} to update, {unchanged} unchanged")
+    if changed:
+        id_mapping.update(sync_novels(ctx, changed))
+    return id_mapping
+
+def scan_episode_files(ctx, novels):
+    """原稿ファイルのヘッダーから、リモートにあっても削除してはいけないエピソードを調べる
+
+    novels は (manuscriptディレクトリ, 読み込むエピソード名, 小説データ) のリスト。
+    戻り値は {"ids": 削除しないエピソードIDの集合, "unreadable": 一時小説ID → IDの分からないファイル名のリスト}。
+    status: deleted / draft 以外のエピソードは、本文の解析に失敗していてもIDが分かれば削除しない。
+    """
+    on_disk = {"ids": set(), "unreadable": {}}
+    for manuscript_dir, episode_names, novel_data in novels:
+        for episode_file in list_episode_files(manuscript_dir, episode_names):
+            try:
+                metadata, _ = load_episode_header(episode_file, ctx["parse_cache"])
+            except Exception:
+                metadata = None
+            if not isinstance(metadata, dict) or 'id' not in metadata:
+                on_disk["unreadable"].setdefault(novel_data['temp_novel_id'], []).append(episode_file.name)
+            elif metadata.get('status') not in ('deleted', 'draft'):
+                on_disk["ids"].add(str(metadata['id']))
+    return on_disk
+
+def reconcile_episodes(ctx, episodes, id_mapping, on_disk):
+    """エピソードをリモートの状態と突き合わせ、差分だけを 削除 → 更新 → 新規作成 の順に同期する
+
+    status: deleted / draft のエピソードやファイルが削除されたエピソードは、リモートにあれば削除する。
+    削除の対象は今回同期した小説のエピソードに限る。
+    解析に失敗したファイルのエピソード（on_disk、scan_episode_files の結果）は削除しない。
+    IDの分からないファイルがある小説は、どのエピソードのファイルか分からないため何も削除しない。
+    """
+    local = {}
+    local_deletes = []
+    for episode in episodes:
+        temp_id = episode.pop('temp_novel_id', None)
+        operation = episode.pop('operation', 'insert')
+        if temp_id not in id_mapping:
+            log(f"⚠️  Could not map episode {episode.get('id')} to novel ID")
+            continue
+        if operation == 'delete':
+            local_deletes.append(episode['id'])
+            continue
+        episode['novel_id'] = id_mapping[temp_id]
+        assign_page_count(ctx, episode)
+        episode['content_hash'] = content_fingerprint(episode)
+        local[str(episode['id'])] = episode
+
+    novel_ids = set(id_mapping.values())
+    with timed(ctx, "snapshot"):
+        remote = {
+            str(row['id']): row
+            for row in fetch_snapshot(ctx, "episodes", ["id", "novel_id", "episode_number", "content_hash"],
+                                      "novel_id", novel_ids)
+        }
+
+    locked = {str(id_mapping[temp_id]): names for temp_id, names in on_disk["unreadable"].items()
+              if temp_id in id_mapping}
+    for novel_id, names in sorted(locked.items()):
+        log(f"⚠️  Not deleting remote episodes of novel {novel_id}: could not read the id of {', '.join(names)}")
+    remote_only = []
+    kept = 0
+    for key, row in remote.items():
+        if key in local:
+            continue
+        if key in on_disk["ids"] or str(row.get('novel_id')) in locked:
+            kept += 1
+            continue
+        remote_only.append(row)
+    if kept:
+        log(f"⚠️  Keeping {kept} remote episodes whose files failed to parse")
+    episodes_to_delete = [row['id'] for row in remote_only]
+    episodes_to_update = []
+    episodes_to_insert = []
+    for key, episode in local.items():
+        row = remote.get(key)
+        if row is None:
+            episodes_to_insert.append(episode)
+        elif row.get('content_hash') != episode['content_hash'] or str(row.get('novel_id')) != str(episode['novel_id']):
+            episodes_to_update.append(episode)
+        else:
+            # 送信しないエピソードのページは保存しないため、分けた結果を残さない
+            ctx["page_spans"].pop(key, None)
+    unchanged = len(local) - len(episodes_to_insert) - len(episodes_to_update)
+    log(f"🔎 Episodes: {len(episodes_to_insert)} to insert, {len(episodes_to_update)} to update, "
+        f"{len(episodes_to_delete)} to delete, {unchanged} unchanged")
+    record_episode_changes(ctx, 'delete', remote_only)
+    record_episode_changes(ctx, 'update', episodes_to_update)
+    record_episode_changes(ctx, 'insert', episodes_to_insert)
+
+    if episodes_to_delete:
+        delete_data(ctx, "episodes", episodes_to_delete, "id")
+    if episodes_to_update:
+        # 更新するのはスナップショットにあったエピソードだけのため、存在を確かめ直さない
+        update_data(ctx, "episodes", episodes_to_update, "id", upsert=True)
+    if episodes_to_insert:
+        insert_data(ctx, "episodes", episodes_to_insert)
+    sync_episode_pages(ctx, episodes_to_update, episodes_to_insert)
+
+    # リモートと同じ内容のエピソードも、インデックスに無ければ追加される
+    on_episodes_synced(ctx, episodes_to_delete + local_deletes, list(local.values()))
+
+def reconcile_sync(ctx, targets, workers):
+    """全小説・全エピソードを解析し、リモートの状態との差分だけを同期する"""
+    all_novels = []
+    all_episodes = []
+    with timed(ctx, "parse"):
+        parsed = process_novel_directories(ctx, targets, workers)
+    novels = []
+    for (manuscript_dir, episode_names), (novel_data, episodes_data) in zip(targets, parsed):
+        if novel_data:
+            all_novels.append(novel_data)
+            all_episodes.extend(episodes_data)
+            novels.append((manuscript_dir, episode_names, novel_data))
+
+    if not all_novels:
+        log("⚠️  No valid novels found to sync")
+        return
+
+    log(f"📊 Summary: {len(all_novels)} novels, {len(all_episodes)} episodes (reconciling with Supabase)")
+    with timed(ctx, "scan"):
+        on_disk = scan_episode_files(ctx, novels)
+
+    id_mapping = reconcile_novels(ctx, all_novels)
+    on_novels_synced(ctx, all_novels, id_mapping)
+    if id_mapping:
+        reconcile_episodes(ctx, all_episodes, id_mapping, on_disk)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+複数のデータリポジトリのまとめ同期（--repos）
+マニフェストに書かれたリポジトリを検証し、1つのプロセスでまとめて同期する
+"""
+
+import os
+import sys
+import subprocess
+import yaml
+from pathlib import Path
+
+from sync_context import capture_logs, emit_logs, log, timed
+from sync_targets import find_changed_files, find_sync_targets
+from sync_writes import fail_repo, novel_repo, validate_novel_data
+from sync_core import process_novel_directories, sync_episodes, sync_novels
+from sync_reconcile import reconcile_episodes, reconcile_novels, scan_episode_files
+from sync_outputs import on_novels_synced, search_index_rebuild
+from sync_watch import validate_books
+
+def load_repo_manifest(path):
+    """--repos のマニフェスト（YAML）を読み込み、[{name, path, base_sha, head_sha}] を返す
+
+    形式は repos: [{path, name, base_sha, head_sha}, ...]（path 以外は任意、path だけの文字列も可）。
+    相対パスはマニフェストのディレクトリからの相対パスとして扱う。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = yaml.safe_load(f) or {}
+    entries = manifest.get("repos") if isinstance(manifest, dict) else manifest
+    if not isinstance(entries, list) or not entries:
+        log(f"❌ {path} does not list any repositories (expected 'repos: [...]')")
+        sys.exit(1)
+    repos = []
+    names = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not entry.get("path"):
+            log(f"❌ Invalid repository entry in {path}: {entry!r}")
+            sys.exit(1)
+        repo_path = Path(os.path.expanduser(str(entry["path"])))
+        if not repo_path.is_absolute():
+            repo_path = Path(path).resolve().parent / repo_path
+        name = str(entry.get("name") or repo_path.name)
+        if name in names:
+            log(f"❌ Repository name '{name}' is listed twice in {path}")
+            sys.exit(1)
+        names.add(name)
+        repos.append({
+            "name": name,
+            "path": repo_path,
+            "base_sha": entry.get("base_sha"),
+            "head_sha": entry.get("head_sha") or "HEAD",
+        })
+    return repos
+
+def repo_sync_targets(ctx, repo):
+    """リポジトリの同期対象（base_sha があれば変更されたファイルのみ）"""
+    data_dir = repo["path"]
+    if not data_dir.is_dir():
+        raise FileNotFoundError(f"data directory {data_dir} does not exist")
+    changed = None
+    if repo["base_sha"] and search_index_rebuild(ctx):
+        log(f"⚠️  [{repo['name']}] The search index has to be rebuilt; ignoring the base commit")
+    elif repo["base_sha"] and not ctx["reconcile"]:
+        changed = find_changed_files(data_dir, repo["base_sha"], repo["head_sha"])
+        if changed is None:
+            log(f"⚠️  [{repo['name']}] Base commit '{repo['base_sha']}' is unknown, falling back to full scan")
+        else:
+            log(f"🔍 [{repo['name']}] Incremental sync {repo['base_sha'][:7]}..{repo['head_sha']}: "
+                f"{sum(len(names) for names in changed.values())} changed files in {len(changed)} novels")
+    return find_sync_targets(data_dir, changed)
+
+def validate_repos(ctx, repos):
+    """リポジトリごとに全書名を検証し、リポジトリをまたいだ一意制約（エピソードID・小説ID）も確認する
+
+    リポジトリをまたいで重複した場合は、マニフェストで後に書かれたリポジトリをエラーにする。
+    エラーのあったリポジトリ名 → エラーのリスト を返す。
+    """
+    errors = {}
+    owners = {}  # (制約, キー) → 先に定義したリポジトリ名
+    for repo in repos:
+        data_dir = repo["path"]
+        books = sorted(d.name for d in data_dir.iterdir() if d.is_dir() and not d.name.startswith('.'))
+        constraints = {}
+        with capture_logs() as lines:
+            invalid = validate_books(ctx, data_dir, books, constraints)
+        emit_logs([f"[{repo['name']}] {line}" for line in lines])
+        if invalid:
+            errors[repo["name"]] = [f"{book}: {error}" for book, book_errors in invalid.items() for error in book_errors]
+            continue
+        repo_errors = []
+        for index in constraints.values():
+            for constraint in ("episode_id", "novel_id"):
+                for key in index[constraint]:
+                    other = owners.get((constraint, key))
+                    if other is not None and other != repo["name"]:
+                        repo_errors.append(f"{constraint} {key!r} is already defined in repository '{other}'")
+        if repo_errors:
+            errors[repo["name"]] = repo_errors
+            continue
+        for index in constraints.values():
+            for constraint in ("episode_id", "novel_id"):
+                for key in index[constraint]:
+                    owners[(constraint, key)] = repo["name"]
+    return errors
+
+def fanin_sync(ctx, repos, workers):
+    """複数のデータリポジトリを1つのプロセスでまとめて同期する（--repos）
+
+    解析のプロセスプールとHTTPのコネクションプールを共有し、全リポジトリの小説・エピソードを
+    まとめたバッチで送信する。検証エラーのリポジトリは同期せず、複数のリポジトリを含むバッチが
+    失敗したらリポジトリごとに分けて送り直すため、1つのリポジトリの不備が他を止めることはない。
+    """
+    ctx["repo_summary"] = {
+        repo["name"]: {"path": str(repo["path"]), "status": "success", "novels": 0, "episodes": 0, "errors": []}
+        for repo in repos
+    }
+    ctx["repo_owners"] = {}
+
+    with timed(ctx, "validate"):
+        for name, errors in validate_repos(ctx, [repo for repo in repos if repo["path"].is_dir()]).items():
+            log(f"❌ [{name}] {len(errors)} validation errors, not syncing this repository")
+            for error in errors:
+                fail_repo(ctx, name, error, status="invalid")
+
+    targets = []
+    target_repos = []  # targets と同じ順のリポジトリ名
+    with timed(ctx, "scan"):
+        for repo in repos:
+            if ctx["repo_summary"][repo["name"]]["status"] == "invalid":
+                continue
+            try:
+                repo_targets = repo_sync_targets(ctx, repo)
+            except (OSError, subprocess.SubprocessError) as e:
+                log(f"❌ [{repo['name']}] {e}")
+                fail_repo(ctx, repo["name"], str(e), status="invalid")
+                continue
+            targets.extend(repo_targets)
+            target_repos.extend([repo["name"]] * len(repo_targets))
+
+    valid_repos = sum(1 for r in ctx["repo_summary"].values() if r['status'] != 'invalid')
+    log(f"📚 Syncing {len(targets)} novels from {valid_repos} "
+        f"of {len(repos)} repositories")
+    with timed(ctx, "parse"):
+        parsed = process_novel_directories(ctx, targets, workers)
+
+    by_repo = {}
+    for name, target, (novel_data, episodes_data) in zip(target_repos, targets, parsed):
+        if not novel_data:
+            continue
+        valid, message = validate_novel_data(novel_data)
+        if not valid:
+            fail_repo(ctx, name, f"novel '{novel_data.get('title')}': {message}", status="invalid")
+        by_repo.setdefault(name, []).append((novel_data, episodes_data, target))
+
+    all_novels = []
+    all_episodes = []
+    synced_targets = []  # (manuscriptディレクトリ, 読み込むエピソード名, 小説データ)
+    for name, novels in by_repo.items():
+        summary = ctx["repo_summary"][name]
+        if summary["status"] == "invalid":
+            log(f"❌ [{name}] Not syncing this repository: {summary['errors'][-1]}")
+            continue
+        for novel_data, episodes_data, (manuscript_dir, episode_names) in novels:
+            if novel_data.get('id') is None:
+                # id のない小説はタイトルで識別するため、別のリポジトリの同名の小説と区別する
+                temp_id = f"{name}:{novel_data['temp_novel_id']}"
+                novel_data['temp_novel_id'] = temp_id
+                for episode in episodes_data:
+                    episode['temp_novel_id'] = temp_id
+            # id のある小説の一時IDは小説IDと同じ
+            ctx["repo_owners"][("novels", str(novel_data['temp_novel_id']))] = name
+            for episode in episodes_data:
+                ctx["repo_owners"][("episodes", str(episode['id']))] = name
+            summary["novels"] += 1
+            summary["episodes"] += len(episodes_data)
+            all_novels.append(novel_data)
+            all_episodes.extend(episodes_data)
+            synced_targets.append((manuscript_dir, episode_names, novel_data))
+
+    if not all_novels:
+        log("⚠️  No valid novels found to sync")
+        return
+
+    log(f"📊 Summary: {len(all_novels)} novels, {len(all_episodes)} episodes")
+
+    id_mapping = reconcile_novels(ctx, all_novels) if ctx["reconcile"] else sync_novels(ctx, all_novels)
+    on_novels_synced(ctx, all_novels, id_mapping)
+    for novel_data in all_novels:
+        if novel_data['temp_novel_id'] not in id_mapping:
+            fail_repo(ctx, novel_repo(ctx, novel_data['temp_novel_id']),
+                      f"novel '{novel_data['title']}' was not written; its episodes were skipped")
+
+    if all_episodes and id_mapping:
+        if ctx["reconcile"]:
+            with timed(ctx, "scan"):
+                on_disk = scan_episode_files(ctx, synced_targets)
+            reconcile_episodes(ctx, all_episodes, id_mapping, on_disk)
+        else:
+            sync_episodes(ctx, all_episodes, id_mapping)
@@ -2,484 +2,408 @@
 """
 小説データをSupabaseに同期するスクリプト
 GitHub Actionsから実行される
+
+同期の処理は sync_*.py のモジュールに分かれており、このスクリプトは引数の解析と
+同期1回分の設定・状態（sync_context.new_context）の組み立てを行う。
 """
 
 import os
 import sys
 import json
-import glob
-import requests
-import yaml
-import frontmatter
-from datetime import datetime
+import time
+import argparse
 from pathlib import Path
 
-# 環境変数からSupabase情報を取得
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+from sync_context import MAX_IN_FLIGHT, PAGE_CHARS, TARGET_LATENCY, add_span, log, new_context, timed
+from sync_transport import open_transport, transport_summary, write_latency_trace
+from sync_journal import JOURNAL_PATH, close_journal, open_journal
+from sync_targets import find_changed_files, find_sync_targets, sync_state_base, write_sync_state
+from sync_core import PARSE_WORKERS, STREAM_BATCH_SIZE, pipeline_sync, stream_sync, sync_all
+from sync_reconcile import reconcile_sync
+from sync_outputs import emit_changes, finish_sync, search_index_rebuild
+from sync_watch import watch_sync
+from sync_repos import fanin_sync, load_repo_manifest
+from search_index import load_index
+from static_export import open_export
+from revalidation import open_changes
+from manuscript_io import load_parse_cache, new_parse_cache, save_parse_cache
 
-if not SUPABASE_URL or not SERVICE_KEY:
-    print("❌ Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.")
-    sys.exit(1)
+# 解析キャッシュのパス（validate_data.py と共有）
+PARSE_CACHE_PATH = os.environ.get("NOVEL_PARSE_CACHE")
 
-# Supabase REST API用のヘッダー
-HEADERS = {
-    "apikey": SERVICE_KEY,
-    "Authorization": f"Bearer {SERVICE_KEY}",
-    "Content-Type": "application/json",
-    "Prefer": "return=minimal",  # INSERT用ヘッダー
-}
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="小説データをSupabaseに同期する")
+    parser.add_argument("data_directory", nargs="?", help="書名ディレクトリを含むデータディレクトリ")
+    parser.add_argument(
+        "--repos",
+        help="複数のデータリポジトリをまとめて同期するマニフェスト（YAML、data_directory の代わりに指定）",
+    )
+    parser.add_argument(
+        "--base-sha",
+        help="差分同期の基準コミット（指定時は base..head の変更ファイルのみ同期）",
+    )
+    parser.add_argument(
+        "--head-sha",
+        default="HEAD",
+        help="差分同期の対象コミット（デフォルト: HEAD）",
+    )
+    parser.add_argument(
+        "--sync-state",
+        default=os.environ.get("SYNC_STATE"),
+        help="前回の同期の状態ファイル。前回成功したコミットからの差分を同期し、終了時に更新する"
+             "（前回が失敗・状態がない場合は全件スキャン、環境変数 SYNC_STATE）",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=PARSE_WORKERS,
+        help=f"原稿解析の並列プロセス数（デフォルト: {PARSE_WORKERS}、1で逐次処理）",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        default=PARSE_CACHE_PATH,
+        help="解析キャッシュファイルのパス（validate_data.pyと共有、環境変数 NOVEL_PARSE_CACHE）",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="エピソードを全件メモリに載せず、小説ごとに解析してバッチ単位で送信する",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=STREAM_BATCH_SIZE,
+        help=f"--stream・--pipeline時に1回に送信するエピソード数（デフォルト: {STREAM_BATCH_SIZE}）",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="常駐して原稿の変更（mtime）を監視し、変更されたファイルだけを検証・同期し続ける",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="小説ごとに解析と送信を行い、次の小説の解析と前の小説の送信を並行させる（--batch-size 件ずつまとめて送信）",
+    )
+    parser.add_argument(
+        "--async-writes",
+        action="store_true",
+        help="各フェーズ内の書き込みリクエストをスレッドプールで並行送信し（ネイティブの非同期I/Oではない）、失敗は最後にまとめて報告する",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help=f"--async-writes・--adaptive時の同時送信数の上限（デフォルト: {MAX_IN_FLIGHT}）",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="応答時間と429/503に応じて同時送信数（--max-in-flight まで）とバッチの件数を自動で増減する",
+    )
+    parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=TARGET_LATENCY,
+        help=f"--adaptive時に送信数を増やしてよい1リクエストの応答時間（秒、デフォルト: {TARGET_LATENCY}、環境変数 SYNC_TARGET_LATENCY）",
+    )
+    parser.add_argument(
+        "--latency-trace",
+        default=os.environ.get("SYNC_LATENCY_TRACE"),
+        help="リクエストごとの応答時間・ステータス・同時送信数をJSON Linesで書き出すパス（環境変数 SYNC_LATENCY_TRACE）",
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="updated/status のフラグではなく、Supabase上の content_hash との差分で送信内容を決める",
+    )
+    parser.add_argument(
+        "--derive",
+        action="store_true",
+        help="表示用の派生データ（content_html・char_count・reading_minutes・excerpt）も計算して送信する",
+    )
+    parser.add_argument(
+        "--paginate",
+        action="store_true",
+        help="長いエピソードを段落の境界でページに分け、episode_pages テーブルに保存する",
+    )
+    parser.add_argument(
+        "--page-chars",
+        type=int,
+        default=PAGE_CHARS,
+        help=f"--paginate時の1ページの目安の文字数（デフォルト: {PAGE_CHARS}）",
+    )
+    parser.add_argument(
+        "--search-index",
+        default=os.environ.get("SYNC_SEARCH_INDEX"),
+        help="全文検索インデックス（文字bigramの転置インデックス）を更新するディレクトリ（環境変数 SYNC_SEARCH_INDEX）",
+    )
+    parser.add_argument(
+        "--export-dir",
+        default=os.environ.get("SYNC_EXPORT_DIR"),
+        help="小説（メタデータと目次）とエピソードの静的JSONを書き出すディレクトリ（環境変数 SYNC_EXPORT_DIR）",
+    )
+    parser.add_argument(
+        "--changes-out",
+        default=os.environ.get("SYNC_CHANGES_OUT"),
+        help="変更した小説・エピソードと再生成が必要なページのパスをJSONで書き出すパス（環境変数 SYNC_CHANGES_OUT）",
+    )
+    parser.add_argument(
+        "--revalidate-url",
+        default=os.environ.get("SYNC_REVALIDATE_URL"),
+        help="再生成が必要なページのパスを送るWebhookのURL（環境変数 SYNC_REVALIDATE_URL）",
+    )
+    parser.add_argument(
+        "--journal",
+        help="進捗ジャーナルを記録するパス（指定時と --resume 時のみ記録する。"
+             f"--resume 時のデフォルト: {JOURNAL_PATH}、環境変数 SYNC_JOURNAL）",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="中断した同期をジャーナルから再開する（完了済みのバッチと作成済みの小説を飛ばす）",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=os.environ.get("SYNC_METRICS_OUT"),
+        help="フェーズごとの所要時間とカウンターをJSONで書き出すパス（環境変数 SYNC_METRICS_OUT）",
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="count",
+        default=0,
+        help="詳細ログ（送信データ・エラーレスポンスのダンプ）を出力する",
+    )
+    args = parser.parse_args()
+    if args.reconcile and args.stream:
+        parser.error("--reconcile cannot be combined with --stream")
+    if args.pipeline and (args.stream or args.reconcile):
+        parser.error("--pipeline cannot be combined with --stream or --reconcile")
+    if args.watch and (args.stream or args.reconcile or args.base_sha or args.sync_state or args.resume):
+        parser.error("--watch cannot be combined with --stream, --reconcile, --base-sha, --sync-state or --resume")
+    if args.sync_state and args.base_sha:
+        parser.error("--sync-state cannot be combined with --base-sha (the base is read from the state file)")
+    if bool(args.data_directory) == bool(args.repos):
+        parser.error("specify either data_directory or --repos")
+    if args.repos and (args.stream or args.pipeline or args.watch or args.base_sha or args.sync_state):
+        parser.error("--repos cannot be combined with --stream, --pipeline, --watch, --base-sha or --sync-state "
+                     "(set base_sha per repository in the manifest)")
+    if args.resume and not args.journal:
+        args.journal = JOURNAL_PATH
+    return args
 
-def log(message):
-    """タイムスタンプ付きログ出力"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {message}")
+def log_metrics_summary(ctx):
+    """フェーズごとの所要時間と主なカウンターをログ出力"""
+    spans = ctx["metrics"]["spans"]
+    if spans:
+        log("⏱️  " + ", ".join(f"{name} {span['seconds']:.2f}s" for name, span in spans.items()))
+    stats = transport_summary(ctx)
+    log(f"🌐 HTTP: {stats['requests']} requests, {stats['connections']} connections opened, "
+        f"{stats['reused_connections']} reused, {stats['retries']} retries, "
+        f"{stats['bytes_sent'] / 1024:.1f} KB sent")
+    controller = ctx["adaptive"]
+    if controller is not None:
+        counters = ctx["metrics"]["counters"]
+        log(f"🎚️  Adaptive: ended at {controller['concurrency']:.1f} in flight, "
+            f"{int(controller['batch_records'])} records per batch "
+            f"({counters.get('adaptive.cuts', 0)} cuts, {counters.get('adaptive.slow_responses', 0)} slow responses)")
 
-def validate_novel_data(novel_data):
-    """小説データの妥当性をチェック"""
-    required_fields = ['title', 'author']
-    for field in required_fields:
-        if field not in novel_data or not novel_data[field]:
-            return False, f"Required field '{field}' is missing or empty"
-    
-    # tagsが配列であることを確認
-    if 'tags' in novel_data and not isinstance(novel_data['tags'], list):
-        return False, "tags must be an array"
-    
-    return True, "OK"
+def write_metrics(ctx, path, args, status, duration):
+    """メトリクスをJSONファイルに書き出す（CIのアーティファクト用）"""
+    report = {
+        "status": status,
+        "duration_seconds": round(duration, 3),
+        "options": {
+            "incremental": bool(args.base_sha or args.sync_state),
+            "stream": args.stream,
+            "pipeline": args.pipeline,
+            "watch": args.watch,
+            "repos": bool(args.repos),
+            "async_writes": args.async_writes,
+            "adaptive": args.adaptive,
+            "workers": args.workers,
+            "parse_cache": bool(args.parse_cache),
+            "reconcile": args.reconcile,
+            "resume": args.resume,
+            "derive": args.derive,
+            "paginate": args.paginate,
+            "search_index": bool(args.search_index),
+            "export": bool(args.export_dir),
+            "revalidate": bool(args.revalidate_url),
+        },
+        "spans": {
+            name: {"seconds": round(span["seconds"], 3), "calls": span["calls"]}
+            for name, span in ctx["metrics"]["spans"].items()
+        },
+        "counters": dict(sorted(ctx["metrics"]["counters"].items())),
+        "http": transport_summary(ctx),
+        "write_failures": len(ctx["write_failures"]),
+    }
+    if ctx["repo_summary"] is not None:
+        report["repos"] = ctx["repo_summary"]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    log(f"📈 Wrote metrics to {path}")
 
-def insert_data(table_name, data):
-    """SupabaseにデータをINSERTする"""
-    if not data:
-        log(f"⚠️  No data to insert for table '{table_name}'")
-        return None
-    
-    # novelsテーブルの場合はデータ妥当性をチェック
-    if table_name == 'novels':
-        for i, record in enumerate(data):
-            is_valid, error_msg = validate_novel_data(record)
-            if not is_valid:
-                log(f"❌ Data validation failed for record {i+1}: {error_msg}")
-                log(f"🔍 Invalid record: {json.dumps(record, indent=2, ensure_ascii=False, default=str)}")
-                return None
-    
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-    
-    try:
-        log(f"➕ Inserting {len(data)} records to '{table_name}'...")
-        log(f"📤 Request URL: {url}")
-        log(f"📋 Headers: {json.dumps({k: v for k, v in HEADERS.items() if k != 'Authorization'}, indent=2)}")
-        
-        # レスポンスデータを取得するためにヘッダーを追加
-        headers_with_return = HEADERS.copy()
-        headers_with_return["Prefer"] = "return=representation"  # INSERTでレスポンスデータを取得
-        
-        response = requests.post(url, headers=headers_with_return, json=data)
-        log(f"📥 Response status: {response.status_code}")
-        
-        response.raise_for_status()
-        log(f"✅ Successfully inserted {len(data)} records to '{table_name}'")
-        
-        # レスポンスデータを返す
-        return response.json()
-        
-    except requests.exceptions.RequestException as e:
-        log(f"❌ Error inserting to '{table_name}': {e}")
-        if hasattr(e, 'response') and e.response:
-            log(f"Response status: {e.response.status_code}")
-            log(f"Response body: {e.response.text}")
-            
-            # Supabaseエラーの詳細解析
-            try:
-                error_json = e.response.json()
-                log(f"📋 Supabase error details: {json.dumps(error_json, indent=2, ensure_ascii=False)}")
-                
-                # 具体的なエラーメッセージがあるかチェック
-                if 'message' in error_json:
-                    log(f"💡 Error message: {error_json['message']}")
-                if 'hint' in error_json:
-                    log(f"💡 Hint: {error_json['hint']}")
-                if 'details' in error_json:
-                    log(f"💡 Details: {error_json['details']}")
-                    
-            except:
-                log("📋 Could not parse error response as JSON")
-        
-        # データの詳細出力
-        log(f"🔍 Data being sent to '{table_name}':")
-        for i, record in enumerate(data[:3]):  # 最初の3件のみ表示
-            log(f"  Record {i+1}: {json.dumps(record, indent=2, ensure_ascii=False, default=str)}")
-            # データ型の確認
-            log(f"  Record {i+1} types:")
-            for key, value in record.items():
-                log(f"    {key}: {type(value).__name__} = {value}")
-        if len(data) > 3:
-            log(f"  ... and {len(data) - 3} more records")
-        
-        sys.exit(1)
-    
-    return None
+def run_sync(ctx, args):
+    """同期処理の本体"""
+    data_dir = Path(args.data_directory or args.repos)
 
-def update_data(table_name, data, match_field):
-    """SupabaseのデータをUPDATEする"""
-    if not data:
-        log(f"⚠️  No data to update for table '{table_name}'")
-        return None
-    
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-    
-    try:
-        log(f"🔄 Updating {len(data)} records in '{table_name}'...")
-        
-        # レスポンスデータを取得するためにヘッダーを追加
-        headers_with_return = HEADERS.copy()
-        headers_with_return["Prefer"] = "return=representation"
-        
-        updated_records = []
-        for record in data:
-            if match_field not in record:
-                log(f"⚠️  Skipping record without {match_field}: {record}")
-                continue
-            
-            # マッチフィールドの値を取得してURLに追加
-            match_value = record[match_field]
-            update_url = f"{url}?{match_field}=eq.{match_value}"
-            
-            # マッチフィールドをデータから除外（UPDATEでは不要）
-            update_record = {k: v for k, v in record.items() if k != match_field}
-            
-            response = requests.patch(update_url, headers=headers_with_return, json=update_record)
-            log(f"📥 Update response status for {match_field}={match_value}: {response.status_code}")
-            
-            response.raise_for_status()
-            
-            if response.json():
-                updated_records.extend(response.json())
-        
-        log(f"✅ Successfully updated {len(updated_records)} records in '{table_name}'")
-        return updated_records
-        
-    except requests.exceptions.RequestException as e:
-        log(f"❌ Error updating '{table_name}': {e}")
-        if hasattr(e, 'response') and e.response:
-            log(f"Response status: {e.response.status_code}")
-            log(f"Response body: {e.response.text}")
-        sys.exit(1)
-    
-    return None
+    if ctx["adaptive"] is not None:
+        log(f"🎚️  Adaptive writes: up to {ctx['max_in_flight']} requests in flight, "
+            f"target latency {ctx['target_latency']:.2f}s")
 
-def delete_data(table_name, ids, match_field):
-    """SupabaseからデータをDELETEする"""
-    if not ids:
-        log(f"⚠️  No data to delete from table '{table_name}'")
-        return None
-    
-    url = f"{SUPABASE_URL}/rest/v1/{table_name}"
-    
-    try:
-        log(f"🗑️  Deleting {len(ids)} records from '{table_name}'...")
-        
-        deleted_count = 0
-        for id_value in ids:
-            delete_url = f"{url}?{match_field}=eq.{id_value}"
-            
-            response = requests.delete(delete_url, headers=HEADERS)
-            log(f"📥 Delete response status for {match_field}={id_value}: {response.status_code}")
-            
-            response.raise_for_status()
-            deleted_count += 1
-        
-        log(f"✅ Successfully deleted {deleted_count} records from '{table_name}'")
-        return deleted_count
-        
-    except requests.exceptions.RequestException as e:
-        log(f"❌ Error deleting from '{table_name}': {e}")
-        if hasattr(e, 'response') and e.response:
-            log(f"Response status: {e.response.status_code}")
-            log(f"Response body: {e.response.text}")
+    if not data_dir.exists():
+        log(f"❌ {'Repository manifest' if args.repos else 'Data directory'} {data_dir} does not exist")
         sys.exit(1)
-    
-    return None
 
-def process_novel_directory(novel_dir):
-    """小説ディレクトリを処理してデータを抽出"""
-    novel_path = Path(novel_dir)
-    
-    # info.ymlから小説情報を取得
-    info_file = novel_path / "info.yml"
-    if not info_file.exists():
-        log(f"⚠️  Skipping {novel_path.name}: info.yml not found")
-        return None, []
-    
-    try:
-        with open(info_file, 'r', encoding='utf-8') as f:
-            novel_data = yaml.safe_load(f)
-    except Exception as e:
-        log(f"❌ Error reading {info_file}: {e}")
-        return None, []
-    
-    # 必須フィールドの確認
-    required_fields = ['title', 'author', 'published']
-    for field in required_fields:
-        if field not in novel_data:
-            log(f"❌ Missing required field '{field}' in {info_file}")
-            return None, []
-    
-    # publishedがfalseの場合は処理をスキップ
-    if not novel_data.get('published', False):
-        log(f"⚠️  Skipping {novel_path.name}: published=false")
-        return None, []
-    
-    # updatedフィールドのデフォルト値設定
-    updated = novel_data.get('updated', False)
-    novel_id = novel_data.get('id')
-    
-    # 処理ロジックの判定
-    if novel_id is not None and updated:
-        # IDが指定されていてupdated=trueの場合は更新
-        operation = 'update'
-        log(f"📝 Novel '{novel_data['title']}' will be updated (id={novel_id})")
-    elif novel_id is None:
-        # IDが指定されていない場合は新規作成
-        operation = 'insert'
-        log(f"➕ Novel '{novel_data['title']}' will be inserted as new")
-    else:
-        # それ以外の場合は無視
-        log(f"⚠️  Skipping {novel_path.name}: id exists but updated=false")
-        return None, []
-    
-    # 一時IDを保存（episodeとの関連付けに使用）
-    temp_novel_id = novel_id if novel_id is not None else novel_data['title']
-    novel_data['temp_novel_id'] = temp_novel_id
-    novel_data['operation'] = operation
-    
-    # フィールド名をデータベーススキーマに合わせて変更
-    if 'description' in novel_data:
-        novel_data['summary'] = novel_data.pop('description')
-    
-    # データベーススキーマに存在しないフィールドを削除
-    fields_to_remove = ['status', 'published', 'updated']
-    for field in fields_to_remove:
-        if field in novel_data:
-            del novel_data[field]
-    
-    # tagsフィールドが存在しない場合は空の配列を設定
-    if 'tags' not in novel_data:
-        novel_data['tags'] = []
-    
-    # tagsが文字列の場合は配列に変換
-    if isinstance(novel_data.get('tags'), str):
-        novel_data['tags'] = [novel_data['tags']]
-    
-    # tagsが配列でない場合は空の配列に設定
-    if not isinstance(novel_data.get('tags'), list):
-        novel_data['tags'] = []
-    
-    # tagsの各要素が文字列であることを確認
-    novel_data['tags'] = [str(tag).strip() for tag in novel_data['tags'] if tag]
-    
-    # 日付フィールドを適切なTIMESTAMP形式に変換
-    if 'created_at' in novel_data:
-        # YYYY-MM-DD形式をTIMESTAMP形式に変換
-        try:
-            from datetime import datetime as dt
-            created_date = dt.strptime(novel_data['created_at'], '%Y-%m-%d')
-            novel_data['created_at'] = created_date.isoformat() + 'Z'
-        except ValueError:
-            # 変換失敗時は現在日時を使用
-            novel_data['created_at'] = datetime.now().isoformat() + 'Z'
-    
-    # 現在時刻を更新日時として設定
-    novel_data['updated_at'] = datetime.now().isoformat() + 'Z'
-    
-    # デバッグ: 処理後のデータを確認
-    log(f"🔍 Processed novel data: {json.dumps(novel_data, indent=2, ensure_ascii=False, default=str)}")
-    
-    # エピソードファイルを処理
-    episodes_data = []
-    episode_files = sorted(novel_path.glob("*.md"))
-    
-    for episode_file in episode_files:
+    log(f"🚀 Starting sync from {data_dir}")
+
+    if args.parse_cache:
+        with timed(ctx, "cache.load"):
+            ctx["parse_cache"] = load_parse_cache(args.parse_cache)
+        log(f"🗃️  Using parse cache {args.parse_cache} ({len(ctx['parse_cache']['entries'])} entries)")
+    elif args.watch:
+        # 常駐中は検証と同期で解析結果を共有する（ファイルには保存しない）
+        ctx["parse_cache"] = new_parse_cache()
+
+    if args.search_index:
+        with timed(ctx, "search_index.load"):
+            ctx["search_index"] = load_index(args.search_index)
+        log(f"🔤 Updating search index in {args.search_index} ({len(ctx['search_index']['by_key'])} documents)")
+
+    if args.export_dir:
+        ctx["export"] = open_export(args.export_dir)
+        log(f"📦 Exporting static JSON to {args.export_dir}")
+
+    if args.changes_out or args.revalidate_url:
+        ctx["changes"] = open_changes()
+
+    if args.watch:
+        if search_index_rebuild(ctx):
+            # 常駐中は保存されたファイルしか同期しない
+            log("⚠️  The search index has to be rebuilt; run a full sync to index files that are not saved while watching")
+        watch_sync(ctx, data_dir, args)
+        return
+
+    if args.repos:
+        repos = load_repo_manifest(data_dir)
+        log(f"📚 Loaded {len(repos)} repositories from {data_dir}")
+        if args.journal:
+            ctx["journal"] = open_journal(args.journal, data_dir, args.resume)
         try:
-            with open(episode_file, 'r', encoding='utf-8') as f:
-                post = frontmatter.load(f)
-            
-            episode = post.metadata.copy()
-            episode['temp_novel_id'] = temp_novel_id  # 一時的にinfo.ymlのIDを保存
-            episode['content'] = post.content
-            
-            # statusフィールドのデフォルト値設定
-            episode_status = episode.get('status', 'new')
-            
-            # statusに応じた処理フラグを設定
-            if episode_status == 'draft':
-                # 下書きは無視
-                log(f"⚠️  Skipping episode {episode_file.name}: status=draft")
-                continue
-            elif episode_status == 'deleted':
-                # 削除対象としてマーク
-                episode['operation'] = 'delete'
-            elif episode_status == 'updated':
-                # 更新対象としてマーク
-                episode['operation'] = 'update'
-            elif episode_status == 'new':
-                # 新規作成対象としてマーク
-                episode['operation'] = 'insert'
+            fanin_sync(ctx, repos, args.workers)
+        finally:
+            save_cache(ctx, args)
+            emit_changes(ctx, args)
+        finish_sync(ctx, args)
+        return
+
+    with timed(ctx, "scan"):
+        # 差分同期: 変更されたファイルのみを対象にする
+        changed = None
+        base_sha = args.base_sha
+        if args.sync_state:
+            base_sha = sync_state_base(ctx, data_dir, args.sync_state, args.head_sha)
+        if base_sha and ctx["reconcile"]:
+            # 削除されたエピソードを検出するには全ファイルが必要
+            log("⚠️  --reconcile scans the whole tree; ignoring the base commit")
+        elif base_sha and search_index_rebuild(ctx):
+            # 変更されていないファイルもインデックスに入れ直す必要がある
+            log("⚠️  The search index has to be rebuilt; ignoring the base commit")
+        elif base_sha:
+            changed = find_changed_files(data_dir, base_sha, args.head_sha)
+            if changed is None:
+                log(f"⚠️  Base commit '{base_sha}' is unknown, falling back to full scan")
             else:
-                log(f"⚠️  Unknown status '{episode_status}' for episode {episode_file.name}, treating as 'new'")
-                episode['operation'] = 'insert'
-            
-            # episodesテーブルのスキーマに存在しないフィールドを削除
-            fields_to_remove = ['updated_at', 'status']
-            for field in fields_to_remove:
-                if field in episode:
-                    del episode[field]
-            
-            # 必須フィールドの確認
-            if 'id' not in episode:
-                log(f"⚠️  Episode {episode_file.name} missing 'id', skipping")
-                continue
-            
-            episodes_data.append(episode)
-            
-        except Exception as e:
-            log(f"❌ Error processing {episode_file}: {e}")
-            continue
-    
-    log(f"📖 Processed novel '{novel_data['title']}' with {len(episodes_data)} episodes")
-    return novel_data, episodes_data
+                file_count = sum(len(names) for names in changed.values())
+                log(f"🔍 Incremental sync {base_sha[:7]}..{args.head_sha}: "
+                    f"{file_count} changed files in {len(changed)} novels")
+
+        # 書名ディレクトリを探す（novels廃止、直接書名ディレクトリを探索）
+        targets = find_sync_targets(data_dir, changed)
+
+    if args.journal:
+        ctx["journal"] = open_journal(args.journal, data_dir, args.resume)
+
+    try:
+        if args.stream:
+            stream_sync(ctx, targets, args.workers, max(1, args.batch_size))
+        elif args.pipeline:
+            pipeline_sync(ctx, targets, args.workers, max(1, args.batch_size))
+        elif ctx["reconcile"]:
+            reconcile_sync(ctx, targets, args.workers)
+        else:
+            sync_all(ctx, targets, args.workers)
+    finally:
+        # 同期に失敗しても解析結果は次回以降に再利用できる
+        save_cache(ctx, args)
+        emit_changes(ctx, args)
+
+    finish_sync(ctx, args)
+
+def save_cache(ctx, args):
+    """解析キャッシュを保存する（--parse-cache 指定時のみ）"""
+    if ctx["parse_cache"] is None:
+        return
+    with timed(ctx, "cache.save"):
+        saved = save_parse_cache(ctx["parse_cache"], args.parse_cache)
+    if saved:
+        log(f"🗃️  Saved parse cache to {args.parse_cache}")
 
 def main():
     """メイン処理"""
-    if len(sys.argv) != 2:
-        print("Usage: python sync_supabase.py <data_directory>")
-        sys.exit(1)
-    
-    data_dir = Path(sys.argv[1])
-    
-    if not data_dir.exists():
-        log(f"❌ Data directory {data_dir} does not exist")
+    args = parse_args()
+
+    # 環境変数からSupabase情報を取得
+    url = os.environ.get("SUPABASE_URL")
+    service_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not service_key:
+        print("❌ Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.")
         sys.exit(1)
-    
-    log(f"🚀 Starting sync from {data_dir}")
-    
-    # 書名ディレクトリを探す（novels廃止、直接書名ディレクトリを探索）
-    all_novels = []
-    all_episodes = []
-    
-    # データディレクトリ直下の各書名ディレクトリを処理
-    for book_dir in data_dir.iterdir():
-        if book_dir.is_dir() and not book_dir.name.startswith('.'):
-            # manuscript ディレクトリがあるかチェック
-            manuscript_dir = book_dir / "manuscript"
-            if manuscript_dir.exists() and manuscript_dir.is_dir():
-                novel_data, episodes_data = process_novel_directory(manuscript_dir)
-                if novel_data:
-                    all_novels.append(novel_data)
-                    all_episodes.extend(episodes_data)
-            else:
-                log(f"⚠️  Skipping {book_dir.name}: manuscript directory not found")
-    
-    if not all_novels:
-        log("⚠️  No valid novels found to sync")
-        return
-    
-    # Supabaseに同期
-    log(f"📊 Summary: {len(all_novels)} novels, {len(all_episodes)} episodes")
-    
-    # 小説の操作別に分類
-    novels_to_insert = []
-    novels_to_update = []
-    temp_id_mapping = {}  # 元のIDを保存
-    
-    for i, novel_data in enumerate(all_novels):
-        # temp_novel_idを保存
-        temp_id = novel_data.get('temp_novel_id', novel_data.get('title'))
-        temp_id_mapping[i] = temp_id
-        
-        # データベースに送信するデータをコピー
-        novel_copy = novel_data.copy()
-        operation = novel_copy.pop('operation', 'insert')
-        novel_copy.pop('temp_novel_id', None)
-        
-        if operation == 'update':
-            novels_to_update.append(novel_copy)
-        else:
-            novels_to_insert.append(novel_copy)
-    
-    # 1. 小説の処理
-    novel_response = None
-    id_mapping = {}
-    
-    # 新規小説をINSERT
-    if novels_to_insert:
-        novel_response = insert_data("novels", novels_to_insert)
-        if novel_response:
-            # 新規作成された小説のIDマッピングを作成
-            insert_index = 0
-            for i, novel_data in enumerate(all_novels):
-                if novel_data.get('operation') == 'insert':
-                    temp_id = temp_id_mapping[i]
-                    if insert_index < len(novel_response):
-                        actual_id = novel_response[insert_index]['id']
-                        id_mapping[temp_id] = actual_id
-                        log(f"  新規: {temp_id} → {actual_id}")
-                        insert_index += 1
-    
-    # 既存小説をUPDATE
-    if novels_to_update:
-        update_response = update_data("novels", novels_to_update, "id")
-        if update_response:
-            # 更新された小説のIDマッピングを作成
-            for i, novel_data in enumerate(all_novels):
-                if novel_data.get('operation') == 'update':
-                    temp_id = temp_id_mapping[i]
-                    actual_id = novel_data.get('id')  # 更新の場合は元のIDを使用
-                    if actual_id:
-                        id_mapping[temp_id] = actual_id
-                        log(f"  更新: {temp_id} → {actual_id}")
-    
-    # 2. エピソードの処理
-    if all_episodes and id_mapping:
-        log("🔗 Processing episodes...")
-        
-        # エピソードの操作別に分類
-        episodes_to_insert = []
-        episodes_to_update = []
-        episodes_to_delete = []
-        
-        for episode in all_episodes:
-            temp_id = episode.get('temp_novel_id')
-            operation = episode.get('operation', 'insert')
-            
-            # novel_idを実際のIDに更新
-            if temp_id in id_mapping:
-                episode['novel_id'] = id_mapping[temp_id]
-                episode.pop('temp_novel_id', None)
-                episode.pop('operation', None)
-                
-                if operation == 'delete':
-                    episodes_to_delete.append(episode['id'])
-                elif operation == 'update':
-                    episodes_to_update.append(episode)
-                else:  # insert or new
-                    episodes_to_insert.append(episode)
-            else:
-                log(f"⚠️  Could not map episode {episode.get('id')} to novel ID")
-        
-        # エピソードの削除
-        if episodes_to_delete:
-            delete_data("episodes", episodes_to_delete, "id")
-        
-        # エピソードの更新
-        if episodes_to_update:
-            update_data("episodes", episodes_to_update, "id")
-        
-        # エピソードの新規作成
-        if episodes_to_insert:
-            insert_data("episodes", episodes_to_insert)
-    
+
+    ctx = new_context(
+        url,
+        service_key,
+        verbosity=args.verbose,
+        reconcile=args.reconcile,
+        derive=args.derive,
+        paginate=args.paginate,
+        page_chars=max(1, args.page_chars),
+        async_writes=args.async_writes,
+        adaptive_writes=args.adaptive,
+        max_in_flight=args.max_in_flight,
+        target_latency=args.target_latency,
+        latency_trace=[] if args.latency_trace else None,
+    )
+    open_transport(ctx)
+
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        run_sync(ctx, args)
+        status = "success"
+    finally:
+        # 失敗時もどこで時間がかかったかを残す
+        duration = time.perf_counter() - started
+        add_span(ctx, "total", duration)
+        # 失敗した場合はジャーナルを残し、--resume で続きから再開できるようにする
+        close_journal(ctx["journal"], status == "success")
+        write_sync_state(ctx, status == "success")
+        if status != "success" and ctx["journal"] is not None:
+            log(f"📒 Progress was saved to {ctx['journal']['path']}; re-run with --resume to continue")
+        log_metrics_summary(ctx)
+        if ctx["latency_trace"] is not None:
+            write_latency_trace(ctx, args.latency_trace, append=args.watch)
+        if args.metrics_out:
+            write_metrics(ctx, args.metrics_out, args, status, duration)
+
     log("🎉 Sync completed successfully!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+同期対象の決定（git の差分と前回の同期の状態）
+sync_supabase.py の --base-sha / --sync-state で使用する
+"""
+
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sync_context import log
+from manuscript_io import write_json_atomic
+
+def run_git(data_dir, *args):
+    """データディレクトリでgitコマンドを実行して標準出力を返す"""
+    result = subprocess.run(
+        ["git", "-C", str(data_dir), *args],
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+def is_known_commit(data_dir, sha):
+    """コミットがローカルのリポジトリに存在するか確認"""
+    if not sha or set(sha) == {"0"}:
+        # 新規ブランチへのpushではbeforeが全て0になる
+        return False
+    try:
+        run_git(data_dir, "cat-file", "-e", f"{sha}^{{commit}}")
+    except (subprocess.CalledProcessError, OSError):
+        return False
+    return True
+
+def resolve_commit(data_dir, rev):
+    """リビジョンをコミットのSHAに解決する（解決できなければNone）"""
+    try:
+        return run_git(data_dir, "rev-parse", "--verify", f"{rev}^{{commit}}").decode("utf-8").strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+def load_sync_state(path):
+    """前回の同期の状態 {synced_sha, status} を読み込む（ない・壊れている場合はNone）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+def sync_state_base(ctx, data_dir, path, head_sha):
+    """--sync-state から差分同期の基準コミットを決める（全件スキャンにする場合はNone）
+
+    前回成功した同期のコミットを基準にするため、途中のpushの同期が失敗していてもその変更を取りこぼさない。
+    前回の同期が失敗していた場合と、状態が残っていない場合は全件スキャンにする。
+    """
+    state = load_sync_state(path)
+    previous = state.get("synced_sha") if state else None
+    ctx["sync_state"] = {"path": path, "head": resolve_commit(data_dir, head_sha), "previous": previous}
+    if ctx["sync_state"]["head"] is None:
+        log(f"⚠️  Could not resolve '{head_sha}' in {data_dir}; the next sync will scan the whole tree")
+    if state is None:
+        log(f"🔍 No sync state in {path}, falling back to full scan")
+        return None
+    if state.get("status") != "success" or not previous:
+        log(f"⚠️  The previous sync did not succeed ({state.get('status')}), falling back to full scan")
+        return None
+    return previous
+
+def write_sync_state(ctx, success):
+    """同期の状態を書き出す（失敗した場合は次回を全件スキャンにする）"""
+    sync_state = ctx["sync_state"]
+    if sync_state is None:
+        return
+    state = {
+        "status": "success" if success else "failed",
+        "synced_sha": sync_state["head"] if success else sync_state["previous"],
+        "synced_at": datetime.now(timezone.utc).isoformat(),
+    }
+    write_json_atomic(sync_state["path"], state)
+    log(f"🔖 Saved sync state to {sync_state['path']} ({state['status']}"
+        + (f", {state['synced_sha'][:7]}" if success and state["synced_sha"] else "") + ")")
+
+def find_changed_files(data_dir, base_sha, head_sha):
+    """base〜head間で変更された原稿ファイルを書名ディレクトリごとに返す
+
+    baseが不明な場合（未指定・新規ブランチ・shallow cloneで存在しない等）はNoneを返す。
+    """
+    if not is_known_commit(data_dir, base_sha):
+        return None
+
+    try:
+        output = run_git(
+            data_dir, "diff", "--name-status", "--no-renames", "--relative", "-z",
+            base_sha, head_sha,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        log(f"⚠️  git diff failed: {e}")
+        return None
+
+    changed = {}
+    fields = output.decode("utf-8").split("\0")
+    for status, path in zip(fields[0::2], fields[1::2]):
+        parts = Path(path).parts
+        # 書名/manuscript/<ファイル> のみが同期対象
+        if len(parts) != 3 or parts[1] != "manuscript":
+            continue
+        book_name, _, file_name = parts
+        if file_name != "info.yml" and not file_name.endswith(".md"):
+            continue
+        if status.startswith("D"):
+            log(f"⚠️  {path} was removed; set status: deleted instead to delete it from Supabase")
+            continue
+        changed.setdefault(book_name, set()).add(file_name)
+    return changed
+
+def find_sync_targets(data_dir, changed=None):
+    """処理対象の (manuscriptディレクトリ, 読み込むエピソード名) を列挙する
+
+    changedがNoneの場合は全書名ディレクトリ・全エピソードを対象とする。
+    """
+    targets = []
+    if changed is None:
+        book_dirs = sorted(d for d in data_dir.iterdir() if d.is_dir() and not d.name.startswith('.'))
+    else:
+        book_dirs = [data_dir / name for name in sorted(changed)]
+
+    for book_dir in book_dirs:
+        # manuscript ディレクトリがあるかチェック
+        manuscript_dir = book_dir / "manuscript"
+        if not (manuscript_dir.exists() and manuscript_dir.is_dir()):
+            log(f"⚠️  Skipping {book_dir.name}: manuscript directory not found")
+            continue
+        if changed is None:
+            targets.append((manuscript_dir, None))
+        else:
+            episode_names = {name for name in changed[book_dir.name] if name.endswith(".md")}
+            targets.append((manuscript_dir, episode_names))
+    return targets
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Supabase への送信（共有セッション・再試行・非同期書き込み・適応制御）
+sync_supabase.py の --async-writes / --adaptive / --latency-trace で使用する
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import requests
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+from sync_context import call_with_logs, count, emit_logs, log
+
+# HTTP通信の設定（コネクションプール・タイムアウト・リトライ）
+POOL_SIZE = int(os.environ.get("SYNC_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("SYNC_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("SYNC_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("SYNC_MAX_RETRIES", "5"))
+RETRY_BACKOFF = float(os.environ.get("SYNC_RETRY_BACKOFF", "0.5"))
+RETRY_BACKOFF_MAX = float(os.environ.get("SYNC_RETRY_BACKOFF_MAX", "30"))
+
+# 非冪等な操作でも再送してよいステータス（サーバー側で処理されていない）
+THROTTLE_STATUS_CODES = {429, 503}
+# 冪等な操作のみ再送するステータス
+TRANSIENT_STATUS_CODES = {500, 502, 504}
+
+# --adaptive 時にバッチを組み立てる単位の件数（ジャーナルにはこの単位で記録するため、再開時も同じ区切りになる）
+ADAPTIVE_UNIT = int(os.environ.get("SYNC_ADAPTIVE_UNIT", "25"))
+
+def create_session(pool_size=POOL_SIZE):
+    """keep-aliveで接続を使い回す共有セッションを作成"""
+    session = requests.Session()
+    # リトライは supabase_request で制御するため urllib3 側では行わない
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def open_transport(ctx):
+    """共有セッションを作り、--adaptive の場合は適応制御の状態も作る"""
+    pool_size = POOL_SIZE
+    if ctx["async_writes"] or ctx["adaptive_writes"]:
+        ctx["max_in_flight"] = max(1, ctx["max_in_flight"])
+        # 同時送信数より小さいプールだと接続が使い回されずに破棄される
+        pool_size = max(POOL_SIZE, ctx["max_in_flight"])
+    ctx["session"] = create_session(pool_size)
+    if ctx["adaptive_writes"]:
+        ctx["adaptive"] = new_controller(ctx["max_in_flight"], max(ctx["insert_chunk_size"], ctx["upsert_chunk_size"]),
+                                         ctx["target_latency"])
+
+def parse_retry_after(value):
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt):
+    """ジッター付き指数バックオフの待機秒数（full jitter）"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * (2 ** (attempt - 1))))
+
+def new_controller(max_concurrency, max_records, target_latency, unit=ADAPTIVE_UNIT):
+    """適応制御の状態を作る（同時送信数1・バッチは unit の数倍から始める）
+
+    応答時間が目標以内なら同時送信数とバッチの件数を少しずつ増やし、
+    429/503・タイムアウトで半分に減らす（AIMD）。
+    """
+    return {
+        "concurrency": 1.0,
+        "max_concurrency": max(1, max_concurrency),
+        "batch_records": float(max(1, min(max_records, unit * 4))),
+        "max_records": max(1, max_records),
+        "unit": unit,
+        "target_latency": target_latency,
+        "blocked_until": 0.0,
+        "last_cut": -target_latency,
+        "latency": None,  # 応答時間の移動平均
+        "in_flight": 0,
+        "lock": threading.Lock(),
+    }
+
+def on_fast_response(ctx, controller, latency):
+    """応答が目標時間以内なら同時送信数とバッチの件数を加算的に増やし、超えていればバッチを小さくする
+
+    増分を同時送信数で割り、全リクエストが一巡したときに同時送信数が1・バッチが unit 件増える。
+    遅い場合は応答時間がバッチの大きさに比例するとみなし、一巡で目標時間に収まる件数まで減らす（最大で半分）。
+    """
+    with controller["lock"]:
+        window = controller["concurrency"]
+        average = controller["latency"]
+        controller["latency"] = latency if average is None else average * 0.8 + latency * 0.2
+        if latency <= controller["target_latency"]:
+            controller["concurrency"] = min(controller["max_concurrency"], window + 1 / window)
+            controller["batch_records"] = min(controller["max_records"],
+                                              controller["batch_records"] + controller["unit"] / window)
+        else:
+            count(ctx, "adaptive.slow_responses")
+            scale = max(0.5, controller["target_latency"] / latency) ** (1 / window)
+            controller["batch_records"] = max(min(controller["unit"], controller["max_records"]),
+                                              controller["batch_records"] * scale)
+
+def on_congestion(ctx, controller, retry_after):
+    """429/503・タイムアウトで同時送信数とバッチの件数を半分にし、Retry-After の間は新しい送信を止める"""
+    now = time.monotonic()
+    with controller["lock"]:
+        # 並行中のリクエストが同じ混雑で続けて失敗しても、1往復の間の減少は1回とみなす
+        if now - controller["last_cut"] >= (controller["latency"] or controller["target_latency"]):
+            controller["concurrency"] = max(1.0, controller["concurrency"] / 2)
+            controller["batch_records"] = max(min(controller["unit"], controller["max_records"]),
+                                              controller["batch_records"] / 2)
+            controller["last_cut"] = now
+            count(ctx, "adaptive.cuts")
+        if retry_after:
+            controller["blocked_until"] = max(controller["blocked_until"], now + retry_after)
+
+def adaptive_wait(controller):
+    """Retry-After による送信停止の残り秒数"""
+    return max(0.0, controller["blocked_until"] - time.monotonic())
+
+def observe_request(ctx, method, url, status, latency, sent, retry_after=None):
+    """リクエスト1回分の結果を適応制御に反映し、応答時間のトレースに記録する（statusは例外ならその型名）"""
+    controller = ctx["adaptive"]
+    if controller is not None:
+        if not isinstance(status, int) or status in THROTTLE_STATUS_CODES:
+            on_congestion(ctx, controller, retry_after)
+        elif status < 400:
+            on_fast_response(ctx, controller, latency)
+    if ctx["latency_trace"] is None:
+        return
+    entry = {
+        "t": round(time.monotonic() - ctx["started"] - latency, 4),
+        "method": method,
+        "table": url.rsplit("/", 1)[-1],
+        "status": status,
+        "latency_ms": round(latency * 1000, 2),
+        "bytes_sent": sent,
+    }
+    if controller is not None:
+        entry.update(
+            concurrency=round(controller["concurrency"], 2),
+            batch_records=int(controller["batch_records"]),
+            in_flight=controller["in_flight"],
+        )
+    with ctx["stats_lock"]:
+        ctx["latency_trace"].append(entry)
+
+def write_latency_trace(ctx, path, append=False):
+    """応答時間のトレースをJSON Lines で書き出す（1行1リクエスト、再試行も1行ずつ）
+
+    append の場合は既存のファイルに追記する（--watch で周回ごとに書き出してメモリに溜めないため）。
+    """
+    trace = ctx["latency_trace"]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if append:
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in trace:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in trace:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    log(f"📈 Wrote latency trace of {len(trace)} requests to {path}")
+
+def supabase_request(ctx, method, url, idempotent, **kwargs):
+    """共有セッションでリクエストを送信し、一時的な失敗は再試行する
+
+    429/503 はどの操作でも再試行する。接続断・タイムアウト・その他の5xxは
+    再送しても結果が変わらない冪等な操作（UPSERT・DELETE・GET）のみ再試行する。
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    attempt = 0
+    while True:
+        count(ctx, "http.requests")
+        started = time.monotonic()
+        try:
+            response = ctx["session"].request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            observe_request(ctx, method, url, type(e).__name__, time.monotonic() - started, 0)
+            # 接続確立前のタイムアウトなら非冪等な操作でも送信されていない
+            retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+            reason = type(e).__name__
+            retry_after = None
+        else:
+            body = response.request.body
+            count(ctx, "http.bytes_sent", len(body) if body else 0)
+            count(ctx, "http.bytes_received", len(response.content))
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            observe_request(ctx, method, url, status, time.monotonic() - started, len(body) if body else 0, retry_after)
+            retryable = status in THROTTLE_STATUS_CODES or (idempotent and status in TRANSIENT_STATUS_CODES)
+            if not retryable or attempt >= MAX_RETRIES:
+                return response
+            reason = f"HTTP {status}"
+
+        attempt += 1
+        count(ctx, "http.retries")
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        log(f"🔁 Retrying {method} {url} in {delay:.1f}s ({reason}, attempt {attempt}/{MAX_RETRIES})")
+        time.sleep(delay)
+
+def transport_summary(ctx):
+    """コネクションプールの利用状況を集計"""
+    connections = 0
+    pooled_requests = 0
+    # http/httpsに同じアダプターをマウントしているため重複を除く
+    adapters = {id(adapter): adapter for adapter in ctx["session"].adapters.values()} if ctx["session"] else {}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            pooled_requests += pool.num_requests
+    counters = ctx["metrics"]["counters"]
+    return {
+        "requests": counters.get("http.requests", 0),
+        "connections": connections,
+        "reused_connections": max(0, pooled_requests - connections),
+        "retries": counters.get("http.retries", 0),
+        "bytes_sent": counters.get("http.bytes_sent", 0),
+        "bytes_received": counters.get("http.bytes_received", 0),
+    }
+
+def continue_on_failure(ctx):
+    """書き込みに失敗しても残りのバッチを送り続けるか（非同期モードと --repos）"""
+    return ctx["async_writes"] or ctx["repo_owners"] is not None
+
+def send_chunks(ctx, send, chunks):
+    """チャンクごとのリクエストを送信し、結果をチャンク順のリストで返す
+
+    失敗したチャンクの結果は例外オブジェクトになる。逐次モードでは最初の失敗で
+    送信を打ち切り（--repos では続ける）、非同期モードでは max_in_flight 件まで並行に送信する。
+    """
+    if ctx["async_writes"] and len(chunks) > 1:
+        return asyncio.run(send_chunks_async(ctx, send, chunks))
+
+    results = []
+    for chunk in chunks:
+        try:
+            results.append(send(chunk))
+        except requests.exceptions.RequestException as e:
+            results.append(e)
+            if not continue_on_failure(ctx):
+                break
+    return results
+
+def dispatch(ctx, send, batches):
+    """バッチを送信し、(送信したバッチのリスト, 結果のリスト) を返す（--adaptive 時は制御器に従って送信する）"""
+    if ctx["adaptive"] is not None:
+        return send_adaptive(ctx, send, batches)
+    batches = list(batches)
+    return batches, send_chunks(ctx, send, batches)
+
+def acquire_slot(controller):
+    """制御器の同時送信数に空きがあれば1つ確保する（Retry-After の待機中は確保しない）"""
+    with controller["lock"]:
+        if time.monotonic() < controller["blocked_until"] or controller["in_flight"] >= int(controller["concurrency"]):
+            return False
+        controller["in_flight"] += 1
+        return True
+
+def release_slot(controller):
+    """確保した送信枠を返す"""
+    with controller["lock"]:
+        controller["in_flight"] -= 1
+
+def send_adaptive(ctx, send, batches):
+    """制御器の同時送信数まで並行にバッチを送信する
+
+    同時送信数は同時に動いている全ての送信（--pipeline のまとまりごとの送信など）で共有する。
+    バッチは送信を始める直前に batches から取り出すため、その時点の制御器の件数で組み立てられる。
+    逐次モード（--repos を除く）では失敗した時点で新しいバッチの送信をやめる。
+    """
+    controller = ctx["adaptive"]
+
+    def run(batch):
+        try:
+            return send(batch)
+        finally:
+            release_slot(controller)
+
+    batches = iter(batches)
+    sent = []
+    results = []
+    pending = {}
+    stopped = False
+    with ThreadPoolExecutor(max_workers=controller["max_concurrency"]) as executor:
+        while True:
+            while not stopped and acquire_slot(controller):
+                batch = next(batches, None)
+                if batch is None:
+                    release_slot(controller)
+                    stopped = True
+                    break
+                pending[executor.submit(call_with_logs, run, batch)] = len(sent)
+                sent.append(batch)
+                results.append(None)
+            if not pending:
+                if stopped:
+                    break
+                # Retry-After の間や、他の送信が枠を使い切っている間は待つ
+                time.sleep(max(0.01, adaptive_wait(controller)))
+                continue
+            done, _ = wait(pending, timeout=adaptive_wait(controller) or None, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                result, lines = future.result()
+                emit_logs(lines)
+                if isinstance(result, requests.exceptions.RequestException):
+                    stopped = stopped or not continue_on_failure(ctx)
+                elif isinstance(result, Exception):
+                    raise result
+                results[index] = result
+    return sent, results
+
+async def send_chunks_async(ctx, send, chunks):
+    """同時実行数を max_in_flight に制限し、スレッドプールでチャンクを並行送信する
+
+    送信はワーカースレッドで行うため、ログはチャンクごとに溜めて、完了したときに呼び出し元のスレッドで出力する
+    （--pipeline では呼び出し元の capture_logs に入る）。
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(ctx["max_in_flight"])
+
+    async def run(chunk):
+        async with semaphore:
+            result, lines = await loop.run_in_executor(executor, call_with_logs, send, chunk)
+        emit_logs(lines)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    with ThreadPoolExecutor(max_workers=ctx["max_in_flight"]) as executor:
+        return await asyncio.gather(*(run(chunk) for chunk in chunks), return_exceptions=True)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+常駐モード（--watch）
+原稿ディレクトリを mtime で監視し、変更のあったファイルだけを検証・同期し続ける
+"""
+
+import os
+import time
+
+from sync_context import log, timed
+from sync_transport import RETRY_BACKOFF_MAX, write_latency_trace
+from sync_targets import find_sync_targets
+from sync_core import list_episode_files, pipeline_sync, sync_all
+from sync_outputs import emit_changes, finish_sync
+from static_export import open_export
+from revalidation import open_changes
+from validate_data import constraint_errors, new_constraint_index, validate_novel_directory
+from manuscript_io import cache_key, load_info_file, save_parse_cache
+
+# 原稿の変更を確認する間隔と、最後の変更から同期を始めるまでの待ち時間（秒）
+WATCH_INTERVAL = float(os.environ.get("SYNC_WATCH_INTERVAL", "1.0"))
+WATCH_DEBOUNCE = float(os.environ.get("SYNC_WATCH_DEBOUNCE", "0.5"))
+
+def scan_manuscripts(data_dir):
+    """書名/manuscript/ 直下の原稿ファイルの (mtime, サイズ) を (書名, ファイル名) ごとに返す（内容は読まない）"""
+    snapshot = {}
+    for book in os.scandir(data_dir):
+        if not book.is_dir() or book.name.startswith('.'):
+            continue
+        try:
+            entries = os.scandir(os.path.join(book.path, "manuscript"))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name != "info.yml" and not entry.name.endswith(".md"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[(book.name, entry.name)] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def validate_books(ctx, data_dir, books, constraints):
+    """書名ディレクトリを検証し直し、エラーのあった書名 → エラーのリスト を返す
+
+    constraints（書名 → 一意制約の索引）は検証した書名の分を置き換える。
+    重複は全書名の索引をまとめて調べ、検証した書名が関わるものだけをエラーにする。
+    """
+    errors = {}
+    for book in books:
+        manuscript_dir = data_dir / book / "manuscript"
+        if not manuscript_dir.is_dir():
+            constraints.pop(book, None)
+            continue
+        index = new_constraint_index()
+        book_errors, warnings = validate_novel_directory(manuscript_dir, ctx["parse_cache"], index)
+        constraints[book] = index
+        for warning in warnings:
+            log(f"⚠️  {warning}")
+        if book_errors:
+            errors[book] = book_errors
+
+    merged = new_constraint_index()
+    for index in constraints.values():
+        for constraint, keys in index.items():
+            for key, locations in keys.items():
+                merged[constraint].setdefault(key, []).extend(locations)
+    for constraint, keys in merged.items():
+        for key, locations in keys.items():
+            involved = {location.split("/")[0] for location in locations} & set(books)
+            if len(locations) < 2 or not involved:
+                continue
+            single = new_constraint_index()
+            single[constraint][key] = locations
+            for book in involved:
+                errors.setdefault(book, []).extend(constraint_errors(single))
+    return errors
+
+def queue_new_novel_episodes(ctx, data_dir, files):
+    """info.yml が保存された、まだ作成していない（id がなく、この常駐中に同期していない）小説の全エピソードを同期対象に加える
+
+    info.yml だけを保存して作成した小説の、既にあるエピソードのファイルが同期されないままにならないようにする。
+    """
+    for book, names in files.items():
+        if "info.yml" not in names:
+            continue
+        manuscript_dir = data_dir / book / "manuscript"
+        try:
+            info = load_info_file(manuscript_dir / "info.yml", ctx["parse_cache"])
+        except Exception:
+            # 読み込めない info.yml は同期時にエラーとして出力される
+            continue
+        if not isinstance(info, dict) or info.get('id') is not None or info.get('title') in ctx["known_novel_ids"]:
+            continue
+        episodes = {episode_file.name for episode_file in list_episode_files(manuscript_dir)}
+        if episodes - names:
+            log(f"📚 {book}: new novel, syncing all {len(episodes)} episode files")
+            names.update(episodes)
+
+def watch_cycle(ctx, data_dir, changed, constraints, args):
+    """変更のあったファイルを検証して同期する
+
+    戻り値は同期できなかったファイル（書き込みに失敗したもの。次の周回で再試行する）。
+    検証エラーの書名は同期せず、再度保存されるまで待つ。
+    """
+    books = sorted({book for book, _ in changed})
+    with timed(ctx, "watch.validate"):
+        invalid = validate_books(ctx, data_dir, books, constraints)
+    for book, errors in invalid.items():
+        log(f"❌ {book}: {len(errors)} validation errors, not syncing until it is saved again")
+        for error in errors:
+            log(f"  - {error}")
+
+    files = {}
+    for book, name in changed:
+        if book not in invalid:
+            files.setdefault(book, set()).add(name)
+    if not files:
+        return set()
+
+    ctx["write_failures"].clear()
+    ctx["failed_records"].clear()
+    if args.export_dir:
+        ctx["export"] = open_export(args.export_dir)
+    if ctx["changes"] is not None:
+        ctx["changes"] = open_changes()
+    try:
+        queue_new_novel_episodes(ctx, data_dir, files)
+        targets = find_sync_targets(data_dir, files)
+        if args.pipeline:
+            pipeline_sync(ctx, targets, args.workers, max(1, args.batch_size))
+        else:
+            sync_all(ctx, targets, args.workers)
+        finish_sync(ctx, args)
+    except (Exception, SystemExit) as e:
+        # 1周回の失敗で常駐を止めない（書き込みの失敗は sys.exit になる）
+        if not isinstance(e, SystemExit):
+            log(f"❌ Sync cycle failed: {type(e).__name__}: {e}")
+        return {(book, name) for book, names in files.items() for name in names}
+    finally:
+        emit_changes(ctx, args)
+        if ctx["latency_trace"] is not None:
+            write_latency_trace(ctx, args.latency_trace, append=True)
+            ctx["latency_trace"] = []
+    return set()
+
+def watch_sync(ctx, data_dir, args):
+    """原稿ディレクトリを mtime で監視し、変更のあったファイルだけを検証・同期し続ける（Ctrl+Cで終了）
+
+    連続した保存は最後の変更から WATCH_DEBOUNCE 秒待ってまとめて同期する。
+    書き込みに失敗したファイルは間隔を空けて再試行する。
+    status: new のエピソードは保存し直すたびに再送されるため、INSERTではなくUPSERTで送る。
+    id のない小説は、常駐を再起動した後も重複して作成しないよう、タイトルでリモートの小説を探してから作成する。
+    """
+    ctx["upsert_new_episodes"] = True
+    ctx["resolve_novel_titles"] = True
+    if ctx["latency_trace"] is not None:
+        open(args.latency_trace, "w").close()
+    snapshot = scan_manuscripts(data_dir)
+    constraints = {}
+    with timed(ctx, "watch.validate"):
+        invalid = validate_books(ctx, data_dir, sorted({book for book, _ in snapshot}), constraints)
+    if invalid:
+        log(f"⚠️  {len(invalid)} novels have validation errors; they are synced once fixed: {', '.join(sorted(invalid))}")
+    log(f"👀 Watching {data_dir}: {len(snapshot)} files, polling every {WATCH_INTERVAL}s "
+        f"(debounce {WATCH_DEBOUNCE}s, Ctrl+C to stop)")
+
+    pending = set()
+    last_change = 0.0
+    retry_at = 0.0
+    failures = 0
+    cycles = 0
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = scan_manuscripts(data_dir)
+            changed = {key for key, stat in current.items() if snapshot.get(key) != stat}
+            for book, name in sorted(snapshot.keys() - current.keys()):
+                log(f"⚠️  {book}/manuscript/{name} was removed; set status: deleted instead to delete it from Supabase")
+                if ctx["parse_cache"] is not None:
+                    ctx["parse_cache"]["entries"].pop(cache_key(data_dir / book / "manuscript" / name), None)
+            snapshot = current
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                last_change = now
+            if not pending or now - last_change < WATCH_DEBOUNCE or now < retry_at:
+                continue
+
+            cycles += 1
+            batch, pending = pending, set()
+            log(f"🔄 Cycle {cycles}: {len(batch)} changed files in {len({book for book, _ in batch})} novels")
+            started = time.perf_counter()
+            with timed(ctx, "watch.sync"):
+                failed = watch_cycle(ctx, data_dir, batch, constraints, args)
+            if failed:
+                failures += 1
+                delay = min(RETRY_BACKOFF_MAX, WATCH_DEBOUNCE * 2 ** failures)
+                retry_at = time.monotonic() + delay
+                pending |= failed
+                log(f"🔁 Cycle {cycles} failed; retrying {len(failed)} files in {delay:.1f}s")
+            else:
+                failures = 0
+                log(f"✅ Cycle {cycles} done in {time.perf_counter() - started:.2f}s")
+    except KeyboardInterrupt:
+        log(f"👋 Stopped watching after {cycles} cycles")
+    finally:
+        if save_parse_cache(ctx["parse_cache"], args.parse_cache):
+            log(f"🗃️  Saved parse cache to {args.parse_cache}")
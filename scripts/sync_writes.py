@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+Supabase（PostgREST）への一括書き込みと読み出し
+バッチの組み立て・INSERT/UPSERT/DELETE・失敗の報告・リモートの状態の取得を行う
+"""
+
+import os
+import sys
+import json
+import requests
+
+from sync_context import chunked, count, log, timed, verbose
+from sync_journal import batch_done, batch_key, record_batch
+from sync_transport import dispatch, continue_on_failure, supabase_request
+
+# リモートの状態（--reconcile の突き合わせ・目次の順序）を取得するときの1ページの件数
+SNAPSHOT_PAGE_SIZE = int(os.environ.get("SYNC_SNAPSHOT_PAGE_SIZE", "1000"))
+
+def group_by_columns(items, key=None):
+    """カラム構成が同じレコードごとにまとめる
+
+    PostgRESTの一括書き込みは先頭レコードのキーを全件に適用するため、
+    キーが異なるレコードを混ぜると欠けたカラムがNULLで上書きされてしまう。
+    keyを指定した場合は key(item) のカラム構成でまとめる。
+    """
+    groups = {}
+    for item in items:
+        record = key(item) if key else item
+        groups.setdefault(tuple(sorted(record)), []).append(item)
+    return list(groups.values())
+
+def encode_record(record):
+    """レコードをJSONのバイト列にする（送信前に1件につき1回だけシリアライズする）"""
+    return json.dumps(record, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def pack_batches(sizes, max_records, max_bytes):
+    """レコードごとのバイト数から、件数とバイト数の上限に収まるバッチ（インデックスのリスト）を作る
+
+    順序は保ったまま先頭から詰めていく。単独で上限を超えるレコードは1件だけのバッチになる。
+    """
+    batches = []
+    current = []
+    current_bytes = 2  # 配列の [ ]
+    for i, size in enumerate(sizes):
+        separator = 1 if current else 0
+        if current and (len(current) >= max_records or current_bytes + separator + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = 2
+            separator = 0
+        current.append(i)
+        current_bytes += separator + size
+    if current:
+        batches.append(current)
+    return batches
+
+def warn_oversized(ctx, table_name, record, body):
+    """単独でバイト数の上限を超えるレコードを警告する"""
+    log(f"⚠️  Record {record.get('id', record.get('title', '?'))} for '{table_name}' is "
+        f"{len(body) / 1024:.1f} KB, over the {ctx['max_batch_bytes'] / 1024:.0f} KB batch budget; sending it alone")
+
+def build_batches(ctx, table_name, records, max_records):
+    """レコードを件数とバイト数の上限で分割し、(インデックスのリスト, 送信するJSON本文) のリストを返す"""
+    max_bytes = ctx["max_batch_bytes"]
+    encoded = [encode_record(record) for record in records]
+    batches = []
+    for indices in pack_batches([len(item) for item in encoded], max_records, max_bytes):
+        body = b"[" + b",".join(encoded[i] for i in indices) + b"]"
+        if len(indices) == 1 and len(body) > max_bytes:
+            warn_oversized(ctx, table_name, records[indices[0]], body)
+        batches.append((indices, body))
+    return batches
+
+def build_adaptive_batches(ctx, table_name, operation, records, max_records, skip_done):
+    """制御器の単位（unit 件）の小さなバッチを、送信する時点の制御器の件数までまとめて順に返す
+
+    単位ごとの区切りは常に同じなので、ジャーナルには単位ごとのキーを記録する。
+    skip_done の場合は前回の実行で完了済みの単位を除く。
+    """
+    controller = ctx["adaptive"]
+    max_bytes = ctx["max_batch_bytes"]
+    encoded = [encode_record(record) for record in records]
+    units = []
+    skipped = 0
+    for indices in pack_batches([len(item) for item in encoded], controller["unit"], max_bytes):
+        body = b"[" + b",".join(encoded[i] for i in indices) + b"]"
+        key = batch_key(table_name, operation, body)
+        if skip_done and batch_done(ctx, key):
+            skipped += len(indices)
+            count(ctx, "journal.skipped_batches")
+            continue
+        if len(indices) == 1 and len(body) > max_bytes:
+            warn_oversized(ctx, table_name, records[indices[0]], body)
+        units.append((indices, len(body) - 2, key))
+    if skipped:
+        log(f"⏭️  Skipping {skipped} records already sent to '{table_name}'")
+
+    position = 0
+    while position < len(units):
+        limit = min(max_records, int(controller["batch_records"]))
+        indices, size, key = units[position]
+        indices, keys = list(indices), [key]
+        position += 1
+        while position < len(units):
+            unit_indices, unit_size, key = units[position]
+            if len(indices) + len(unit_indices) > limit or size + 1 + unit_size + 2 > max_bytes:
+                break
+            indices.extend(unit_indices)
+            keys.append(key)
+            size += 1 + unit_size
+            position += 1
+        yield indices, b"[" + b",".join(encoded[i] for i in indices) + b"]", keys
+
+def iter_batches(ctx, table_name, operation, records, max_records, skip_done=True):
+    """カラム構成ごとにまとめたレコードをバッチに分け、(recordsのインデックスのリスト, JSON本文, ジャーナルのキーのリスト) を順に返す"""
+    for group in group_by_columns(list(range(len(records))), key=lambda i: records[i]):
+        group_records = [records[i] for i in group]
+        if ctx["adaptive"] is not None:
+            for indices, body, keys in build_adaptive_batches(ctx, table_name, operation, group_records,
+                                                              max_records, skip_done):
+                yield [group[i] for i in indices], body, keys
+            continue
+        for indices, body in build_batches(ctx, table_name, group_records, max_records):
+            yield [group[i] for i in indices], body, [batch_key(table_name, operation, body)]
+
+def log_batch_layout(ctx, table_name, chunks, bodies, max_records):
+    """バッチの分割結果をログ出力"""
+    sizes = [len(body) for body in bodies]
+    log(f"📦 Batch layout for '{table_name}': {len(chunks)} batches "
+        f"(limits {max_records} records / {ctx['max_batch_bytes'] / 1024:.0f} KB), "
+        f"records per batch {min(len(c) for c in chunks)}-{max(len(c) for c in chunks)}, "
+        f"body {min(sizes) / 1024:.1f}-{max(sizes) / 1024:.1f} KB, total {sum(sizes) / 1024:.1f} KB")
+    if verbose(ctx):
+        for i, (chunk, size) in enumerate(zip(chunks, sizes)):
+            log(f"  batch {i+1}: {len(chunk)} records, {size / 1024:.1f} KB")
+
+def format_in_filter(values):
+    """PostgRESTの in.(...) フィルタ値を作成（カンマ等を含むIDに備えて引用符で囲む）"""
+    quoted = []
+    for value in values:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        quoted.append(f'"{escaped}"')
+    return f"in.({','.join(quoted)})"
+
+def validate_novel_data(novel_data):
+    """小説データの妥当性をチェック"""
+    required_fields = ['title', 'author']
+    for field in required_fields:
+        if field not in novel_data or not novel_data[field]:
+            return False, f"Required field '{field}' is missing or empty"
+
+    # tagsが配列であることを確認
+    if 'tags' in novel_data and not isinstance(novel_data['tags'], list):
+        return False, "tags must be an array"
+
+    return True, "OK"
+
+def log_request_error(ctx, action, table_name, e, records=None):
+    """リクエスト失敗時の詳細をログ出力"""
+    log(f"❌ Error {action} '{table_name}': {e}")
+    if getattr(e, 'response', None) is not None:
+        log(f"Response status: {e.response.status_code}")
+        log(f"Response body: {e.response.text}")
+
+        # Supabaseエラーの詳細解析
+        try:
+            error_json = e.response.json()
+            if verbose(ctx):
+                log(f"📋 Supabase error details: {json.dumps(error_json, indent=2, ensure_ascii=False)}")
+
+            # 具体的なエラーメッセージがあるかチェック
+            if 'message' in error_json:
+                log(f"💡 Error message: {error_json['message']}")
+            if 'hint' in error_json:
+                log(f"💡 Hint: {error_json['hint']}")
+            if 'details' in error_json:
+                log(f"💡 Details: {error_json['details']}")
+
+        except ValueError:
+            log("📋 Could not parse error response as JSON")
+
+    if not records:
+        return
+
+    if not verbose(ctx):
+        ids = [str(record.get('id', record.get('title', '?'))) for record in records[:10]]
+        more = f" and {len(records) - 10} more" if len(records) > 10 else ""
+        log(f"🔍 Failed record ids: {', '.join(ids)}{more} (run with -v to dump the data)")
+        return
+
+    # データの詳細出力
+    log(f"🔍 Data being sent to '{table_name}':")
+    for i, record in enumerate(records[:3]):  # 最初の3件のみ表示
+        log(f"  Record {i+1}: {json.dumps(record, indent=2, ensure_ascii=False, default=str)}")
+        # データ型の確認
+        log(f"  Record {i+1} types:")
+        for key, value in record.items():
+            log(f"    {key}: {type(value).__name__} = {value}")
+    if len(records) > 3:
+        log(f"  ... and {len(records) - 3} more records")
+
+def novel_repo(ctx, temp_novel_id):
+    """--repos で、小説（一時ID）がどのリポジトリのものか（不明ならNone）
+
+    id のない小説の一時IDはリポジトリごとに異なる（fanin_sync で リポジトリ名:タイトル にする）ため、
+    別のリポジトリの同名の小説と区別できる。
+    """
+    if ctx["repo_owners"] is None:
+        return None
+    return ctx["repo_owners"].get(("novels", str(temp_novel_id)))
+
+def record_repo(ctx, table_name, item):
+    """--repos で、レコード（削除ではID）がどのリポジトリのものか（不明ならNone）
+
+    id のない小説のレコードは判別できないため、送信側で一時IDから novel_repo で判別する。
+    """
+    owners = ctx["repo_owners"]
+    if table_name == "novels":
+        return novel_repo(ctx, item.get('id'))
+    if table_name == "episode_pages" and isinstance(item, dict):
+        return owners.get(("episodes", str(item.get('episode_id'))))
+    return owners.get(("episodes", str(item.get('id') if isinstance(item, dict) else item)))
+
+def group_by_repo(ctx, table_name, items):
+    """--repos で、items のインデックスをリポジトリごとにまとめる（リポジトリが1つならNone）"""
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(record_repo(ctx, table_name, item), []).append(i)
+    return list(groups.values()) if len(groups) > 1 else None
+
+def retry_by_repo(ctx, table_name, send, batches, results, split):
+    """--repos で、複数のリポジトリのレコードを含むバッチが失敗したら、リポジトリごとに分けて送り直す
+
+    1リクエストのバッチはまとめて失敗する（一部だけ書き込まれることはない）ため、分けて送り直しても
+    重複しない。失敗の原因になったリポジトリのバッチだけがもう一度失敗する。
+    split はバッチをリポジトリごとのバッチのリストに分ける（分けられなければNone）。
+    """
+    if ctx["repo_owners"] is None:
+        return batches, results
+    retried_batches = []
+    retried_results = []
+    for batch, result in zip(batches, results):
+        parts = split(batch) if isinstance(result, requests.exceptions.RequestException) else None
+        if not parts:
+            retried_batches.append(batch)
+            retried_results.append(result)
+            continue
+        count(ctx, "repos.split_batches")
+        log(f"🔀 Retrying a failed batch of '{table_name}' separately for {len(parts)} repositories")
+        sent, sent_results = dispatch(ctx, send, parts)
+        retried_batches.extend(sent)
+        retried_results.extend(sent_results)
+    return retried_batches, retried_results
+
+def split_record_batch(ctx, table_name, operation, records, max_records, batch, repo_of):
+    """INSERT/UPSERTのバッチ（recordsのインデックス）をリポジトリごとのバッチに組み直す
+
+    repo_of は records のインデックスからリポジトリ名を返す。
+    """
+    groups = {}
+    for i in batch[0]:
+        groups.setdefault(repo_of(i), []).append(i)
+    if len(groups) < 2:
+        return None
+    parts = []
+    for subset in groups.values():
+        for sub_indices, body, keys in iter_batches(ctx, table_name, operation, [records[i] for i in subset],
+                                                    max_records, skip_done=False):
+            parts.append(([subset[i] for i in sub_indices], body, keys))
+    return parts
+
+def chunk_repos(ctx, index_chunks, repo_of):
+    """--repos で、チャンク（インデックスのリスト）ごとのリポジトリ名の集合（--repos でなければNone）"""
+    if ctx["repo_owners"] is None:
+        return None
+    return [{repo_of(i) for i in chunk} for chunk in index_chunks]
+
+def split_id_batch(ctx, table_name, chunk):
+    """DELETEのバッチ（IDのリスト）をリポジトリごとに分ける"""
+    groups = group_by_repo(ctx, table_name, chunk)
+    if groups is None:
+        return None
+    return [[chunk[i] for i in group] for group in groups]
+
+def fail_repo(ctx, name, error, status="failed"):
+    """--repos で、リポジトリの失敗を記録する（invalid は同期しなかったもの）"""
+    repo_summary = ctx["repo_summary"]
+    summary = repo_summary[name] if name in repo_summary else repo_summary.setdefault(
+        name, {"path": None, "status": "success", "novels": 0, "episodes": 0, "errors": []})
+    if summary["status"] != "invalid":
+        summary["status"] = status
+    summary["errors"].append(error)
+
+def handle_failures(ctx, action, table_name, chunks, results, repos_by_chunk=None):
+    """失敗したチャンクを報告する（逐次モードでは即座に終了、--repos ではリポジトリの失敗として記録する）
+
+    repos_by_chunk はチャンクごとのリポジトリ名の集合（省略時はレコードから record_repo で判別する）。
+    """
+    failed = False
+    for n, (chunk, result) in enumerate(zip(chunks, results)):
+        if not isinstance(result, Exception):
+            continue
+        if not isinstance(result, requests.exceptions.RequestException):
+            # 通信エラー以外はバグの可能性が高いためそのまま送出する
+            raise result
+        failed = True
+        records = chunk if chunk and isinstance(chunk[0], dict) else None
+        log_request_error(ctx, action, table_name, result, records)
+        message = f"{action} '{table_name}' ({len(chunk)} records): {result}"
+        if ctx["repo_owners"] is not None:
+            owners = (repos_by_chunk[n] if repos_by_chunk is not None
+                      else {record_repo(ctx, table_name, item) for item in chunk})
+            repos = sorted({repo or "?" for repo in owners})
+            message = f"[{', '.join(repos)}] {message}"
+            for repo in repos:
+                fail_repo(ctx, repo, message)
+        ctx["write_failures"].append(message)
+        for item in chunk:
+            record_id = item.get('id') if isinstance(item, dict) else item
+            if record_id is not None:
+                ctx["failed_records"].add((table_name, str(record_id)))
+    if failed and not continue_on_failure(ctx):
+        sys.exit(1)
+
+def insert_data(ctx, table_name, data, on_batch=None, repo_of=None):
+    """SupabaseにデータをINSERTする
+
+    戻り値は入力と同じ順序のレコードリスト（失敗したチャンクのレコードはNone）。
+    on_batch を渡すと、バッチが成功するごとに (入力のインデックス, 返却レコード) で呼び出す。
+    repo_of は --repos で入力のインデックスからリポジトリ名を返す（省略時はレコードから判別する）。
+    """
+    if not data:
+        log(f"⚠️  No data to insert for table '{table_name}'")
+        return None
+
+    # novelsテーブルの場合はデータ妥当性をチェック
+    if table_name == 'novels':
+        for i, record in enumerate(data):
+            is_valid, error_msg = validate_novel_data(record)
+            if not is_valid:
+                log(f"❌ Data validation failed for record {i+1}: {error_msg}")
+                if verbose(ctx):
+                    log(f"🔍 Invalid record: {json.dumps(record, indent=2, ensure_ascii=False, default=str)}")
+                return None
+
+    url = f"{ctx['url']}/rest/v1/{table_name}"
+    max_records = ctx["insert_chunk_size"]
+    if repo_of is None:
+        repo_of = lambda i: record_repo(ctx, table_name, data[i])
+
+    # 主キーを明示したレコードは、再送しても重複行はできない（既に書き込まれていれば409になる）
+    idempotent = all(record.get('id') is not None for record in data)
+
+    # 返却レコードを入力順に戻せるよう、インデックス単位でバッチを作る
+    # 自動採番のレコードは内容が同じでも別の行になるため、完了済みの判定は主キーがある場合のみ
+    batches = iter_batches(ctx, table_name, "insert", data, max_records, skip_done=idempotent)
+    if ctx["adaptive"] is None:
+        batches = list(batches)
+        log(f"➕ Inserting {len(data)} records to '{table_name}' ({len(batches)} requests)...")
+        log_batch_layout(ctx, table_name, [b[0] for b in batches], [b[1] for b in batches], max_records)
+    else:
+        log(f"➕ Inserting {len(data)} records to '{table_name}' (adaptive batches)...")
+    if verbose(ctx):
+        log(f"📤 Request URL: {url}")
+        log(f"📋 Headers: {json.dumps({k: v for k, v in ctx['headers'].items() if k not in ('Authorization', 'apikey')}, indent=2)}")
+
+    # レスポンスデータを取得するためにヘッダーを追加
+    headers_with_return = ctx["headers"].copy()
+    headers_with_return["Prefer"] = "return=representation"  # INSERTでレスポンスデータを取得
+
+    def send(batch):
+        index_chunk, body, keys = batch
+        chunk = [data[i] for i in index_chunk]
+        if idempotent and all(batch_done(ctx, key) for key in keys):
+            log(f"⏭️  Skipping {len(chunk)} records already inserted to '{table_name}'")
+            count(ctx, "journal.skipped_batches")
+            return chunk
+        response = supabase_request(ctx, "POST", url, idempotent=idempotent, headers=headers_with_return, data=body)
+        log(f"📥 Response status: {response.status_code} ({len(chunk)} records, {len(body) / 1024:.1f} KB)")
+        response.raise_for_status()
+        result = response.json()
+        if on_batch is not None:
+            on_batch(index_chunk, result)
+        for key in keys:
+            record_batch(ctx, key)
+        return result
+
+    count(ctx, f"records.{table_name}.insert", len(data))
+    with timed(ctx, f"{table_name}.insert"):
+        batches, results = dispatch(ctx, send, batches)
+        batches, results = retry_by_repo(ctx, table_name, send, batches, results, lambda batch: split_record_batch(
+            ctx, table_name, "insert", data, max_records, batch, repo_of))
+    index_chunks = [b[0] for b in batches]
+    if ctx["adaptive"] is not None and batches:
+        log_batch_layout(ctx, table_name, index_chunks, [b[1] for b in batches], max_records)
+    chunks = [[data[i] for i in chunk] for chunk in index_chunks]
+    handle_failures(ctx, "inserting to", table_name, chunks, results, chunk_repos(ctx, index_chunks, repo_of))
+
+    inserted = [None] * len(data)
+    inserted_count = 0
+    for index_chunk, result in zip(index_chunks, results):
+        if isinstance(result, Exception):
+            continue
+        for i, record in zip(index_chunk, result):
+            inserted[i] = record
+            inserted_count += 1
+    log(f"✅ Successfully inserted {inserted_count} records to '{table_name}'")
+    return inserted
+
+def update_data(ctx, table_name, data, match_field, repo_of=None, upsert=False):
+    """SupabaseのデータをUPSERTでまとめて更新する
+
+    UPSERTは存在しないレコードを作成してしまうため、upsert=False ではリモートにあるレコードだけを送り、
+    無いレコードは警告して飛ばす（書き込みに失敗したレコードと同じく検索インデックスと静的JSONに反映しない）。
+    upsert=True は無いレコードも作成する（複合キーの match_field はこちらのみ）。
+    repo_of は --repos で入力のインデックスからリポジトリ名を返す（省略時はレコードから判別する）。
+    """
+    if not data:
+        log(f"⚠️  No data to update for table '{table_name}'")
+        return None
+
+    url = f"{ctx['url']}/rest/v1/{table_name}"
+    max_records = ctx["upsert_chunk_size"]
+
+    # マッチフィールド（カンマ区切りで複合キーも可）を持たないレコードは除外
+    match_fields = match_field.split(",")
+    records = []
+    kept = []  # records と同じ順の入力のインデックス
+    for i, record in enumerate(data):
+        if any(field not in record for field in match_fields):
+            log(f"⚠️  Skipping record without {match_field}: {record}")
+            continue
+        records.append(record)
+        kept.append(i)
+    if not upsert and records:
+        with timed(ctx, "snapshot"):
+            existing = {str(row[match_field]) for row in fetch_snapshot(
+                ctx, table_name, [match_field], match_field, [record[match_field] for record in records])}
+        missing = [record[match_field] for record in records if str(record[match_field]) not in existing]
+        if missing:
+            preview = ", ".join(str(value) for value in missing[:5]) + (", ..." if len(missing) > 5 else "")
+            log(f"⚠️  Skipping {len(missing)} records not found in '{table_name}' (not creating them): {preview}")
+            count(ctx, f"records.{table_name}.missing", len(missing))
+            for value in missing:
+                ctx["failed_records"].add((table_name, str(value)))
+            kept = [i for i, record in zip(kept, records) if str(record[match_field]) in existing]
+            records = [record for record in records if str(record[match_field]) in existing]
+    if repo_of is None:
+        record_repo_of = lambda i: record_repo(ctx, table_name, records[i])
+    else:
+        record_repo_of = lambda i: repo_of(kept[i])
+
+    # カラム構成ごとにまとめてから件数とバイト数の上限でバッチに分割
+    batches = iter_batches(ctx, table_name, "upsert", records, max_records)
+    if ctx["adaptive"] is None:
+        batches = list(batches)
+        log(f"🔄 Upserting {len(records)} records in '{table_name}' ({len(batches)} requests)...")
+        if batches:
+            log_batch_layout(ctx, table_name, [b[0] for b in batches], [b[1] for b in batches], max_records)
+    else:
+        log(f"🔄 Upserting {len(records)} records in '{table_name}' (adaptive batches)...")
+
+    # on_conflictで既存レコードにマージし、更新後のデータを返してもらう
+    headers_with_return = ctx["headers"].copy()
+    headers_with_return["Prefer"] = "resolution=merge-duplicates,return=representation"
+
+    def send(batch):
+        indices, body, keys = batch
+        chunk = [records[i] for i in indices]
+        if all(batch_done(ctx, key) for key in keys):
+            log(f"⏭️  Skipping {len(chunk)} records already updated in '{table_name}'")
+            count(ctx, "journal.skipped_batches")
+            return chunk
+        response = supabase_request(
+            ctx,
+            "POST",
+            url,
+            idempotent=True,
+            headers=headers_with_return,
+            params={"on_conflict": match_field},
+            data=body,
+        )
+        log(f"📥 Upsert response status ({len(chunk)} records, {len(body) / 1024:.1f} KB): {response.status_code}")
+        response.raise_for_status()
+        for key in keys:
+            record_batch(ctx, key)
+        return response.json()
+
+    count(ctx, f"records.{table_name}.update", len(records))
+    with timed(ctx, f"{table_name}.update"):
+        batches, results = dispatch(ctx, send, batches)
+        batches, results = retry_by_repo(ctx, table_name, send, batches, results, lambda batch: split_record_batch(
+            ctx, table_name, "upsert", records, max_records, batch, record_repo_of))
+    if ctx["adaptive"] is not None and batches:
+        log_batch_layout(ctx, table_name, [b[0] for b in batches], [b[1] for b in batches], max_records)
+    chunks = [[records[i] for i in b[0]] for b in batches]
+    handle_failures(ctx, "updating", table_name, chunks, results,
+                    chunk_repos(ctx, [b[0] for b in batches], record_repo_of))
+
+    updated_records = []
+    for result in results:
+        if not isinstance(result, Exception) and result:
+            updated_records.extend(result)
+
+    log(f"✅ Successfully updated {len(updated_records)} records in '{table_name}'")
+    return updated_records
+
+def delete_data(ctx, table_name, ids, match_field, filters=None):
+    """Supabaseからデータを in.(...) フィルタでまとめてDELETEする（filters で条件を追加できる）"""
+    if not ids:
+        log(f"⚠️  No data to delete from table '{table_name}'")
+        return None
+
+    url = f"{ctx['url']}/rest/v1/{table_name}"
+    chunks = list(chunked(ids, ctx["delete_chunk_size"]))
+
+    log(f"🗑️  Deleting {len(ids)} records from '{table_name}' ({len(chunks)} requests)...")
+
+    def send(chunk):
+        payload = [str(v) for v in chunk]
+        if filters:
+            payload = [payload, filters]
+        key = batch_key(table_name, "delete", json.dumps(payload, sort_keys=True).encode("utf-8"))
+        if batch_done(ctx, key):
+            log(f"⏭️  Skipping {len(chunk)} ids already deleted from '{table_name}'")
+            count(ctx, "journal.skipped_batches")
+            return len(chunk)
+        response = supabase_request(
+            ctx,
+            "DELETE",
+            url,
+            idempotent=True,
+            headers=ctx["headers"],
+            params={match_field: format_in_filter(chunk), **(filters or {})},
+        )
+        log(f"📥 Delete response status ({len(chunk)} ids): {response.status_code}")
+        response.raise_for_status()
+        record_batch(ctx, key)
+        return len(chunk)
+
+    count(ctx, f"records.{table_name}.delete", len(ids))
+    with timed(ctx, f"{table_name}.delete"):
+        chunks, results = dispatch(ctx, send, chunks)
+        chunks, results = retry_by_repo(ctx, table_name, send, chunks, results,
+                                        lambda chunk: split_id_batch(ctx, table_name, chunk))
+    handle_failures(ctx, "deleting from", table_name, chunks, results)
+
+    deleted_count = sum(result for result in results if not isinstance(result, Exception))
+    log(f"✅ Successfully deleted {deleted_count} records from '{table_name}'")
+    return deleted_count
+
+def fetch_snapshot(ctx, table_name, columns, filter_field, values, fatal=True):
+    """filter_field が values のいずれかに一致する行の指定カラムを、ページングしながらまとめて取得する
+
+    fatal=False の場合は、取得に失敗しても終了せず requests の例外を送出する。
+    """
+    url = f"{ctx['url']}/rest/v1/{table_name}"
+    rows = []
+    for chunk in chunked(sorted(set(values), key=str), ctx["delete_chunk_size"]):
+        offset = 0
+        while True:
+            params = {
+                "select": ",".join(columns),
+                filter_field: format_in_filter(chunk),
+                "order": "id",
+                "limit": SNAPSHOT_PAGE_SIZE,
+                "offset": offset,
+            }
+            try:
+                response = supabase_request(ctx, "GET", url, idempotent=True, headers=ctx["headers"], params=params)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                log_request_error(ctx, "fetching snapshot of", table_name, e)
+                if not fatal:
+                    raise
+                # リモートの状態が分からないまま書き込むと削除や重複を起こすため中断する
+                sys.exit(1)
+            page = response.json()
+            if not page:
+                break
+            rows.extend(page)
+            # サーバー側の max-rows で limit より少なく返る場合もあるため、空のページまで読む
+            offset += len(page)
+    count(ctx, f"snapshot.{table_name}", len(rows))
+    return rows
@@ -0,0 +1,38 @@
+"""
+scripts/ 配下のスクリプトをテストから import できるようにする
+同期のテスト用に、スタブの PostgREST と同期の設定・状態（ctx）を用意する
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.insert(0, str(SCRIPTS_DIR / "benchmarks"))
+
+
+@pytest.fixture
+def stub():
+    """スタブの PostgREST をバックグラウンドで起動し、(URL, state) を返す"""
+    from stub_postgrest import start_server
+
+    server, state = start_server(0, 0.0)
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def new_sync_context(stub):
+    """スタブに送信する ctx を作る関数（キーワード引数は new_context の options）"""
+    from sync_context import new_context
+    from sync_transport import open_transport
+
+    def build(**options):
+        ctx = new_context(stub[0], "service-key", **options)
+        open_transport(ctx)
+        return ctx
+
+    return build
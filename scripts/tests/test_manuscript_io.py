@@ -0,0 +1,107 @@
+"""
+manuscript_io の高速パーサーが python-frontmatter と同じ結果を返すことを確認する
+"""
+
+import frontmatter
+import pytest
+
+import manuscript_io
+
+# 解析規則の違いが出やすい書き方を集めた固定のコーパス（名前, ファイルの中身）
+EDGE_CASES = [
+    ("plain", '---\nid: "ep1"\ntitle: "第1話"\nepisode_number: 1\n---\n本文\n'),
+    ("bom", '﻿---\nid: "ep1"\n---\n本文\n'),
+    ("crlf", '---\r\nid: "ep1"\r\nepisode_number: 2\r\n---\r\n本文\r\n二行目\r\n'),
+    ("cr_only", '---\rid: "ep1"\r---\r本文\r'),
+    ("mixed_newlines", '---\nid: "ep1"\r\n---\r本文\n'),
+    ("long_boundary", '----\nid: "ep1"\n----\n本文\n'),
+    ("boundary_trailing_space", '--- \nid: "ep1"\n---  \n本文\n'),
+    ("boundary_in_body", '---\nid: "ep1"\n---\n本文\n---\n続き\n'),
+    ("duplicate_keys", '---\nid: "ep1"\nid: "ep2"\n---\n本文\n'),
+    ("fullwidth_space_line", '---\nid: "ep1"\n　\n---\n本文\n'),
+    ("nbsp_line", '---\nid: "ep1"\n \n---\n本文\n'),
+    ("tab_line", '---\nid: "ep1"\n\t\n---\n本文\n'),
+    ("space_line", '---\nid: "ep1"\n   \n---\n本文\n'),
+    ("special_key_yes", '---\nyes: "ep1"\n---\n本文\n'),
+    ("special_key_null", '---\nnull: 1\n---\n本文\n'),
+    ("special_key_on", '---\nOn: "x"\nid: "ep1"\n---\n本文\n'),
+    ("comments", '---\n# コメント\nid: "ep1" # 行末コメント\n---\n本文\n'),
+    ("leading_zero", '---\nid: "ep1"\nepisode_number: 01\n---\n本文\n'),
+    ("negative_int", '---\nid: "ep1"\nepisode_number: -3\n---\n本文\n'),
+    ("escaped_string", '---\nid: "ep\\"1"\n---\n本文\n'),
+    ("unquoted_values", '---\nid: ep1\nstatus: draft\npublished: true\n---\n本文\n'),
+    ("date_value", '---\nid: "ep1"\npublished_at: 2024-01-02\n---\n本文\n'),
+    ("nested_mapping", '---\nid: "ep1"\nmeta:\n  tags: [a, b]\n---\n本文\n'),
+    ("non_mapping_header", '---\n- a\n- b\n---\n本文\n'),
+    ("empty_header", '---\n---\n本文\n'),
+    ("no_closing_boundary", '---\nid: "ep1"\n本文\n'),
+    ("no_front_matter", '本文だけのファイル\n'),
+    ("empty_body", '---\nid: "ep1"\n---\n'),
+    ("whitespace_body", '---\nid: "ep1"\n---\n　\n \n'),
+    ("leading_blank_lines", '\n\n---\nid: "ep1"\n---\n本文\n'),
+    ("invalid_yaml", '---\nid: "ep1\n---\n本文\n'),
+]
+
+
+def expected_result(path):
+    """python-frontmatter で読み込んだ結果（例外の場合はその型）"""
+    try:
+        post = frontmatter.load(str(path))
+    except Exception as e:
+        return type(e)
+    return post.metadata, post.content
+
+
+def actual_result(load, path):
+    """高速パーサーで読み込んだ結果（例外の場合はその型）"""
+    try:
+        return load(path)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.fixture(params=EDGE_CASES, ids=[name for name, _ in EDGE_CASES])
+def episode_path(request, tmp_path):
+    name, text = request.param
+    path = tmp_path / f"{name}.md"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+
+def test_load_episode_file_matches_frontmatter(episode_path):
+    assert actual_result(manuscript_io.load_episode_file, episode_path) == expected_result(episode_path)
+
+
+def test_load_episode_file_with_cache_matches_frontmatter(episode_path):
+    cache = manuscript_io.new_parse_cache()
+    expected = expected_result(episode_path)
+    assert actual_result(lambda p: manuscript_io.load_episode_file(p, cache), episode_path) == expected
+    # 2回目はキャッシュから返す
+    assert actual_result(lambda p: manuscript_io.load_episode_file(p, cache), episode_path) == expected
+
+
+def test_scan_episode_header_matches_frontmatter(episode_path):
+    expected = expected_result(episode_path)
+    if isinstance(expected, type):
+        assert actual_result(manuscript_io.scan_episode_header, episode_path) == expected
+    else:
+        metadata, content = expected
+        assert manuscript_io.scan_episode_header(episode_path) == (metadata, bool(content))
+
+
+def test_flat_header_leaves_non_ascii_blank_lines_to_yaml():
+    # 全角スペース・NBSPだけの行はYAMLでは空行にならない
+    assert manuscript_io.parse_flat_header('id: "e"\n　') is None
+    assert manuscript_io.parse_flat_header('id: "e"\n ') is None
+    assert manuscript_io.parse_flat_header('id: "e"\n  \n') == {"id": "e"}
+
+
+def test_cache_round_trip_keeps_dates(tmp_path):
+    path = tmp_path / "info.yml"
+    path.write_text("title: テスト\ncreated_at: 2024-01-02\n", encoding="utf-8")
+    cache_path = tmp_path / "cache.json.gz"
+    cache = manuscript_io.new_parse_cache()
+    first = manuscript_io.load_info_file(path, cache)
+    manuscript_io.save_parse_cache(cache, str(cache_path))
+    reloaded = manuscript_io.load_parse_cache(str(cache_path))
+    assert manuscript_io.load_info_file(path, reloaded) == first
@@ -0,0 +1,55 @@
+"""
+全文検索インデックス（search_index）のテスト
+"""
+
+import json
+
+from search_index import load_index, remove_document, save_index, search, update_document
+
+
+def titles(results):
+    return [meta["title"] for meta in results]
+
+
+def test_search_finds_documents_containing_every_bigram(tmp_path):
+    index = load_index(str(tmp_path))
+    assert index["rebuild"]
+    update_document(index, "episode:e1", "魔法使いの弟子", {"title": "e1"})
+    update_document(index, "episode:e2", "剣士と魔法", {"title": "e2"})
+    assert titles(search(index, "魔法")) == ["e1", "e2"]
+    assert titles(search(index, "魔法使い")) == ["e1"]
+    assert search(index, "勇者") == []
+
+
+def test_saved_index_is_updated_incrementally(tmp_path):
+    index = load_index(str(tmp_path))
+    update_document(index, "episode:e1", "魔法使いの弟子", {"title": "e1"})
+    update_document(index, "episode:e2", "剣士と魔法", {"title": "e2"})
+    assert save_index(index)
+
+    index = load_index(str(tmp_path))
+    assert not index["rebuild"]
+    # 内容が同じ文書は更新しない
+    assert not update_document(index, "episode:e1", "魔法使いの弟子", {"title": "e1"})
+    assert not save_index(index)
+    assert update_document(index, "episode:e2", "剣士と騎士", {"title": "e2"})
+    assert remove_document(index, "episode:e1")
+    assert not remove_document(index, "episode:e1")
+    save_index(index)
+
+    index = load_index(str(tmp_path))
+    assert search(index, "魔法") == []
+    assert titles(search(index, "騎士")) == ["e2"]
+
+
+def test_index_of_another_version_is_rebuilt(tmp_path):
+    index = load_index(str(tmp_path))
+    update_document(index, "episode:e1", "魔法使いの弟子", {"title": "e1"})
+    save_index(index)
+    manifest = json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))
+    manifest["version"] = 0
+    (tmp_path / "index.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    index = load_index(str(tmp_path))
+    assert index["rebuild"]
+    assert search(index, "魔法") == []
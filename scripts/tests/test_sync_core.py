@@ -0,0 +1,41 @@
+"""
+全件同期（sync_all）のテスト（スタブの PostgREST に対して実行する）
+"""
+
+from sync_core import sync_all
+from sync_targets import find_sync_targets
+
+PARAGRAPHS = ["一" * 30, "二" * 30, "三" * 30]
+
+
+def write_episode(manuscript_dir, status, paragraphs):
+    body = "\n\n".join(paragraphs)
+    (manuscript_dir / "1.md").write_text(
+        f'---\nid: "e1"\nepisode_number: 1\ntitle: "t"\nstatus: "{status}"\n---\n{body}\n', encoding="utf-8")
+
+
+def test_paginate_stores_pages_and_removes_the_ones_no_longer_needed(tmp_path, stub, new_sync_context):
+    tables = stub[1].tables
+    manuscript_dir = tmp_path / "a" / "manuscript"
+    manuscript_dir.mkdir(parents=True)
+    (manuscript_dir / "info.yml").write_text('title: "a"\nauthor: "x"\npublished: true\n', encoding="utf-8")
+    write_episode(manuscript_dir, "new", PARAGRAPHS)
+
+    sync_all(new_sync_context(paginate=True, page_chars=40), find_sync_targets(tmp_path), workers=1)
+    episode = tables["episodes"]["e1"]
+    pages = sorted(tables["episode_pages"].values(), key=lambda page: page["page_number"])
+    assert episode["page_count"] == len(pages) == 3
+    # 全ページを連結すると元の本文になる
+    assert "".join(page["content"] for page in pages) == episode["content"]
+    assert [page["start_offset"] for page in pages] == [0, pages[0]["end_offset"], pages[1]["end_offset"]]
+
+    write_episode(manuscript_dir, "updated", PARAGRAPHS[:2])
+    sync_all(new_sync_context(paginate=True, page_chars=40), find_sync_targets(tmp_path), workers=1)
+    assert tables["episodes"]["e1"]["page_count"] == 2
+    assert sorted(page["page_number"] for page in tables["episode_pages"].values()) == [1, 2]
+
+    # 1ページに収まるエピソードはページを保存しない
+    write_episode(manuscript_dir, "updated", PARAGRAPHS[:1])
+    sync_all(new_sync_context(paginate=True, page_chars=40), find_sync_targets(tmp_path), workers=1)
+    assert tables["episodes"]["e1"]["page_count"] == 1
+    assert tables["episode_pages"] == {}
@@ -0,0 +1,64 @@
+"""
+進捗ジャーナル（--journal / --resume）のテスト
+"""
+
+import sys
+
+import pytest
+
+import sync_supabase
+from generate_corpus import generate_corpus
+from sync_core import sync_all
+from sync_journal import JOURNAL_PATH, close_journal, open_journal
+from sync_targets import find_sync_targets
+
+
+def parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["sync_supabase.py", "data", *argv])
+    return sync_supabase.parse_args()
+
+
+@pytest.mark.parametrize("argv, journal", [
+    ((), None),
+    (("--resume",), JOURNAL_PATH),
+    (("--journal", "j.jsonl"), "j.jsonl"),
+    (("--journal", "j.jsonl", "--resume"), "j.jsonl"),
+])
+def test_journal_is_only_written_when_requested(monkeypatch, argv, journal):
+    assert parse(monkeypatch, *argv).journal == journal
+
+
+def sync_with_journal(new_sync_context, data_dir, journal_path, resume):
+    ctx = new_sync_context(insert_chunk_size=5)
+    ctx["journal"] = open_journal(str(journal_path), data_dir, resume)
+    try:
+        sync_all(ctx, find_sync_targets(data_dir), workers=1)
+    except SystemExit:
+        close_journal(ctx["journal"], False)
+        raise
+    close_journal(ctx["journal"], True)
+    return ctx
+
+
+def test_resumed_sync_skips_completed_batches_and_inserted_novels(tmp_path, stub, new_sync_context):
+    state = stub[1]
+    data_dir = tmp_path / "data"
+    generate_corpus(data_dir, 3, 10, body_chars=200, status_mix="new=1", seed=1)
+    journal_path = tmp_path / "journal.jsonl"
+
+    # 途中のリクエストから失敗させて中断する（400は再試行しない）
+    state.fail_status = 400
+    state.fail_after = 4
+    with pytest.raises(SystemExit):
+        sync_with_journal(new_sync_context, data_dir, journal_path, resume=False)
+    assert journal_path.exists()
+    written = len(state.tables["episodes"])
+    assert 0 < written < 30
+
+    state.fail_after = None
+    ctx = sync_with_journal(new_sync_context, data_dir, journal_path, resume=True)
+    assert len(state.tables["novels"]) == 3
+    assert len(state.tables["episodes"]) == 30
+    assert ctx["metrics"]["counters"]["journal.skipped_batches"] == written // 5
+    # 成功したらジャーナルは削除される
+    assert not journal_path.exists()
@@ -0,0 +1,57 @@
+"""
+突き合わせ同期（--reconcile）のテスト（スタブの PostgREST に対して実行する）
+"""
+
+from sync_reconcile import reconcile_sync, scan_episode_files
+from sync_targets import find_sync_targets
+
+
+def write_novel(root, book, episodes):
+    """書名ディレクトリを作る（episodes はファイル名 → ヘッダー行）"""
+    manuscript_dir = root / book / "manuscript"
+    manuscript_dir.mkdir(parents=True)
+    (manuscript_dir / "info.yml").write_text(f'title: "{book}"\nauthor: "x"\npublished: true\n', encoding="utf-8")
+    for name, header in episodes.items():
+        (manuscript_dir / name).write_text(f"---\n{header}\ntitle: \"t\"\n---\n{name} の本文\n", encoding="utf-8")
+    return manuscript_dir
+
+
+def reconcile(new_sync_context, root):
+    ctx = new_sync_context(reconcile=True)
+    reconcile_sync(ctx, find_sync_targets(root), workers=1)
+    return ctx
+
+
+def test_reconcile_deletes_episodes_whose_files_were_removed(tmp_path, stub, new_sync_context):
+    manuscript_dir = write_novel(tmp_path, "a", {f"{n}.md": f'id: "a{n}"\nepisode_number: {n}' for n in (1, 2, 3)})
+    reconcile(new_sync_context, tmp_path)
+    (manuscript_dir / "2.md").unlink()
+    (manuscript_dir / "3.md").write_text('---\nid: "a3"\nstatus: "draft"\n---\n', encoding="utf-8")
+    reconcile(new_sync_context, tmp_path)
+    assert sorted(stub[1].tables["episodes"]) == ["a1"]
+
+
+def test_reconcile_keeps_episodes_of_unparseable_files(tmp_path, stub, new_sync_context, capsys):
+    manuscript_dir = write_novel(tmp_path, "a", {f"{n}.md": f'id: "a{n}"\nepisode_number: {n}' for n in (1, 2, 3)})
+    write_novel(tmp_path, "b", {"1.md": 'id: "b1"\nepisode_number: 1', "2.md": 'id: "b2"\nepisode_number: 2'})
+    reconcile(new_sync_context, tmp_path)
+
+    # ヘッダーが壊れたファイルはどのエピソードか分からないため、その小説では何も削除しない
+    (manuscript_dir / "1.md").write_text('---\nid: "a1"\ntitle: [unclosed\n---\n本文\n', encoding="utf-8")
+    (manuscript_dir / "2.md").unlink()
+    (tmp_path / "b" / "manuscript" / "2.md").unlink()
+    reconcile(new_sync_context, tmp_path)
+
+    assert sorted(stub[1].tables["episodes"]) == ["a1", "a2", "a3", "b1"]
+    assert "Not deleting remote episodes" in capsys.readouterr().out
+
+
+def test_scan_episode_files_collects_ids_that_must_stay(tmp_path):
+    manuscript_dir = write_novel(tmp_path, "a", {
+        "1.md": 'id: "a1"',
+        "2.md": 'id: "a2"\nstatus: "deleted"',
+        "3.md": 'id: "a3"\nstatus: "draft"',
+        "4.md": 'episode_number: 4',
+    })
+    on_disk = scan_episode_files({"parse_cache": None}, [(manuscript_dir, None, {"temp_novel_id": "a"})])
+    assert on_disk == {"ids": {"a1"}, "unreadable": {"a": ["4.md"]}}
@@ -0,0 +1,47 @@
+"""
+並行送信（--async-writes / --adaptive）のテスト
+"""
+
+import threading
+
+import pytest
+
+from sync_context import capture_logs, log
+from sync_transport import dispatch
+
+
+def send_with_log(chunk):
+    log(f"sent {chunk}")
+    return chunk
+
+
+@pytest.mark.parametrize("options", [{"async_writes": True}, {"adaptive_writes": True}])
+def test_worker_thread_logs_go_to_the_callers_capture(new_sync_context, capsys, options):
+    ctx = new_sync_context(max_in_flight=4, **options)
+
+    # --pipeline ではまとまりごとに別スレッドで capture_logs し、終わってからまとめて出力する
+    def pipeline_group(captured):
+        with capture_logs() as lines:
+            dispatch(ctx, send_with_log, [1, 2, 3])
+        captured.extend(lines)
+
+    captured = []
+    thread = threading.Thread(target=pipeline_group, args=(captured,))
+    thread.start()
+    thread.join()
+
+    assert sorted(line.split("] ", 1)[1] for line in captured) == ["sent 1", "sent 2", "sent 3"]
+    assert capsys.readouterr().out == ""
+
+
+def test_worker_thread_failures_are_returned_as_results(new_sync_context):
+    ctx = new_sync_context(async_writes=True, max_in_flight=4)
+
+    def send(chunk):
+        if chunk == 2:
+            raise ValueError("broken")
+        return chunk
+
+    _, results = dispatch(ctx, send, [1, 2, 3])
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,47 @@
+"""
+常駐モード（--watch）の1周回の同期のテスト（スタブの PostgREST に対して実行する）
+"""
+
+from argparse import Namespace
+
+from sync_watch import watch_cycle
+
+ARGS = Namespace(export_dir=None, pipeline=False, workers=1, batch_size=1, latency_trace=None,
+                 changes_out=None, revalidate_url=None, search_index=None)
+
+
+def write_novel(root, book, episode_ids):
+    manuscript_dir = root / book / "manuscript"
+    manuscript_dir.mkdir(parents=True)
+    (manuscript_dir / "info.yml").write_text(f'title: "{book}"\nauthor: "x"\npublished: true\n', encoding="utf-8")
+    for n, episode_id in enumerate(episode_ids, 1):
+        (manuscript_dir / f"{n}.md").write_text(
+            f'---\nid: "{episode_id}"\nepisode_number: {n}\ntitle: "t"\nstatus: "new"\n---\n本文\n', encoding="utf-8")
+
+
+def watch_context(new_sync_context):
+    # watch_sync が設定するものと同じ
+    return new_sync_context(upsert_new_episodes=True, resolve_novel_titles=True)
+
+
+def test_saving_only_info_yml_syncs_the_episodes_of_a_new_novel(tmp_path, stub, new_sync_context):
+    write_novel(tmp_path, "a", ["a1", "a2"])
+    failed = watch_cycle(watch_context(new_sync_context), tmp_path, {("a", "info.yml")}, {}, ARGS)
+    assert failed == set()
+    assert len(stub[1].tables["novels"]) == 1
+    assert sorted(stub[1].tables["episodes"]) == ["a1", "a2"]
+
+
+def test_restarted_watch_updates_the_novel_with_the_same_title(tmp_path, stub, new_sync_context):
+    write_novel(tmp_path, "a", ["a1"])
+    watch_cycle(watch_context(new_sync_context), tmp_path, {("a", "info.yml")}, {}, ARGS)
+    [novel_id] = stub[1].tables["novels"]
+
+    # 再起動した常駐は作成した小説のIDを覚えていない
+    ctx = watch_context(new_sync_context)
+    (tmp_path / "a" / "manuscript" / "info.yml").write_text(
+        'title: "a"\nauthor: "y"\npublished: true\n', encoding="utf-8")
+    watch_cycle(ctx, tmp_path, {("a", "info.yml"), ("a", "1.md")}, {}, ARGS)
+    assert list(stub[1].tables["novels"]) == [novel_id]
+    assert stub[1].tables["novels"][novel_id]["author"] == "y"
+    assert ctx["known_novel_ids"] == {"a": int(novel_id)}
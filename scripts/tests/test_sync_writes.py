@@ -0,0 +1,41 @@
+"""
+Supabase への一括書き込み（バッチの組み立て・更新）のテスト（書き込みはスタブの PostgREST に対して実行する）
+"""
+
+from sync_writes import insert_data, pack_batches, update_data
+
+
+def test_update_does_not_create_missing_records(stub, new_sync_context):
+    ctx = new_sync_context()
+    insert_data(ctx, "episodes", [{"id": "e1", "novel_id": 1, "title": "old"}])
+
+    updated = update_data(ctx, "episodes", [
+        {"id": "e1", "novel_id": 1, "title": "new"},
+        {"id": "e2", "novel_id": 1, "title": "missing"},
+    ], "id")
+
+    assert [record["id"] for record in updated] == ["e1"]
+    assert sorted(stub[1].tables["episodes"]) == ["e1"]
+    assert stub[1].tables["episodes"]["e1"]["title"] == "new"
+    # 作成しなかったレコードは検索インデックスと静的JSONに反映しない
+    assert ("episodes", "e2") in ctx["failed_records"]
+    assert ctx["metrics"]["counters"]["records.episodes.missing"] == 1
+
+
+def test_upsert_creates_missing_records(stub, new_sync_context):
+    ctx = new_sync_context()
+    update_data(ctx, "episodes", [{"id": "e1", "novel_id": 1, "title": "new"}], "id", upsert=True)
+    assert sorted(stub[1].tables["episodes"]) == ["e1"]
+    assert not ctx["failed_records"]
+
+
+def test_pack_batches_keeps_order_within_record_and_byte_limits():
+    # 本文は [a,b,...] のため、バッチのバイト数は 2 + 各レコード + 区切りのカンマ
+    assert pack_batches([10, 10, 10, 10, 10], max_records=2, max_bytes=1000) == [[0, 1], [2, 3], [4]]
+    assert pack_batches([10, 10, 10], max_records=10, max_bytes=2 + 10 + 1 + 10) == [[0, 1], [2]]
+    assert pack_batches([10, 10, 10], max_records=10, max_bytes=2 + 10 + 1 + 9) == [[0], [1], [2]]
+
+
+def test_pack_batches_sends_an_oversized_record_alone():
+    assert pack_batches([5, 100, 5, 5], max_records=10, max_bytes=50) == [[0], [1], [2, 3]]
+    assert pack_batches([], max_records=10, max_bytes=50) == []
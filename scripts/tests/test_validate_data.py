@@ -0,0 +1,60 @@
+"""
+validate_data の重複検出（小説内・コーパス全体の一意制約）のテスト
+"""
+
+from validate_data import constraint_errors, new_constraint_index, validate_novel_directory
+
+
+def write_novel(root, book, info, episodes):
+    """書名ディレクトリを作り、manuscript ディレクトリのパスを返す（episodes はファイル名 → ヘッダー行）"""
+    manuscript_dir = root / book / "manuscript"
+    manuscript_dir.mkdir(parents=True)
+    (manuscript_dir / "info.yml").write_text(info, encoding="utf-8")
+    for name, header in episodes.items():
+        (manuscript_dir / name).write_text(f"---\n{header}\ntitle: \"t\"\n---\n本文\n", encoding="utf-8")
+    return manuscript_dir
+
+
+def validate_corpus(root, books):
+    """validate_data.py の main と同じ順に検証し、エラーのリストを返す"""
+    constraints = new_constraint_index()
+    errors = []
+    for book in books:
+        book_errors, _ = validate_novel_directory(root / book / "manuscript", None, constraints)
+        errors.extend(book_errors)
+    return errors + constraint_errors(constraints)
+
+
+def test_duplicate_ids_in_unpublished_novel_are_reported(tmp_path):
+    info = 'title: "A"\nauthor: "x"\npublished: false\n'
+    write_novel(tmp_path, "a", info, {"1.md": 'id: "e1"', "2.md": 'id: "e1"'})
+    assert validate_corpus(tmp_path, ["a"]) == ["Duplicate episode ID 'e1' in a"]
+
+
+def test_duplicate_ids_with_draft_episode_are_reported_once(tmp_path):
+    info = 'title: "A"\nauthor: "x"\npublished: true\n'
+    write_novel(tmp_path, "a", info, {
+        "1.md": 'id: "e1"\nstatus: "draft"',
+        "2.md": 'id: "e1"',
+        "3.md": 'id: "e2"',
+        "4.md": 'id: "e2"',
+    })
+    assert sorted(validate_corpus(tmp_path, ["a"])) == [
+        "Duplicate episode ID 'e1' in a",
+        "Duplicate episode ID 'e2' in a",
+    ]
+
+
+def test_cross_novel_constraints_skip_unsynced_files(tmp_path):
+    published = 'title: "{}"\nauthor: "x"\npublished: true\n'
+    write_novel(tmp_path, "a", published.format("A"), {"1.md": 'id: "e1"\nepisode_number: 1'})
+    write_novel(tmp_path, "b", published.format("B"), {
+        "1.md": 'id: "e1"\nepisode_number: 1',
+        "2.md": 'id: "d1"\nstatus: "deleted"',
+    })
+    write_novel(tmp_path, "c", 'title: "C"\nauthor: "x"\npublished: false\n', {"1.md": 'id: "d1"'})
+    write_novel(tmp_path, "d", published.format("A"), {})
+    assert sorted(validate_corpus(tmp_path, ["a", "b", "c", "d"])) == [
+        "Duplicate episode ID 'e1' in a/1.md, b/1.md",
+        "Duplicate novel title 'A' (novels without id are identified by title) in a, d",
+    ]
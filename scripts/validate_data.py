@@ -3,17 +3,55 @@
 小説データの構造を検証するスクリプト
 """
 
+import os
 import sys
-import yaml
-import frontmatter
+import argparse
 from pathlib import Path
+from manuscript_io import load_episode_header, load_info_file, load_parse_cache, save_parse_cache
 
 def log(message):
     """ログ出力"""
     print(f"[VALIDATE] {message}")
 
-def validate_novel_directory(novel_dir):
-    """小説ディレクトリの構造を検証"""
+def new_constraint_index():
+    """コーパス全体の一意制約の索引（制約ごとに キー → 定義箇所のリスト）"""
+    return {
+        "episode_id": {},       # episodes.id（全小説で一意）
+        "episode_number": {},   # (小説, episode_number)（小説内で一意）
+        "novel_id": {},         # novels.id（info.yml の id）
+        "novel_title": {},      # id のない小説のタイトル（同期時の一時キー）
+    }
+
+def register_constraint(index, constraint, key, location):
+    """索引にキーの定義箇所を追加"""
+    index[constraint].setdefault(key, []).append(location)
+
+def constraint_errors(index):
+    """2箇所以上で定義されたキーをエラーメッセージにする"""
+    labels = {
+        "episode_id": "Duplicate episode ID '{key}'",
+        "episode_number": "Duplicate episode_number {key[1]}",
+        "novel_id": "Duplicate novel id {key}",
+        "novel_title": "Duplicate novel title '{key}' (novels without id are identified by title)",
+    }
+    errors = []
+    for constraint, label in labels.items():
+        for key, locations in index[constraint].items():
+            if len(locations) < 2:
+                continue
+            if constraint == "episode_id" and len({location.split("/")[0] for location in locations}) < 2:
+                # 小説内の重複は validate_novel_directory が下書き等も含めて報告する
+                continue
+            errors.append(f"{label.format(key=key)} in {', '.join(sorted(locations))}")
+    return errors
+
+def validate_novel_directory(novel_dir, cache=None, constraints=None):
+    """小説ディレクトリの構造を検証
+
+    エピソードIDの小説内の重複は、同期されないファイルも含めてここで報告する。
+    constraints を渡すと、同期で書き込まれる小説・エピソードのキーを登録する
+    （小説をまたぐ重複は全小説の検証後に constraint_errors でまとめて報告する）。
+    """
     novel_path = Path(novel_dir)
     errors = []
     warnings = []
@@ -26,8 +64,7 @@ def validate_novel_directory(novel_dir):
     
     # info.ymlの内容検証
     try:
-        with open(info_file, 'r', encoding='utf-8') as f:
-            novel_data = yaml.safe_load(f)
+        novel_data = load_info_file(info_file, cache)
     except Exception as e:
         errors.append(f"Invalid YAML in {info_file}: {e}")
         return errors, warnings
@@ -38,6 +75,15 @@ def validate_novel_directory(novel_dir):
         if field not in novel_data:
             errors.append(f"Missing required field '{field}' in {info_file}")
     
+    # 同期で書き込まれる小説（published: false は同期されない）のキーを登録
+    book_name = novel_path.parent.name
+    synced = constraints is not None and bool(novel_data.get('published', False))
+    if synced:
+        if novel_data.get('id') is not None:
+            register_constraint(constraints, "novel_id", str(novel_data['id']), book_name)
+        elif 'title' in novel_data:
+            register_constraint(constraints, "novel_title", str(novel_data['title']), book_name)
+    
     # エピソードファイルの検証
     episode_files = list(novel_path.glob("*.md"))
     if not episode_files:
@@ -46,22 +92,29 @@ def validate_novel_directory(novel_dir):
     episode_ids = set()
     for episode_file in episode_files:
         try:
-            with open(episode_file, 'r', encoding='utf-8') as f:
-                post = frontmatter.load(f)
+            metadata, has_content = load_episode_header(episode_file, cache)
+            location = f"{book_name}/{episode_file.name}"
             
             # 必須フィールドの確認
-            if 'id' not in post.metadata:
+            if 'id' not in metadata:
                 errors.append(f"Missing 'id' in {episode_file.name}")
             else:
-                episode_id = post.metadata['id']
+                episode_id = metadata['id']
                 if episode_id in episode_ids:
-                    errors.append(f"Duplicate episode ID '{episode_id}' in {novel_path.name}")
+                    errors.append(f"Duplicate episode ID '{episode_id}' in {book_name}")
                 episode_ids.add(episode_id)
             
-            if 'title' not in post.metadata:
+            if 'id' in metadata and synced and metadata.get('status', 'new') not in ('draft', 'deleted'):
+                # 下書き・削除対象は書き込まれないため制約の対象外
+                register_constraint(constraints, "episode_id", str(metadata['id']), location)
+                if metadata.get('episode_number') is not None:
+                    register_constraint(constraints, "episode_number",
+                                        (book_name, str(metadata['episode_number']).strip()), location)
+            
+            if 'title' not in metadata:
                 warnings.append(f"Missing 'title' in {episode_file.name}")
             
-            if not post.content.strip():
+            if not has_content:
                 warnings.append(f"Empty content in {episode_file.name}")
                 
         except Exception as e:
@@ -69,13 +122,21 @@ def validate_novel_directory(novel_dir):
     
     return errors, warnings
 
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="小説データの構造を検証する")
+    parser.add_argument("data_directory", help="書名ディレクトリを含むデータディレクトリ")
+    parser.add_argument(
+        "--parse-cache",
+        default=os.environ.get("NOVEL_PARSE_CACHE"),
+        help="解析キャッシュファイルのパス（sync_supabase.pyと共有、環境変数 NOVEL_PARSE_CACHE）",
+    )
+    return parser.parse_args()
+
 def main():
     """メイン処理"""
-    if len(sys.argv) != 2:
-        print("Usage: python validate_data.py <data_directory>")
-        sys.exit(1)
-    
-    data_dir = Path(sys.argv[1])
+    args = parse_args()
+    data_dir = Path(args.data_directory)
     
     if not data_dir.exists():
         log(f"❌ Data directory {data_dir} does not exist")
@@ -83,9 +144,12 @@ def main():
     
     log(f"🔍 Validating data structure in {data_dir}")
     
+    cache = load_parse_cache(args.parse_cache) if args.parse_cache else None
+    
     total_errors = []
     total_warnings = []
     novel_count = 0
+    constraints = new_constraint_index()
     
     # データディレクトリ直下の各書名ディレクトリを検証
     for book_dir in data_dir.iterdir():
@@ -94,12 +158,20 @@ def main():
             manuscript_dir = book_dir / "manuscript"
             if manuscript_dir.exists() and manuscript_dir.is_dir():
                 novel_count += 1
-                errors, warnings = validate_novel_directory(manuscript_dir)
+                errors, warnings = validate_novel_directory(manuscript_dir, cache, constraints)
                 total_errors.extend(errors)
                 total_warnings.extend(warnings)
             else:
                 total_warnings.append(f"Skipping {book_dir.name}: manuscript directory not found")
     
+    # データベースの一意制約（episodes.id・(novel_id, episode_number)・novels.id）に違反する重複を
+    # 同期の前にまとめて検出する
+    total_errors.extend(constraint_errors(constraints))
+    
+    # 検証に失敗しても解析結果はsync_supabase.pyや次回の検証で再利用できる
+    if cache is not None and save_parse_cache(cache, args.parse_cache):
+        log(f"🗃️  Saved parse cache to {args.parse_cache}")
+    
     # 結果の出力
     log(f"📊 Validated {novel_count} novels")
     